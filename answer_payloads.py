@@ -0,0 +1,110 @@
+import time
+import base64
+import threading
+import cv2
+from metrics import METRICS
+from frame_mosaic import crop_box
+from gpt_handler import EncodedImage
+from frame_quality import QUALITY_WEIGHT
+
+# JPEG QUALITIES TRIED IN ORDER UNTIL THE PAYLOAD FITS max_bytes
+QUALITY_STEPS = (85, 70, 55, 40)
+
+class ClassPayload:
+    def __init__(self, object_class, confidence, score, frame_id, timestamp, image, encode_ms):
+        """BEST FRAME SEEN SO FAR FOR ONE CLASS, ALREADY ENCODED"""
+        self.object_class = object_class
+        self.confidence = confidence
+        self.score = score  # SELECTION SCORE - CONFIDENCE DISCOUNTED FOR BLUR / EXPOSURE
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.image = image
+        self.encode_ms = encode_ms
+
+class PayloadCache:
+    def __init__(self, max_side=768, max_bytes=200_000, crop=False, min_gain=0.02, quality_weight=QUALITY_WEIGHT):
+        """PER-CLASS ANSWER-READY PAYLOADS KEPT UP TO DATE DURING INGEST"""
+        self.max_side = max_side
+        self.max_bytes = max_bytes  # BASE64 BYTES
+        self.crop = crop  # CROP AROUND THE CLASS'S BEST BOX INSTEAD OF SENDING THE WHOLE FRAME
+        self.min_gain = min_gain  # SKIP RE-ENCODING FOR NEGLIGIBLY BETTER FRAMES
+        self.quality_weight = quality_weight  # SAME RANKING AS FRAME SELECTION, SO SELECTED FRAMES ARE THE CACHED ONES
+        self.by_class = {}
+        self.lock = threading.Lock()
+        self.encodes = 0
+        self.encode_ms = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        with self.lock:
+            self.by_class = {}
+
+    def wants(self, object_class, score):
+        current = self.by_class.get(object_class)
+        return current is None or score > current.score + self.min_gain
+
+    def encode(self, image):
+        """DOWNSCALE TO max_side, THEN LOWER JPEG QUALITY UNTIL UNDER max_bytes"""
+        height, width = image.shape[:2]
+        scale = min(1.0, self.max_side / max(height, width))
+        if scale < 1.0:
+            width, height = int(width * scale), int(height * scale)
+            image = cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+        for quality in QUALITY_STEPS:
+            _, buffer = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            data = base64.b64encode(buffer).decode("utf-8")
+            if len(data) <= self.max_bytes:
+                break
+        return EncodedImage(data, width, height)
+
+    def offer(self, tracker, frame, frame_id):
+        """ENCODE THIS FRAME FOR EVERY CLASS IT IS NOW THE BEST FRAME OF - RETURNS CLASSES UPDATED"""
+        updated = []
+        full_frame, full_ms = None, 0.0
+        for object_class, confidence in tracker.average_confidences.items():
+            score = tracker.selection_score(object_class, self.quality_weight)
+            if not self.wants(object_class, score):
+                continue
+            if self.crop or full_frame is None:
+                start = time.perf_counter()
+                with METRICS.span("payloads.encode"):
+                    box = tracker.best_box(object_class) if self.crop else None
+                    image = self.encode(crop_box(frame, box) if box is not None else frame)
+                encode_ms = (time.perf_counter() - start) * 1000
+                with self.lock:
+                    self.encodes += 1
+                    self.encode_ms += encode_ms
+                if not self.crop:
+                    # ONE ENCODE SERVES EVERY CLASS THIS FRAME IMPROVES
+                    full_frame, full_ms = image, encode_ms
+            else:
+                # QUESTION PATH WOULD STILL HAVE PAID THE FULL ENCODE FOR THIS CLASS
+                image, encode_ms = full_frame, full_ms
+            with self.lock:
+                # ANOTHER SAVE THREAD MAY HAVE STORED A BETTER FRAME MEANWHILE
+                if self.wants(object_class, score):
+                    self.by_class[object_class] = ClassPayload(object_class, confidence, score, frame_id, tracker.timestamp, image, encode_ms)
+                    updated.append(object_class)
+        if updated:
+            METRICS.incr("payloads.updates", len(updated))
+        return updated
+
+    def lookup(self, frame_id, object_classes=None):
+        """CACHED PAYLOAD FOR A SELECTED FRAME - PREFERS ONE CROPPED FOR A REQUESTED CLASS"""
+        with self.lock:
+            matches = [p for p in self.by_class.values() if p.frame_id == frame_id]
+        for payload in matches:
+            if not object_classes or payload.object_class in object_classes:
+                return payload
+        return matches[0] if matches and not self.crop else None
+
+    def get_stats(self):
+        return {
+            "classes": len(self.by_class),
+            "bytes": sum(len(p.image.data) for p in self.by_class.values()),
+            "encodes": self.encodes,
+            "ingest_encode_ms": round(self.encode_ms, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,143 @@
+import os
+import glob
+import json
+import time
+import argparse
+import multiprocessing as mp
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from yolo_detector import download_yolo_files, load_yolo, ObjectTracker
+from local_frame_storage import LocalFrameStorage
+from pipeline import VideoPipeline
+
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".m4v")
+
+# ONE YOLO NET PER WORKER PROCESS
+_WORKER_MODEL = None
+
+def init_worker():
+    """LOAD YOLO ONCE WHEN A WORKER PROCESS STARTS"""
+    global _WORKER_MODEL
+    _WORKER_MODEL = load_yolo()
+
+def find_videos(inputs):
+    """EXPAND FILES, DIRECTORIES AND GLOBS INTO A SORTED VIDEO LIST"""
+    videos = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                videos.update(os.path.join(root, f) for f in files if f.lower().endswith(VIDEO_EXTENSIONS))
+        else:
+            videos.update(p for p in glob.glob(item) if os.path.isfile(p))
+    return sorted(videos)
+
+def output_dir_for(video_path, output_root):
+    """ONE OUTPUT DIRECTORY PER VIDEO, STABLE ACROSS RUNS"""
+    stem = Path(video_path).stem
+    parent = Path(video_path).resolve().parent.name
+    return Path(output_root) / f"{parent}__{stem}"
+
+def load_checkpoint(path):
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def write_checkpoint(path, state):
+    """WRITE ATOMICALLY SO A CRASH NEVER LEAVES A HALF-WRITTEN CHECKPOINT"""
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def process_one(video_path, output_root, checkpoint_every=300):
+    """INDEX ONE VIDEO, RESUMING FROM ITS CHECKPOINT IF THERE IS ONE"""
+    start = time.perf_counter()
+    out_dir = output_dir_for(video_path, output_root)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = out_dir / "checkpoint.json"
+
+    state = load_checkpoint(checkpoint_path)
+    if state and state.get("done"):
+        return {"video": video_path, "status": "skipped", "frames": len(state["trackers"]), "resumed_from": None, "seconds": 0.0}
+    resumed_from = state["next_frame"] if state else 0
+
+    storage = LocalFrameStorage(out_dir / "frames", persistent=True)
+    pipeline = VideoPipeline(model=_WORKER_MODEL, frame_storage=storage, detection_only=True)
+    if state:
+        pipeline.restore_trackers(ObjectTracker.from_dict(t) for t in state["trackers"])
+    frames_before = len(pipeline.trackers)
+
+    def checkpoint(next_frame, done=False):
+        write_checkpoint(checkpoint_path, {
+            "video": str(video_path),
+            "next_frame": next_frame,
+            "done": done,
+            "trackers": [t.to_dict() for t in pipeline.trackers],
+        })
+
+    ok = pipeline.process_video(video_path, start_frame=resumed_from, checkpoint_fn=checkpoint, checkpoint_every=checkpoint_every)
+    elapsed = time.perf_counter() - start
+    new_frames = len(pipeline.trackers) - frames_before
+
+    if not ok:
+        return {"video": video_path, "status": "failed", "frames": new_frames, "resumed_from": resumed_from, "seconds": elapsed}
+
+    checkpoint(None, done=True)
+    return {"video": video_path, "status": "done", "frames": new_frames, "resumed_from": resumed_from, "seconds": elapsed}
+
+def print_summary(results):
+    """PER-VIDEO THROUGHPUT AND FAILURES"""
+    name_width = max([len(Path(r["video"]).name) for r in results] + [5])
+    print(f"\n{'Video':<{name_width}} | {'Status':<8} | {'Frames':>6} | {'Resumed':>7} | {'Seconds':>8} | {'Frames/s':>8}")
+    print("-" * (name_width + 54))
+    for r in results:
+        fps = r["frames"] / r["seconds"] if r["seconds"] else 0.0
+        resumed = r["resumed_from"] if r["resumed_from"] else "-"
+        print(f"{Path(r['video']).name:<{name_width}} | {r['status']:<8} | {r['frames']:>6} | {resumed:>7} | {r['seconds']:>8.1f} | {fps:>8.2f}")
+        if r.get("error"):
+            print(f"    ERROR: {r['error']}")
+
+    failed = [r for r in results if r["status"] == "failed"]
+    print(f"\n{len(results) - len(failed)}/{len(results)} VIDEOS OK, {len(failed)} FAILED")
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index directories of recordings with a process pool and resumable checkpoints")
+    parser.add_argument("inputs", nargs="+", help="video files, directories or glob patterns")
+    parser.add_argument("--output", default="batch_output", help="root directory for frames and checkpoints")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument("--checkpoint-every", type=int, default=300, help="source frames between checkpoints")
+    parser.add_argument("--summary-json", help="also write the summary to this JSON file")
+    args = parser.parse_args()
+
+    videos = find_videos(args.inputs)
+    if not videos:
+        print("ERROR: NO VIDEOS FOUND")
+        raise SystemExit(1)
+
+    # DOWNLOAD ONCE IN THE PARENT SO WORKERS DON'T RACE ON IT
+    download_yolo_files()
+    print(f"PROCESSING {len(videos)} VIDEOS WITH {args.workers} WORKERS...")
+
+    results = []
+    # SPAWNED WORKERS START CLEAN - NO THREADS OR HELD LOCKS COPIED FROM THIS PROCESS
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=init_worker, mp_context=mp.get_context("spawn")) as executor:
+        futures = {executor.submit(process_one, v, args.output, args.checkpoint_every): v for v in videos}
+        for future in as_completed(futures):
+            video = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                # WORKER DIED - CHECKPOINT ON DISK LETS THE NEXT RUN RESUME
+                result = {"video": video, "status": "failed", "frames": 0, "resumed_from": None, "seconds": 0.0, "error": str(e)}
+            results.append(result)
+            print(f"{result['status'].upper()}: {video}")
+
+    results.sort(key=lambda r: r["video"])
+    failed = print_summary(results)
+    if args.summary_json:
+        with open(args.summary_json, "w") as f:
+            json.dump(results, f, indent=2)
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,444 @@
+import os
+import gc
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from collections import defaultdict
+import cv2
+import numpy as np
+from gpt_handler import GPTHandler
+from prompt_handler import COCO_CLASSES, prompt_report
+from yolo_detector import download_yolo_files, load_yolo, process_image, process_image_buffered
+from local_frame_storage import LocalFrameStorage
+from pipeline import VideoPipeline
+from frame_mosaic import estimate_image_tokens
+from frame_decoder import FrameDecoder
+from buffer_pool import FramePool, BlobBuffer, DetectionArrays
+from answer_payloads import PayloadCache
+from metrics import METRICS
+
+BENCH_QUESTIONS = [
+    "What car is this?",
+    "Is that person holding a cell phone?",
+    "What is on the dining table?",
+    "Who invented the telephone?",
+]
+
+def make_synthetic_video(path, seconds=10, width=1280, height=720, fps=30, seed=0):
+    """WRITE A VIDEO OF MOVING SHAPES OVER A NOISY BACKGROUND"""
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise Exception(f"ERROR: COULD NOT OPEN VIDEO WRITER FOR {path}")
+
+    # A FEW SHAPES WITH RANDOM VELOCITIES
+    shapes = []
+    for _ in range(5):
+        shapes.append({
+            "pos": rng.uniform([0, 0], [width, height]),
+            "vel": rng.uniform(-8, 8, size=2),
+            "size": int(rng.integers(min(width, height) // 12, min(width, height) // 4)),
+            "color": tuple(int(c) for c in rng.integers(0, 255, size=3)),
+        })
+
+    background = rng.integers(0, 60, size=(height, width, 3), dtype=np.uint8)
+    for _ in range(int(seconds * fps)):
+        frame = background.copy()
+        for shape in shapes:
+            shape["pos"] = (shape["pos"] + shape["vel"]) % [width, height]
+            x, y = shape["pos"].astype(int)
+            cv2.rectangle(frame, (x, y), (x + shape["size"], y + shape["size"]), shape["color"], -1)
+        writer.write(frame)
+    writer.release()
+    return path
+
+class FakeGPTHandler(GPTHandler):
+    def __init__(self, text_latency=0.4, vision_latency=1.5, jitter=0.2, seed=0, per_image_latency=0.25, per_mb_latency=0.5):
+        """LOCAL STAND-IN FOR GPTHandler - NO API KEY OR NETWORK"""
+        self.MODEL = "fake-text"
+        self.VISION_MODEL = "fake-vision"
+        self.TEMPERATURE = 0.7
+        self.MAX_TOKENS = 150
+        self.VISION_MAX_TOKENS = 300
+        self.text_latency = text_latency
+        self.vision_latency = vision_latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        # VISION LATENCY GROWS WITH IMAGE COUNT AND UPLOAD SIZE
+        self.per_image_latency = per_image_latency
+        self.per_mb_latency = per_mb_latency
+        self.last_request = None
+
+    def _sleep(self, base):
+        time.sleep(max(0.0, base * (1 + self.rng.uniform(-self.jitter, self.jitter))))
+
+    def get_completion(self, PROMPT, ROLE="You are a helpful AI assistant."):
+        """CLASSIFICATION PROMPTS GET VALID JSON BACK, EVERYTHING ELSE GETS TEXT"""
+        self._sleep(self.text_latency)
+        if '"needs_video"' in PROMPT:
+            question = PROMPT.rsplit('USER QUESTION: "', 1)[-1].split('"', 1)[0].lower()
+            objects = [c for c in COCO_CLASSES if c in question]
+            needs_video = bool(objects) or any(w in question.split() for w in ("this", "that", "these", "those", "the"))
+            return json.dumps({
+                "needs_video": needs_video,
+                "relevant_objects": (objects or ["no relevant object found"]) if needs_video else [],
+            })
+        return "This is a fake answer."
+
+    def describe_image_objects(self, image, custom_prompt=None):
+        self.encode_image(image)
+        self._sleep(self.vision_latency)
+        return "I'm seeing a fake object."
+
+    def describe_multiple_images_collectively(self, images, custom_prompt):
+        # ENCODE FOR REAL SO PAYLOAD COST SHOWS UP IN THE QUESTION PATH
+        content = self.build_image_content(images, custom_prompt)
+        request_bytes = len(json.dumps(content))
+        self.last_request = {
+            "images": len(images),
+            "request_bytes": request_bytes,
+            "est_image_tokens": sum(estimate_image_tokens(i.shape[1], i.shape[0]) for i in images),
+        }
+        self._sleep(self.vision_latency + self.per_image_latency * len(images) + self.per_mb_latency * request_bytes / 1e6)
+        return f"I'm seeing {len(images)} fake frames."
+
+    def get_json_vision_completion(self, images, custom_prompt):
+        """FUSED CLASSIFY + ANSWER - ONE VISION ROUND TRIP"""
+        self.describe_multiple_images_collectively(images, custom_prompt)
+        question = custom_prompt.split('asked: "', 1)[-1].split('"', 1)[0].lower()
+        objects = [c for c in COCO_CLASSES if c in question]
+        return {"needs_video": True, "relevant_objects": objects or ["no relevant object found"], "answer": f"I'm seeing {len(images)} fake frames."}
+
+class FakeNet:
+    def __init__(self, latency=0.05, num_classes=80, seed=0):
+        """STAND-IN FOR cv2.dnn NET WHEN YOLO WEIGHTS ARE NOT AVAILABLE"""
+        self.latency = latency
+        self.num_classes = num_classes
+        self.rng = np.random.default_rng(seed)
+
+    def setInput(self, blob):
+        self.blob = blob
+
+    def forward(self, output_layers):
+        time.sleep(self.latency)
+        outs = []
+        for _ in output_layers:
+            out = np.zeros((300, 5 + self.num_classes), dtype=np.float32)
+            out[:, :4] = self.rng.uniform(0.1, 0.9, size=(300, 4)) * [1, 1, 0.3, 0.3]
+            hits = self.rng.choice(300, size=3, replace=False)
+            out[hits, 5 + self.rng.integers(0, self.num_classes, size=3)] = self.rng.uniform(0.5, 1.0, size=3)
+            outs.append(out)
+        return outs
+
+class StageTimer:
+    def __init__(self):
+        """COLLECT WALL-CLOCK DURATIONS PER STAGE"""
+        self.samples = defaultdict(list)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - start)
+        return timed
+
+    def add(self, stage, seconds):
+        self.samples[stage].append(seconds)
+
+    def report(self):
+        """COUNT / THROUGHPUT / LATENCY PERCENTILES PER STAGE"""
+        result = {}
+        for stage, samples in self.samples.items():
+            values = np.array(samples) * 1000
+            total = float(np.sum(samples))
+            result[stage] = {
+                "count": len(samples),
+                "total_s": round(total, 4),
+                "throughput_per_s": round(len(samples) / total, 2) if total else None,
+                "mean_ms": round(float(values.mean()), 3),
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p95_ms": round(float(np.percentile(values, 95)), 3),
+                "p99_ms": round(float(np.percentile(values, 99)), 3),
+                "max_ms": round(float(values.max()), 3),
+            }
+        return result
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def build_pipeline(args, timer):
+    """PIPELINE WITH FAKE GPT, REAL OR FAKE DETECTOR, AND TIMED STAGES"""
+    if args.fake_detector:
+        with open("coco.names", "r") as f:
+            classes = [line.strip() for line in f.readlines()]
+        colors = np.random.uniform(0, 255, size=(len(classes), 3))
+        model = (FakeNet(args.detector_latency, len(classes)), classes, colors, ["yolo_82", "yolo_94", "yolo_106"])
+    else:
+        download_yolo_files()
+        model = load_yolo()
+
+    gpt = FakeGPTHandler(args.text_latency, args.vision_latency)
+    storage = LocalFrameStorage(args.frames_dir)
+    pipeline = VideoPipeline(gpt=gpt, model=model, frame_storage=storage)
+    pipeline.target_fps = args.target_fps
+    pipeline.decode_scale = args.decode_scale
+    pipeline.decode_threaded = args.threaded_decode
+    pipeline.decode_backend = args.decoder
+    pipeline.use_buffer_pool = args.buffer_pool
+    # FILLED DURING INGEST, THEN DETACHED SO ONLY THE question_path_payload_cache STAGE READS IT
+    pipeline.payload_cache = PayloadCache()
+
+    # TIME EACH STAGE WITHOUT TOUCHING PIPELINE CODE
+    pipeline.detect_frame = timer.wrap("detect_frame", pipeline.detect_frame)
+    storage.save_frame = timer.wrap("save_frame", storage.save_frame)
+    storage.get_frame = timer.wrap("get_frame", storage.get_frame)
+    pipeline.analyze_question = timer.wrap("question_classify", pipeline.analyze_question)
+    pipeline.describe_objects_in_frames = timer.wrap("describe_frames", pipeline.describe_objects_in_frames)
+    return pipeline
+
+def run_benchmark(args):
+    """RUN ALL STAGES AND RETURN A JSON-SERIALIZABLE REPORT"""
+    timer = StageTimer()
+    METRICS.reset()
+    METRICS.enable()
+    video_path = make_synthetic_video(args.video_out, args.seconds, args.width, args.height, args.fps)
+    pipeline = build_pipeline(args, timer)
+
+    # INGEST
+    start = time.perf_counter()
+    ok = pipeline.process_video(video_path)
+    timer.add("process_video", time.perf_counter() - start)
+    if not ok:
+        raise Exception("ERROR: BENCHMARK VIDEO PROCESSING FAILED")
+    # PAYLOAD MODE COMPARISON AND THE PLAIN QUESTION PATH MUST ENCODE FULL FRAMES
+    payload_cache, pipeline.payload_cache = pipeline.payload_cache, None
+
+    # FRAME SELECTION
+    classes = sorted(pipeline.detected_objects) or ["car"]
+    rng = random.Random(0)
+    for _ in range(args.selections):
+        objects = rng.sample(classes, min(3, len(classes)))
+        start = time.perf_counter()
+        pipeline.get_frames_for_objects(objects, 3)
+        timer.add("frame_selection", time.perf_counter() - start)
+
+    # ALLOCATIONS PER FRAME IN THE DETECTION HOT LOOP
+    allocations = None
+    if args.alloc_frames:
+        model = (pipeline.net, pipeline.classes, pipeline.colors, pipeline.output_layers)
+        allocations = measure_allocations(video_path, model, args.alloc_frames)
+
+    # PAYLOAD MODES ON THE SAME FRAME SETS
+    payloads = compare_payload_modes(pipeline, classes, args.payload_trials)
+
+    # QUALITY SCORING COST AT INGEST AND WHAT IT CHANGES AT SELECTION
+    quality = compare_quality_selection(pipeline, classes, timer)
+
+    # QUESTION PATH
+    for i in range(args.questions):
+        start = time.perf_counter()
+        pipeline.answer_question(BENCH_QUESTIONS[i % len(BENCH_QUESTIONS)])
+        timer.add("question_path", time.perf_counter() - start)
+
+    # SAME QUESTIONS AS ONE FUSED VISION REQUEST
+    pipeline.fused_mode = True
+    for i in range(args.questions):
+        start = time.perf_counter()
+        pipeline.answer_question(BENCH_QUESTIONS[i % len(BENCH_QUESTIONS)])
+        timer.add("question_path_fused", time.perf_counter() - start)
+    pipeline.fused_mode = False
+
+    # SAME QUESTIONS WITH FRAMES ALREADY ENCODED AT INGEST
+    pipeline.payload_cache = payload_cache
+    for i in range(args.questions):
+        start = time.perf_counter()
+        pipeline.answer_question(BENCH_QUESTIONS[i % len(BENCH_QUESTIONS)])
+        timer.add("question_path_payload_cache", time.perf_counter() - start)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "config": vars(args),
+        },
+        "video": {
+            "frames_processed": len(pipeline.trackers),
+            "detected_objects": sorted(pipeline.detected_objects),
+        },
+        "stages": timer.report(),
+        "payload_modes": payloads,
+        "frame_quality": quality,
+        "payload_cache": payload_cache.get_stats(),
+        "prompts": prompt_report(),
+        "allocations": allocations,
+        "metrics": METRICS.snapshot(),
+    }
+
+def compare_payload_modes(pipeline, classes, trials=5):
+    """REQUEST BYTES / VISION TOKENS / LATENCY PER PAYLOAD MODE ON IDENTICAL FRAME SETS"""
+    rng = random.Random(1)
+    frame_sets = []
+    for _ in range(trials):
+        objects = rng.sample(classes, min(3, len(classes)))
+        frame_ids = pipeline.get_frames_for_objects(objects, 3)
+        if frame_ids:
+            frame_sets.append((objects, frame_ids))
+
+    original_mode = pipeline.payload_mode
+    results = {}
+    for mode in ("multi", "mosaic", "crops"):
+        pipeline.payload_mode = mode
+        sizes, tokens, latencies = [], [], []
+        for objects, frame_ids in frame_sets:
+            start = time.perf_counter()
+            pipeline.describe_objects_in_frames(frame_ids, "What is this?", objects)
+            latencies.append((time.perf_counter() - start) * 1000)
+            sizes.append(pipeline.gpt.last_request["request_bytes"])
+            tokens.append(pipeline.gpt.last_request["est_image_tokens"])
+        if latencies:
+            results[mode] = {
+                "trials": len(latencies),
+                "mean_request_bytes": int(np.mean(sizes)),
+                "mean_est_image_tokens": int(np.mean(tokens)),
+                "p50_latency_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p95_latency_ms": round(float(np.percentile(latencies, 95)), 3),
+            }
+    pipeline.payload_mode = original_mode
+    return results
+
+def compare_quality_selection(pipeline, classes, timer):
+    """PER-FRAME SCORING OVERHEAD, AND QUALITY OF THE BEST FRAME PER CLASS RANKED WITH / WITHOUT IT"""
+    scoring = METRICS.snapshot()["histograms"].get("pipeline.frame_quality")
+    detect = timer.report().get("detect_frame")
+    picks = {}
+    for weight in (0.0, pipeline.quality_weight):
+        scores = []
+        for object_class in classes:
+            ranked = [t for t in pipeline.trackers if object_class in t.object_counts and t.quality]
+            if ranked:
+                best = max(ranked, key=lambda t: t.selection_score(object_class, weight))
+                scores.append(best.quality["score"])
+        picks[f"weight_{weight}"] = round(float(np.mean(scores)), 4) if scores else None
+    all_scores = [t.quality["score"] for t in pipeline.trackers if t.quality]
+    return {
+        "scoring_mean_ms": scoring["mean_ms"] if scoring else None,
+        "scoring_p95_ms": scoring["p95_ms"] if scoring else None,
+        "share_of_detect_frame": round(scoring["mean_ms"] / detect["mean_ms"], 4) if scoring and detect else None,
+        "mean_frame_quality": round(float(np.mean(all_scores)), 4) if all_scores else None,
+        # MEAN QUALITY OF THE FRAME SELECTION WOULD SEND PER CLASS
+        "selected_quality": picks,
+    }
+
+def measure_allocations(video_path, model, max_frames=60):
+    """TRANSIENT NUMPY/PYTHON BYTES AND GC RUNS PER FRAME, WITH AND WITHOUT THE BUFFER POOL"""
+    net, classes, colors, output_layers = model
+    results = {}
+    for mode in ("baseline", "buffer_pool"):
+        pooled = mode == "buffer_pool"
+        pool = FramePool(4) if pooled else None
+        blob_buffer, detections = BlobBuffer(), DetectionArrays()
+        decoder = FrameDecoder(video_path, target_fps=0, frame_pool=pool)
+
+        peaks, times = [], []
+        gc_before = sum(stat["collections"] for stat in gc.get_stats())
+        tracemalloc.start()
+        frames = iter(decoder)
+        for _ in range(max_frames):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            start = time.perf_counter()
+
+            item = next(frames, None)
+            if item is None:
+                break
+            frame = item[2]
+            if pooled:
+                process_image_buffered(frame, net, classes, colors, output_layers, blob_buffer, detections)
+                pool.release(frame)
+            else:
+                process_image(frame, net, classes, colors, output_layers)
+
+            times.append((time.perf_counter() - start) * 1000)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+        decoder.release()
+
+        # FIRST FRAME ALLOCATES THE POOL - REPORT STEADY STATE
+        steady = peaks[1:] or peaks
+        results[mode] = {
+            "frames": len(peaks),
+            "mean_transient_kb_per_frame": round(float(np.mean(steady)) / 1024, 1),
+            "max_transient_kb_per_frame": round(float(np.max(steady)) / 1024, 1),
+            "gc_collections": sum(stat["collections"] for stat in gc.get_stats()) - gc_before,
+            "mean_ms_per_frame": round(float(np.mean(times[1:] or times)), 3),
+        }
+    return results
+
+def compare_reports(current, baseline, threshold=0.1):
+    """PRINT P50 CHANGE PER STAGE, FLAG SLOWDOWNS OVER THRESHOLD"""
+    regressions = []
+    print(f"\n{'Stage':<20} | {'Base p50':>10} | {'Now p50':>10} | Change")
+    print("-" * 58)
+    for stage, now in current["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base or not base["p50_ms"]:
+            continue
+        change = now["p50_ms"] / base["p50_ms"] - 1
+        flag = " REGRESSION" if change > threshold else ""
+        print(f"{stage:<20} | {base['p50_ms']:>10.3f} | {now['p50_ms']:>10.3f} | {change:+.1%}{flag}")
+        if flag:
+            regressions.append(stage)
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark with synthetic video and a fake OpenAI backend")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--target-fps", type=float, default=10, help="pipeline sampling rate")
+    parser.add_argument("--decode-scale", type=float, default=1.0)
+    parser.add_argument("--threaded-decode", action="store_true")
+    parser.add_argument("--decoder", choices=["opencv", "pyav"], default="opencv")
+    parser.add_argument("--buffer-pool", action="store_true", help="run the pipeline in buffer-pool mode")
+    parser.add_argument("--alloc-frames", type=int, default=60, help="frames used to compare per-frame allocations (0 to skip)")
+    parser.add_argument("--text-latency", type=float, default=0.4, help="fake gpt-3.5 latency in seconds")
+    parser.add_argument("--vision-latency", type=float, default=1.5, help="fake gpt-4o latency in seconds")
+    parser.add_argument("--fake-detector", action="store_true", help="use a fake net instead of YOLOv3 weights")
+    parser.add_argument("--detector-latency", type=float, default=0.05, help="fake net forward latency in seconds")
+    parser.add_argument("--selections", type=int, default=200)
+    parser.add_argument("--questions", type=int, default=8)
+    parser.add_argument("--payload-trials", type=int, default=5, help="frame sets used to compare multi-image vs mosaic payloads")
+    parser.add_argument("--video-out", default="bench_video.mp4")
+    parser.add_argument("--frames-dir", default="bench_frames")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    report = run_benchmark(args)
+    os.remove(args.video_out)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report["stages"], indent=2))
+    print(json.dumps(report["payload_modes"], indent=2))
+    print(json.dumps(report["frame_quality"], indent=2))
+    print(json.dumps(report["allocations"], indent=2))
+    print(f"\nRESULTS WRITTEN TO {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare_reports(report, baseline):
+            raise SystemExit(1)
@@ -0,0 +1,124 @@
+import queue
+import threading
+import cv2
+import numpy as np
+
+class FramePool:
+    def __init__(self, count=16):
+        """RING OF PREALLOCATED FRAME ARRAYS, ALLOCATED ON FIRST USE"""
+        self.count = count
+        self.shape = None
+        self.buffers = []
+        self.free = queue.Queue()
+        self.slot_of = {}  # id(ARRAY) -> SLOT
+        self.lock = threading.Lock()
+
+    def _allocate(self, shape):
+        with self.lock:
+            if self.shape is not None:
+                return
+            self.buffers = [np.empty(shape, dtype=np.uint8) for _ in range(self.count)]
+            self.slot_of = {id(b): i for i, b in enumerate(self.buffers)}
+            for i in range(self.count):
+                self.free.put(i)
+            self.shape = shape
+
+    def acquire(self, shape, timeout=None):
+        """GET A FREE BUFFER - BLOCKS WHEN ALL ARE IN FLIGHT (BACKPRESSURE)"""
+        if self.shape is None:
+            self._allocate(shape)
+        if shape != self.shape:
+            raise ValueError(f"FRAME SHAPE {shape} DOES NOT MATCH POOL SHAPE {self.shape}")
+        return self.buffers[self.free.get(timeout=timeout)]
+
+    def release(self, buffer):
+        """HAND A BUFFER BACK - IGNORES ARRAYS THAT DON'T BELONG TO THE POOL"""
+        slot = self.slot_of.get(id(buffer))
+        if slot is not None:
+            self.free.put(slot)
+
+    def owns(self, buffer):
+        return id(buffer) in self.slot_of
+
+    def available(self):
+        return self.free.qsize()
+
+class BlobBuffer:
+    def __init__(self, size=416, scale=0.00392):
+        """REUSED RESIZE + NCHW FLOAT BLOB, SAME OUTPUT AS blobFromImage(swapRB=True)"""
+        self.size = size
+        self.scale = scale
+        self.resized = np.empty((size, size, 3), dtype=np.uint8)
+        self.blob = np.empty((1, 3, size, size), dtype=np.float32)
+
+    def fill(self, frame):
+        cv2.resize(frame, (self.size, self.size), dst=self.resized)
+        # BGR -> RGB PLANES, SCALED IN PLACE
+        for channel in range(3):
+            np.multiply(self.resized[:, :, 2 - channel], self.scale, out=self.blob[0, channel], casting="unsafe")
+        return self.blob
+
+class DetectionArrays:
+    def __init__(self, max_rows=10647, max_detections=1024):
+        """REUSED WORK AND RESULT ARRAYS FOR DECODING NET OUTPUTS - max_detections IS AN INITIAL SIZE, NOT A CAP"""
+        # 10647 = YOLOv3 ROWS AT 416x416 (3 SCALES x 3 ANCHORS)
+        self.class_work = np.empty(max_rows, dtype=np.intp)
+        self.conf_work = np.empty(max_rows, dtype=np.float32)
+        self.mask_work = np.empty(max_rows, dtype=bool)
+        self.boxes = np.empty((max_detections, 4), dtype=np.int32)
+        self.confidences = np.empty(max_detections, dtype=np.float32)
+        self.class_ids = np.empty(max_detections, dtype=np.int32)
+        self.count = 0
+
+    def grow_work(self, rows):
+        """REALLOCATE ONLY THE PER-ROW WORK ARRAYS - count AND RESULTS ARE KEPT"""
+        self.class_work = np.empty(rows, dtype=np.intp)
+        self.conf_work = np.empty(rows, dtype=np.float32)
+        self.mask_work = np.empty(rows, dtype=bool)
+
+    def grow_results(self, needed):
+        """ENLARGE THE RESULT ARRAYS, COPYING THE FIRST count CANDIDATES ACROSS"""
+        size = max(needed, 2 * len(self.confidences))
+        for name in ("boxes", "confidences", "class_ids"):
+            old = getattr(self, name)
+            new = np.empty((size,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def decode(self, outs, width, height, conf_threshold):
+        """FILL RESULT ARRAYS FROM NET OUTPUTS, RETURN NUMBER OF CANDIDATES (NO CAP - RESULTS GROW AS NEEDED)"""
+        self.count = 0
+        for out in outs:
+            rows = out.shape[0]
+            if rows > len(self.conf_work):
+                # GROW ONCE FOR LARGER INPUT SIZES (608x608 = 17328 ROWS)
+                self.grow_work(rows)
+            scores = out[:, 5:]
+            class_work = self.class_work[:rows]
+            conf_work = self.conf_work[:rows]
+            mask_work = self.mask_work[:rows]
+            np.argmax(scores, axis=1, out=class_work)
+            np.max(scores, axis=1, out=conf_work)
+            np.greater(conf_work, conf_threshold, out=mask_work)
+
+            hits = np.flatnonzero(mask_work)
+            if len(hits) == 0:
+                continue
+            end = self.count + len(hits)
+            if end > len(self.confidences):
+                self.grow_results(end)
+            selected = out[hits]
+
+            # CENTER/SIZE FRACTIONS -> TOP-LEFT PIXEL BOXES (SAME ROUNDING AS process_image)
+            center_x = (selected[:, 0] * width).astype(np.int32)
+            center_y = (selected[:, 1] * height).astype(np.int32)
+            w = (selected[:, 2] * width).astype(np.int32)
+            h = (selected[:, 3] * height).astype(np.int32)
+            self.boxes[self.count:end, 0] = (center_x - w / 2).astype(np.int32)
+            self.boxes[self.count:end, 1] = (center_y - h / 2).astype(np.int32)
+            self.boxes[self.count:end, 2] = w
+            self.boxes[self.count:end, 3] = h
+            self.confidences[self.count:end] = conf_work[hits]
+            self.class_ids[self.count:end] = class_work[hits]
+            self.count = end
+        return self.count
@@ -0,0 +1,263 @@
+import os
+import cv2
+import numpy as np
+from metrics import METRICS
+
+DETECTOR_BACKENDS = ("opencv", "onnx", "torch")
+
+# TORCHVISION COCO LABELS ARE THE 91 ORIGINAL COCO IDS (WITH GAPS) - MAP TO coco.names INDEX
+COCO_IDS = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 27, 28,
+            31, 32, 33, 34, 35, 36, 37, 38, 39, 40, 41, 42, 43, 44, 46, 47, 48, 49, 50, 51, 52, 53, 54, 55,
+            56, 57, 58, 59, 60, 61, 62, 63, 64, 65, 67, 70, 72, 73, 74, 75, 76, 77, 78, 79, 80, 81, 82, 84,
+            85, 86, 87, 88, 89, 90]
+COCO_ID_TO_INDEX = np.full(91, -1, dtype=np.int32)
+COCO_ID_TO_INDEX[COCO_IDS] = np.arange(len(COCO_IDS))
+
+def empty_detections():
+    return np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+# ONNX YOLO EXPORTS - (COORDINATES, CLASS SCORES)
+# yolov5: ULTRALYTICS YOLOv5 / v7 EXPORT - CX/CY/W/H IN PIXELS AT THE NETWORK INPUT SIZE, OBJECTNESS NOT IN THE CLASS SCORES
+# darknet: DARKNET / cv2.dnn SEMANTICS - NORMALIZED CX/CY/W/H, CLASS SCORES ALREADY INCLUDE OBJECTNESS
+YOLO_FORMATS = ("yolov5", "darknet")
+
+def decode_yolo_outputs(outs, width, height, conf_threshold, input_size=None, objectness=False):
+    """RAW YOLO ROWS (CX, CY, W, H, OBJ, CLASS SCORES...) -> PIXEL XYWH BOXES, CLASS IDS, CONFIDENCES"""
+    # objectness: CLASS SCORES EXCLUDE OBJECTNESS, MULTIPLY COLUMN 4 IN
+    # input_size: COORDINATES ARE PIXELS AT THIS (SQUARE) NETWORK INPUT SIZE, NOT 0-1 FRACTIONS
+    rows = np.concatenate([out.reshape(-1, out.shape[-1]) for out in outs])
+    scores = rows[:, 5:] * rows[:, 4:5] if objectness else rows[:, 5:]
+    class_ids = np.argmax(scores, axis=1)
+    confidences = scores[np.arange(len(rows)), class_ids]
+    keep = confidences > conf_threshold
+    rows, class_ids, confidences = rows[keep], class_ids[keep], confidences[keep]
+    if input_size:
+        rows = rows[:, :4] / input_size
+
+    # SAME INTEGER ROUNDING AS process_image
+    center_x = (rows[:, 0] * width).astype(np.int32)
+    center_y = (rows[:, 1] * height).astype(np.int32)
+    w = (rows[:, 2] * width).astype(np.int32)
+    h = (rows[:, 3] * height).astype(np.int32)
+    boxes = np.stack([(center_x - w / 2).astype(np.int32), (center_y - h / 2).astype(np.int32), w, h], axis=1)
+    return boxes.astype(np.int32), class_ids.astype(np.int32), confidences.astype(np.float32)
+
+def corners_to_xywh(corners):
+    """X1, Y1, X2, Y2 -> X, Y, W, H (INT PIXELS)"""
+    corners = np.asarray(corners, dtype=np.float32).reshape(-1, 4)
+    return np.stack([corners[:, 0], corners[:, 1], corners[:, 2] - corners[:, 0], corners[:, 3] - corners[:, 1]], axis=1).astype(np.int32)
+
+class Detector:
+    def __init__(self, classes, conf_threshold=0.5, nms_threshold=0.4):
+        """COMMON INTERFACE - EVERY BACKEND RETURNS (BOXES XYWH int32, CLASS_IDS int32, CONFIDENCES float32) AFTER NMS"""
+        self.classes = classes
+        self.conf_threshold = conf_threshold
+        self.nms_threshold = nms_threshold
+        self.name = "base"
+
+    def candidates(self, frames):
+        """PER FRAME (BOXES, CLASS_IDS, CONFIDENCES) ABOVE THE CONFIDENCE THRESHOLD, BEFORE NMS"""
+        raise NotImplementedError
+
+    def nms(self, boxes, class_ids, confidences):
+        """CLASS-AGNOSTIC NMS LIKE process_image, KEPT IN ORIGINAL ORDER"""
+        if len(boxes) == 0:
+            return empty_detections()
+        with METRICS.span("detect.nms"):
+            indexes = cv2.dnn.NMSBoxes(boxes.tolist(), confidences.tolist(), self.conf_threshold, self.nms_threshold)
+        keep = np.sort(np.asarray(indexes, dtype=np.int32).flatten())
+        return boxes[keep], class_ids[keep], confidences[keep]
+
+    def detect_batch(self, frames):
+        if not frames:
+            return []
+        with METRICS.span(f"detect.{self.name}.batch"):
+            results = [self.nms(*c) for c in self.candidates(frames)]
+        METRICS.incr("detect.frames", len(frames))
+        return results
+
+    def detect(self, frame):
+        return self.detect_batch([frame])[0]
+
+class OpenCVDetector(Detector):
+    def __init__(self, net, classes, output_layers, input_size=416, conf_threshold=0.5, nms_threshold=0.4):
+        """EXISTING cv2.dnn DARKNET YOLOv3"""
+        super().__init__(classes, conf_threshold, nms_threshold)
+        self.net = net
+        self.output_layers = output_layers
+        self.input_size = input_size
+        self.name = "opencv"
+
+    @classmethod
+    def from_model(cls, model, **kwargs):
+        """WRAP A load_yolo() TUPLE"""
+        net, classes, colors, output_layers = model
+        return cls(net, classes, output_layers, **kwargs)
+
+    def candidates(self, frames):
+        with METRICS.span("detect.blob"):
+            blob = cv2.dnn.blobFromImages(frames, 0.00392, (self.input_size, self.input_size), (0, 0, 0), True, crop=False)
+        with METRICS.span("detect.forward"):
+            self.net.setInput(blob)
+            outs = self.net.forward(self.output_layers)
+        results = []
+        with METRICS.span("detect.decode"):
+            for i, frame in enumerate(frames):
+                # REGION LAYERS STACK BATCH ROWS - SPLIT THEM BACK PER IMAGE
+                per_image = [out.reshape(len(frames), -1, out.shape[-1])[i] for out in outs]
+                results.append(decode_yolo_outputs(per_image, frame.shape[1], frame.shape[0], self.conf_threshold))
+        return results
+
+class OnnxDetector(Detector):
+    def __init__(self, model_path, classes, quantize=False, threads=None, conf_threshold=0.5, nms_threshold=0.4, yolo_format="yolov5"):
+        """ONNX RUNTIME ON CPU - RAW YOLO OUTPUT (SEE YOLO_FORMATS) OR TORCHVISION-STYLE (BOXES, LABELS, SCORES) EXPORTS"""
+        super().__init__(classes, conf_threshold, nms_threshold)
+        if yolo_format not in YOLO_FORMATS:
+            raise ValueError(f"UNKNOWN YOLO FORMAT {yolo_format} - EXPECTED ONE OF {YOLO_FORMATS}")
+        self.yolo_format = yolo_format
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("ONNX RUNTIME NOT INSTALLED - pip install onnxruntime")
+
+        if quantize:
+            model_path = self.quantize(model_path)
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input = self.session.get_inputs()[0]
+        self.outputs = [o.name for o in self.session.get_outputs()]
+        # ONE OUTPUT = YOLO ROWS, THREE = TORCHVISION EXPORT (SEE TorchDetector.export_onnx)
+        self.layout = "yolo" if len(self.outputs) == 1 else "torchvision"
+        shape = self.input.shape
+        self.input_size = shape[-1] if isinstance(shape[-1], int) else 416
+        self.dynamic_batch = len(shape) == 4 and not isinstance(shape[0], int)
+        if self.layout == "yolo":
+            self.check_yolo_output(self.session.get_outputs()[0].shape)
+        self.name = "onnx_int8" if quantize else "onnx"
+
+    def check_yolo_output(self, shape):
+        """FAIL ON LOAD, NOT WITH SILENTLY WRONG BOXES - ROWS MUST BE (CX, CY, W, H, OBJ, ONE SCORE PER CLASS)"""
+        row = 5 + len(self.classes)
+        if len(shape) >= 2 and shape[-2] == row - 1:
+            raise ValueError(f"ONNX OUTPUT {shape} LOOKS LIKE A YOLOv8-STYLE EXPORT (NO OBJECTNESS, CHANNELS FIRST) - NOT SUPPORTED")
+        if isinstance(shape[-1], int) and shape[-1] != row:
+            raise ValueError(f"ONNX OUTPUT {shape} DOES NOT MATCH YOLO ROWS OF {row} (5 + {len(self.classes)} CLASSES)")
+
+    @staticmethod
+    def quantize(model_path):
+        """INT8 DYNAMIC QUANTIZATION OF WEIGHTS, CACHED NEXT TO THE FP32 MODEL"""
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        root, ext = os.path.splitext(model_path)
+        quantized_path = f"{root}.int8{ext}"
+        if not os.path.exists(quantized_path):
+            print(f"QUANTIZING {model_path} -> {quantized_path}...")
+            quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QUInt8)
+        return quantized_path
+
+    def preprocess(self, frame):
+        if self.layout == "yolo":
+            resized = cv2.resize(frame, (self.input_size, self.input_size))
+        else:
+            resized = frame
+        return (cv2.cvtColor(resized, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0).transpose(2, 0, 1)
+
+    def candidates(self, frames):
+        with METRICS.span("detect.blob"):
+            tensors = [self.preprocess(f) for f in frames]
+
+        results = []
+        if self.layout == "yolo":
+            with METRICS.span("detect.forward"):
+                if self.dynamic_batch:
+                    outs = [self.session.run(self.outputs, {self.input.name: np.stack(tensors)})[0]]
+                else:
+                    outs = [self.session.run(self.outputs, {self.input.name: t[None]})[0] for t in tensors]
+                outs = np.concatenate([o.reshape(-1, o.shape[-1]) for o in outs]).reshape(len(frames), -1, outs[0].shape[-1])
+            with METRICS.span("detect.decode"):
+                for frame, out in zip(frames, outs):
+                    results.append(decode_yolo_outputs(
+                        [out], frame.shape[1], frame.shape[0], self.conf_threshold,
+                        input_size=self.input_size if self.yolo_format == "yolov5" else None, objectness=self.yolo_format == "yolov5"
+                    ))
+            return results
+
+        # TORCHVISION EXPORT TAKES ONE CHW IMAGE AT ITS OWN SIZE
+        for tensor in tensors:
+            with METRICS.span("detect.forward"):
+                corners, labels, scores = self.session.run(self.outputs, {self.input.name: tensor})
+            class_ids = COCO_ID_TO_INDEX[np.clip(labels, 0, 90)]
+            keep = (scores > self.conf_threshold) & (class_ids >= 0)
+            results.append((corners_to_xywh(corners[keep]), class_ids[keep], scores[keep].astype(np.float32)))
+        return results
+
+TORCHVISION_MODELS = ("fasterrcnn_mobilenet_v3_large_320_fpn", "fasterrcnn_mobilenet_v3_large_fpn", "ssdlite320_mobilenet_v3_large", "retinanet_resnet50_fpn", "fasterrcnn_resnet50_fpn")
+
+class TorchDetector(Detector):
+    def __init__(self, classes, model_name="fasterrcnn_mobilenet_v3_large_320_fpn", threads=None, conf_threshold=0.5, nms_threshold=0.4):
+        """TORCHVISION DETECTION MODEL ON CPU, BATCHED"""
+        super().__init__(classes, conf_threshold, nms_threshold)
+        try:
+            import torch
+            import torchvision
+        except ImportError:
+            raise ImportError("TORCH / TORCHVISION NOT INSTALLED - pip install torch torchvision")
+        self.torch = torch
+        if threads:
+            torch.set_num_threads(threads)
+
+        # get_model / get_model_weights NEED torchvision>=0.14 (requirements.txt)
+        weights = torchvision.models.get_model_weights(model_name).DEFAULT
+        self.model = torchvision.models.get_model(model_name, weights=weights).eval()
+        self.model_name = model_name
+        self.name = "torch"
+
+    def to_tensor(self, frame):
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        return self.torch.from_numpy(rgb).permute(2, 0, 1).float().div_(255.0)
+
+    def candidates(self, frames):
+        with METRICS.span("detect.blob"):
+            tensors = [self.to_tensor(f) for f in frames]
+        with METRICS.span("detect.forward"):
+            with self.torch.inference_mode():
+                outputs = self.model(tensors)
+
+        results = []
+        for output in outputs:
+            scores = output["scores"].numpy()
+            class_ids = COCO_ID_TO_INDEX[np.clip(output["labels"].numpy(), 0, 90)]
+            keep = (scores > self.conf_threshold) & (class_ids >= 0)
+            results.append((corners_to_xywh(output["boxes"].numpy()[keep]), class_ids[keep], scores[keep].astype(np.float32)))
+        return results
+
+    def export_onnx(self, path, size=(480, 640)):
+        """WRITE AN ONNX COPY FOR OnnxDetector (TORCHVISION LAYOUT, DYNAMIC IMAGE SIZE)"""
+        dummy = self.torch.rand(3, *size)
+        self.torch.onnx.export(
+            self.model, ([dummy],), path, opset_version=11,
+            input_names=["image"], output_names=["boxes", "labels", "scores"],
+            dynamic_axes={"image": [1, 2], "boxes": [0], "labels": [0], "scores": [0]},
+        )
+        return path
+
+def load_detector(backend="opencv", classes=None, model=None, model_path=None, quantize=False, threads=None, torch_model="fasterrcnn_mobilenet_v3_large_320_fpn", yolo_format="yolov5"):
+    """BUILD A DETECTOR BY NAME - OPENCV REUSES A load_yolo() TUPLE"""
+    if classes is None:
+        with open("coco.names", "r") as f:
+            classes = [line.strip() for line in f.readlines()]
+    if backend == "opencv":
+        if model is None:
+            from yolo_detector import load_yolo
+            model = load_yolo()
+        return OpenCVDetector.from_model(model)
+    if backend == "onnx":
+        if not model_path:
+            raise ValueError("ONNX BACKEND NEEDS A MODEL PATH")
+        return OnnxDetector(model_path, classes, quantize=quantize, threads=threads, yolo_format=yolo_format)
+    if backend == "torch":
+        return TorchDetector(classes, torch_model, threads=threads)
+    raise ValueError(f"UNKNOWN DETECTOR BACKEND {backend}")
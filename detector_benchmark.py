@@ -0,0 +1,147 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+from frame_decoder import FrameDecoder
+from detector_backends import load_detector, DETECTOR_BACKENDS, TORCHVISION_MODELS
+
+def load_clip(video_path, target_fps=5, max_frames=100):
+    """DECODE THE SAME SAMPLED FRAMES ONCE FOR EVERY BACKEND"""
+    decoder = FrameDecoder(video_path, target_fps)
+    frames = []
+    for _, _, frame in decoder:
+        frames.append(frame)
+        if len(frames) >= max_frames:
+            break
+    decoder.release()
+    return frames
+
+def iou(a, b):
+    """IOU OF TWO XYWH BOXES"""
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+def match_detections(reference, candidate, iou_threshold=0.5):
+    """GREEDY SAME-CLASS MATCHING - (MATCHES, REFERENCE COUNT, CANDIDATE COUNT, MATCHED IOUS)"""
+    ref_boxes, ref_classes, _ = reference
+    boxes, classes, confidences = candidate
+    used = set()
+    ious = []
+    for i in np.argsort(-confidences):
+        best, best_iou = None, iou_threshold
+        for j in range(len(ref_boxes)):
+            if j in used or ref_classes[j] != classes[i]:
+                continue
+            overlap = iou(boxes[i], ref_boxes[j])
+            if overlap >= best_iou:
+                best, best_iou = j, overlap
+        if best is not None:
+            used.add(best)
+            ious.append(best_iou)
+    return len(ious), len(ref_boxes), len(boxes), ious
+
+def run_backend(detector, frames, batch_size=1, warmup=2):
+    """THROUGHPUT AND PER-BATCH LATENCY, PLUS DETECTIONS FOR THE ACCURACY COMPARISON"""
+    detector.detect_batch(frames[:warmup])
+    results, latencies = [], []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        batch = frames[i:i + batch_size]
+        batch_start = time.perf_counter()
+        results.extend(detector.detect_batch(batch))
+        latencies.append((time.perf_counter() - batch_start) * 1000 / len(batch))
+    elapsed = time.perf_counter() - start
+    return results, {
+        "frames": len(frames),
+        "batch_size": batch_size,
+        "frames_per_s": round(len(frames) / elapsed, 2),
+        "p50_ms_per_frame": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms_per_frame": round(float(np.percentile(latencies, 95)), 2),
+        "detections_per_frame": round(sum(len(r[0]) for r in results) / len(frames), 2),
+    }
+
+def accuracy_against(reference, results, iou_threshold=0.5):
+    """PRECISION / RECALL / F1 AGAINST THE REFERENCE BACKEND'S DETECTIONS"""
+    matched = ref_total = cand_total = 0
+    ious = []
+    for ref, cand in zip(reference, results):
+        m, r, c, frame_ious = match_detections(ref, cand, iou_threshold)
+        matched, ref_total, cand_total = matched + m, ref_total + r, cand_total + c
+        ious.extend(frame_ious)
+    precision = matched / cand_total if cand_total else 1.0
+    recall = matched / ref_total if ref_total else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {
+        "precision": round(precision, 3),
+        "recall": round(recall, 3),
+        "f1": round(f1, 3),
+        "mean_iou": round(float(np.mean(ious)), 3) if ious else None,
+    }
+
+def parse_backend(spec):
+    """SPLIT "name[:int8]" INTO (BACKEND, QUANTIZE)"""
+    name, _, option = spec.partition(":")
+    if name not in DETECTOR_BACKENDS:
+        raise ValueError(f"UNKNOWN DETECTOR BACKEND {name}")
+    return name, option == "int8"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare detector backends on the same clip")
+    parser.add_argument("video", nargs="?", default="tesla.mp4")
+    parser.add_argument("--backends", default="opencv,torch,onnx,onnx:int8", help="comma list - first is the accuracy reference")
+    parser.add_argument("--onnx-model", help="ONNX model for the onnx backends (exported from the torch backend if missing)")
+    parser.add_argument("--torch-model", choices=TORCHVISION_MODELS, default="fasterrcnn_mobilenet_v3_large_320_fpn")
+    parser.add_argument("--threads", type=int, help="CPU threads for onnx/torch")
+    parser.add_argument("--batch-size", type=int, default=4, help="frames per detect_batch call")
+    parser.add_argument("--target-fps", type=float, default=5)
+    parser.add_argument("--max-frames", type=int, default=60)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    frames = load_clip(args.video, args.target_fps, args.max_frames)
+    print(f"LOADED {len(frames)} FRAMES FROM {args.video}")
+
+    report = {"video": args.video, "frames": len(frames), "backends": {}}
+    reference = None
+    for spec in args.backends.split(","):
+        name, quantize = parse_backend(spec.strip())
+        try:
+            model_path = args.onnx_model
+            if name == "onnx" and not model_path:
+                # SAME WEIGHTS AS THE TORCH BACKEND SO ACCURACY ONLY REFLECTS RUNTIME + QUANTIZATION
+                model_path = f"{args.torch_model}.onnx"
+                if not os.path.exists(model_path):
+                    print(f"EXPORTING {args.torch_model} TO {model_path}...")
+                    load_detector("torch", threads=args.threads, torch_model=args.torch_model).export_onnx(model_path)
+            detector = load_detector(name, model_path=model_path, quantize=quantize, threads=args.threads, torch_model=args.torch_model)
+        except Exception as e:
+            print(f"SKIPPING {spec}: {e}")
+            report["backends"][spec] = {"skipped": str(e)}
+            continue
+
+        print(f"RUNNING {spec}...")
+        results, stats = run_backend(detector, frames, args.batch_size)
+        if reference is None:
+            reference = results
+            stats["reference"] = True
+        else:
+            stats["vs_reference"] = accuracy_against(reference, results)
+        report["backends"][spec] = stats
+
+    print(f"\n{'Backend':<12} | {'FPS':>7} | {'p50 ms':>8} | {'p95 ms':>8} | {'Det/frame':>9} | {'Prec':>5} | {'Recall':>6} | {'F1':>5}")
+    print("-" * 80)
+    for spec, stats in report["backends"].items():
+        if "skipped" in stats:
+            print(f"{spec:<12} | SKIPPED")
+            continue
+        acc = stats.get("vs_reference", {"precision": "ref", "recall": "ref", "f1": "ref"})
+        print(f"{spec:<12} | {stats['frames_per_s']:>7} | {stats['p50_ms_per_frame']:>8} | {stats['p95_ms_per_frame']:>8} | {stats['detections_per_frame']:>9} | {acc['precision']:>5} | {acc['recall']:>6} | {acc['f1']:>5}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nRESULTS WRITTEN TO {args.output}")
@@ -0,0 +1,200 @@
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from gpt_handler import GPTHandler
+from request_scheduler import RequestScheduler, request_deadline
+
+class FakeOpenAIServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, jitter=0.3, slow_rate=0.05, slow_latency=3.0, seed=0):
+        """LOCAL /v1/chat/completions WITH INJECTABLE LATENCY - NO KEY, NO NETWORK"""
+        self.latency = latency
+        self.jitter = jitter
+        # OCCASIONAL STUCK RESPONSES - THE TAIL HEDGING IS FOR
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "completed": 0, "cancelled": 0, "failed": 0}
+        self.httpd = ThreadingHTTPServer((host, port), self.make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def draw_latency(self):
+        with self.lock:
+            if self.rng.random() < self.slow_rate:
+                return self.slow_latency
+            return max(0.0, self.latency * (1 + self.rng.uniform(-self.jitter, self.jitter)))
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def client_gone(self):
+                """PEEK THE SOCKET - A CANCELLED CLIENT CLOSES ITS END"""
+                self.connection.setblocking(False)
+                try:
+                    return self.connection.recv(1, socket.MSG_PEEK) == b""
+                except (BlockingIOError, InterruptedError):
+                    return False
+                except OSError:
+                    return True
+                finally:
+                    self.connection.setblocking(True)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                server.count("requests")
+                # X-Fake-Latency OVERRIDES THE DRAW FOR ONE REQUEST
+                latency = float(self.headers.get("X-Fake-Latency") or server.draw_latency())
+                end = time.monotonic() + latency
+                while time.monotonic() < end:
+                    if self.client_gone():
+                        server.count("cancelled")
+                        self.close_connection = True
+                        return
+                    time.sleep(min(0.01, max(0.0, end - time.monotonic())))
+
+                # X-Fake-Status FAILS THE REQUEST (E.G. 429 WITH X-Fake-Retry-After SECONDS)
+                status = int(self.headers.get("X-Fake-Status") or 200)
+                if status != 200:
+                    error = json.dumps({"error": {"message": f"FAKE {status}", "type": "rate_limit_error" if status == 429 else "fake_error", "code": None}}).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(error)))
+                    if self.headers.get("X-Fake-Retry-After"):
+                        self.send_header("Retry-After", self.headers["X-Fake-Retry-After"])
+                    self.end_headers()
+                    self.wfile.write(error)
+                    server.count("failed")
+                    return
+
+                # CLASSIFICATION PROMPTS ASK FOR JSON IN THE TEXT, FUSED ONES VIA response_format
+                wants_json = (body.get("response_format") or {}).get("type") == "json_object" or "needs_video" in json.dumps(body.get("messages", []))
+                content = json.dumps({"needs_video": True, "relevant_objects": ["car"], "answer": "A fake answer."}) if wants_json else "A fake answer."
+                payload = json.dumps({
+                    "id": f"chatcmpl-fake{server.stats['requests']}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+                }).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    server.count("completed")
+                except (BrokenPipeError, ConnectionResetError):
+                    server.count("cancelled")
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def timed_calls(handler, count, deadline=None, concurrency=4):
+    """END-TO-END MS PER get_completion CALL (NONE = FAILED / DEADLINE)"""
+    latencies = [None] * count
+    next_call = iter(range(count))
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(next_call, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            with request_deadline(deadline):
+                answer = handler.get_completion(f"question {i}")
+            latencies[i] = (time.perf_counter() - start) * 1000 if answer else None
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+def summarize(latencies):
+    ok = [l for l in latencies if l is not None]
+    return {
+        "calls": len(latencies),
+        "failed": len(latencies) - len(ok),
+        "p50_ms": round(float(np.percentile(ok, 50)), 1) if ok else None,
+        "p95_ms": round(float(np.percentile(ok, 95)), 1) if ok else None,
+        "p99_ms": round(float(np.percentile(ok, 99)), 1) if ok else None,
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI server - serve it, or run the hedging / deadline demo against it")
+    parser.add_argument("--serve", action="store_true", help="just serve until interrupted")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.2, help="typical response seconds")
+    parser.add_argument("--slow-rate", type=float, default=0.02, help="fraction of stuck responses")
+    parser.add_argument("--slow-latency", type=float, default=3.0, help="seconds a stuck response takes")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--deadline", type=float, default=2.0, help="per-question deadline for the deadline run")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(port=args.port, latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency).start()
+    print(f"FAKE OPENAI SERVER AT {server.base_url}")
+    if args.serve:
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.stop()
+        raise SystemExit
+
+    # GENEROUS LIMITS SO THE SCHEDULER NEVER VETOES A HEDGE IN THE DEMO
+    def handler():
+        gpt = GPTHandler(API_KEY="fake", BASE_URL=server.base_url, SCHEDULER=RequestScheduler({"gpt-3.5-turbo": (100000, 10**8)}))
+        return gpt
+
+    runs = {}
+    plain = handler()
+    runs["plain"] = summarize(timed_calls(plain, args.calls, concurrency=args.concurrency))
+
+    hedged = handler()
+    policy = hedged.enable_hedging(percentile=95, min_samples=20)
+    runs["hedged"] = summarize(timed_calls(hedged, args.calls, concurrency=args.concurrency))
+
+    bounded = handler()
+    runs[f"deadline {args.deadline}s"] = summarize(timed_calls(bounded, args.calls, deadline=args.deadline, concurrency=args.concurrency))
+
+    print(f"\n{'Run':<14} | {'Calls':>5} | {'Failed':>6} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8}")
+    print("-" * 64)
+    for name, r in runs.items():
+        print(f"{name:<14} | {r['calls']:>5} | {r['failed']:>6} | {r['p50_ms']!s:>8} | {r['p95_ms']!s:>8} | {r['p99_ms']!s:>8}")
+    stats = policy.get_stats()
+    print(f"\nHEDGE RATE {stats['hedge_rate']:.1%} ({stats.get('hedged', 0)} HEDGES, {stats.get('hedge_wins', 0)} WON, {stats.get('abandoned', 0)} LOSERS ABANDONED), DELAY {stats['delays_ms']}")
+    for name in ("p50_ms", "p95_ms", "p99_ms"):
+        print(f"{name[:3].upper()} GAIN: {runs['plain'][name] - runs['hedged'][name]:+.1f}MS")
+    print(f"SERVER: {server.stats}")
+    server.stop()
@@ -0,0 +1,227 @@
+import queue
+import threading
+import cv2
+import numpy as np
+from metrics import METRICS
+
+class TimestampSampler:
+    def __init__(self, target_fps):
+        """DECIDE WHICH FRAMES TO KEEP FROM THEIR PRESENTATION TIMESTAMPS"""
+        self.interval = 1.0 / target_fps if target_fps and target_fps > 0 else 0.0
+        self.next_time = None
+        self.last_time = None
+
+    def set_target_fps(self, target_fps):
+        """CHANGE THE RATE MID-STREAM - NEXT SAMPLE IS ONE NEW INTERVAL AFTER THE LAST ONE"""
+        self.interval = 1.0 / target_fps if target_fps and target_fps > 0 else 0.0
+        if self.last_time is not None:
+            self.next_time = self.last_time + self.interval
+
+    def should_sample(self, timestamp):
+        # FIRST FRAME, OR SAMPLING EVERY FRAME
+        if self.next_time is None or self.interval == 0.0:
+            self.next_time = timestamp + self.interval
+            self.last_time = timestamp
+            return True
+        # SMALL TOLERANCE SO 30 -> 10 FPS KEEPS EXACTLY EVERY THIRD FRAME
+        if timestamp + 1e-6 >= self.next_time:
+            # SKIP WHOLE MISSED INTERVALS INSTEAD OF BURSTING TO CATCH UP
+            while self.next_time <= timestamp + 1e-6:
+                self.next_time += self.interval
+            self.last_time = timestamp
+            return True
+        return False
+
+class FrameDecoder:
+    def __init__(self, source, target_fps=10, scale=1.0, threaded=False, queue_size=8, backend="opencv", start_frame=0, frame_pool=None):
+        """DECODE ONLY THE FRAMES WE SAMPLE, OPTIONALLY SCALED AND ON A THREAD"""
+        self.source = source
+        self.target_fps = target_fps
+        self.scale = scale
+        self.threaded = threaded
+        self.queue_size = queue_size
+        self.backend = backend
+        self.start_frame = start_frame
+        self.sampler = TimestampSampler(target_fps)
+        self.stop_event = threading.Event()
+        # OPENCV BACKEND WRITES SAMPLED FRAMES INTO POOL BUFFERS - CONSUMER MUST RELEASE THEM
+        self.frame_pool = frame_pool
+        self.scratch = None
+
+        # COUNTERS
+        self.frames_grabbed = 0
+        self.frames_sampled = 0
+
+        if backend == "opencv":
+            self.cap = cv2.VideoCapture(source)
+            if not self.cap.isOpened():
+                raise Exception("ERROR: VIDEO FILE ACCESS FAILED")
+            self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+            self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            if start_frame > 0:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        elif backend == "pyav":
+            try:
+                import av
+            except ImportError:
+                raise ImportError("PyAV NOT INSTALLED - pip install av")
+            self.container = av.open(source)
+            self.stream = self.container.streams.video[0]
+            # LET FFMPEG DECODE WITH FRAME + SLICE THREADS
+            self.stream.thread_type = "AUTO"
+            self.fps = float(self.stream.average_rate or 0)
+            self.total_frames = self.stream.frames
+        else:
+            raise ValueError(f"UNKNOWN DECODER BACKEND {backend}")
+
+    def _scaled_size(self, width, height):
+        return max(1, int(width * self.scale)), max(1, int(height * self.scale))
+
+    def _opencv_frames(self):
+        """grab() EVERY FRAME, retrieve() ONLY SAMPLED ONES"""
+        frame_index = self.start_frame
+        while not self.stop_event.is_set():
+            with METRICS.span("decode.grab"):
+                grabbed = self.cap.grab()
+            if not grabbed:
+                break
+            self.frames_grabbed += 1
+
+            # PREFER CONTAINER TIMESTAMPS, FALL BACK TO INDEX / FPS
+            pos_msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+            if pos_msec > 0 or frame_index == 0:
+                timestamp = pos_msec / 1000.0
+            else:
+                timestamp = frame_index / self.fps if self.fps else float(frame_index)
+
+            if self.sampler.should_sample(timestamp):
+                if self.frame_pool is not None:
+                    ret, frame = self._retrieve_pooled()
+                    if ret:
+                        self.frames_sampled += 1
+                        yield frame_index, timestamp, frame
+                    frame_index += 1
+                    continue
+
+                with METRICS.span("decode.retrieve"):
+                    ret, frame = self.cap.retrieve()
+                if ret:
+                    if self.scale != 1.0:
+                        with METRICS.span("decode.resize"):
+                            frame = cv2.resize(frame, self._scaled_size(frame.shape[1], frame.shape[0]), interpolation=cv2.INTER_AREA)
+                    self.frames_sampled += 1
+                    yield frame_index, timestamp, frame
+            frame_index += 1
+
+    def _retrieve_pooled(self):
+        """RETRIEVE (AND SCALE) STRAIGHT INTO A PREALLOCATED POOL BUFFER"""
+        width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        out_width, out_height = self._scaled_size(width, height) if self.scale != 1.0 else (width, height)
+        # TIMED WAITS SO A STOPPED (THREADED) DECODER DOESN'T HANG ON A POOL THE CONSUMER NO LONGER DRAINS
+        buffer = None
+        while buffer is None:
+            if self.stop_event.is_set():
+                return False, None
+            try:
+                buffer = self.frame_pool.acquire((out_height, out_width, 3), timeout=0.5)
+            except queue.Empty:
+                METRICS.incr("decode.pool_waits")
+
+        with METRICS.span("decode.retrieve"):
+            if self.scale == 1.0:
+                ret, _ = self.cap.retrieve(image=buffer)
+            else:
+                # FULL-RES SCRATCH IS REUSED TOO, ONLY THE SCALED COPY LEAVES THE DECODER
+                if self.scratch is None:
+                    self.scratch = np.empty((height, width, 3), dtype=np.uint8)
+                ret, _ = self.cap.retrieve(image=self.scratch)
+                if ret:
+                    cv2.resize(self.scratch, (out_width, out_height), dst=buffer, interpolation=cv2.INTER_AREA)
+        if not ret:
+            self.frame_pool.release(buffer)
+        return ret, buffer
+
+    def _pyav_frames(self):
+        """DECODE WITH PyAV, CONVERT (AND SCALE IN SWSCALE) ONLY SAMPLED FRAMES"""
+        frame_index = 0
+        start_time = float((self.stream.start_time or 0) * self.stream.time_base)
+        if self.start_frame > 0 and self.fps:
+            # RESUME FROM THE KEYFRAME AT OR BEFORE start_frame INSTEAD OF DECODING FROM THE TOP
+            target = start_time + self.start_frame / self.fps
+            self.container.seek(int(target / self.stream.time_base), stream=self.stream, backward=True, any_frame=False)
+            frame_index = None
+        for av_frame in self.container.decode(self.stream):
+            if self.stop_event.is_set():
+                break
+            self.frames_grabbed += 1
+            if frame_index is None:
+                # FIRST FRAME AFTER THE SEEK - RECOVER ITS INDEX FROM ITS TIMESTAMP
+                frame_index = round((float(av_frame.time) - start_time) * self.fps) if av_frame.time is not None else self.start_frame
+            if frame_index < self.start_frame:
+                frame_index += 1
+                continue
+
+            timestamp = float(av_frame.time) if av_frame.time is not None else frame_index / (self.fps or 1.0)
+            if self.sampler.should_sample(timestamp):
+                width, height = self._scaled_size(av_frame.width, av_frame.height)
+                with METRICS.span("decode.retrieve"):
+                    frame = av_frame.to_ndarray(format="bgr24", width=width, height=height)
+                self.frames_sampled += 1
+                yield frame_index, timestamp, frame
+            frame_index += 1
+
+    def _frames(self):
+        return self._opencv_frames() if self.backend == "opencv" else self._pyav_frames()
+
+    def _threaded_frames(self):
+        """RUN DECODE ON A DEDICATED THREAD, HAND FRAMES OVER A BOUNDED QUEUE"""
+        frame_queue = queue.Queue(maxsize=self.queue_size)
+        done = object()
+
+        def put(item):
+            # NEVER BLOCK FOREVER IF THE CONSUMER WENT AWAY
+            while not self.stop_event.is_set():
+                try:
+                    frame_queue.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def producer():
+            try:
+                for item in self._frames():
+                    put(item)
+                put(done)
+            except Exception as e:
+                put(e)
+
+        thread = threading.Thread(target=producer, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = frame_queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.stop_event.set()
+            thread.join(timeout=5)
+
+    def __iter__(self):
+        """YIELD (SOURCE FRAME INDEX, TIMESTAMP IN SECONDS, BGR FRAME) FOR SAMPLED FRAMES"""
+        return self._threaded_frames() if self.threaded else self._frames()
+
+    def set_target_fps(self, target_fps):
+        """ADJUST SAMPLING WHILE DECODING - THREADED MODE APPLIES IT AFTER FRAMES ALREADY QUEUED"""
+        self.target_fps = target_fps
+        self.sampler.set_target_fps(target_fps)
+
+    def release(self):
+        self.stop_event.set()
+        if self.backend == "opencv":
+            self.cap.release()
+        else:
+            self.container.close()
@@ -0,0 +1,23 @@
+import cv2
+import numpy as np
+
+# dHASH BITS THAT MAY DIFFER BEFORE TWO FRAMES COUNT AS NEAR-DUPLICATES (OUT OF 64)
+NEAR_DUPLICATE_DISTANCE = 10
+
+def dhash(frame, hash_size=8):
+    """DIFFERENCE HASH OF A DOWNSCALED GRAYSCALE COPY, RETURNED AS AN INT"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    # EACH BIT = IS PIXEL BRIGHTER THAN ITS RIGHT NEIGHBOUR
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+def hamming_distance(hash_a, hash_b):
+    """NUMBER OF DIFFERING BITS BETWEEN TWO HASHES"""
+    return bin(hash_a ^ hash_b).count("1")
+
+def is_near_duplicate(frame_hash, other_hashes, min_distance=NEAR_DUPLICATE_DISTANCE):
+    """TRUE IF HASH IS CLOSER THAN MIN_DISTANCE TO ANY OTHER HASH"""
+    if frame_hash is None:
+        return False
+    return any(h is not None and hamming_distance(frame_hash, h) < min_distance for h in other_hashes)
@@ -0,0 +1,74 @@
+import math
+import cv2
+import numpy as np
+
+# KEEP THE WHOLE MOSAIC AROUND ONE HIGH-DETAIL IMAGE WORTH OF PIXELS
+DEFAULT_PIXEL_BUDGET = 1536 * 1024
+
+def tile_labels(count):
+    """A, B, C, ... FOR EACH TILE"""
+    return [chr(ord("A") + i) for i in range(count)]
+
+def crop_box(frame, box, padding=0.25):
+    """CROP A DETECTION BOX WITH SOME SURROUNDING CONTEXT"""
+    height, width = frame.shape[:2]
+    x, y, w, h = box
+    pad_x, pad_y = int(w * padding), int(h * padding)
+    x1, y1 = max(0, x - pad_x), max(0, y - pad_y)
+    x2, y2 = min(width, x + w + pad_x), min(height, y + h + pad_y)
+    if x2 <= x1 or y2 <= y1:
+        return frame
+    return frame[y1:y2, x1:x2]
+
+def build_mosaic(frames, labels=None, pixel_budget=DEFAULT_PIXEL_BUDGET):
+    """PACK FRAMES INTO ONE LABELED GRID IMAGE UNDER THE PIXEL BUDGET"""
+    if not frames:
+        return None
+    labels = labels if labels is not None else tile_labels(len(frames))
+
+    # UNIFORM TILES SHAPED LIKE THE WIDEST FRAME
+    aspect = max(f.shape[1] / f.shape[0] for f in frames)
+
+    # GRID SHAPE - FEWEST EMPTY TILES, THEN CLOSEST TO SQUARE
+    def grid_cost(cols):
+        rows = math.ceil(len(frames) / cols)
+        return (rows * cols - len(frames), abs(math.log(cols * aspect / rows)))
+    cols = min(range(1, len(frames) + 1), key=grid_cost)
+    rows = math.ceil(len(frames) / cols)
+
+    # SCALE TILES TO FIT THE BUDGET - A CEILING, NEVER LARGER THAN THE BIGGEST FRAME NEEDS AT NATIVE SIZE
+    tile_h = int(math.sqrt(pixel_budget / (rows * cols * aspect)))
+    tile_h = max(1, min(tile_h, max(math.ceil(max(f.shape[0], f.shape[1] / aspect)) for f in frames)))
+    tile_w = max(1, int(tile_h * aspect))
+
+    mosaic = np.zeros((rows * tile_h, cols * tile_w, 3), dtype=np.uint8)
+    font_scale = max(0.6, tile_h / 300)
+    thickness = max(1, int(font_scale * 2))
+
+    for i, (frame, label) in enumerate(zip(frames, labels)):
+        # FIT FRAME INSIDE TILE, KEEP ASPECT - SMALL FRAMES AND CROPS ARE NEVER UPSCALED
+        h, w = frame.shape[:2]
+        scale = min(1.0, tile_w / w, tile_h / h)
+        resized = frame if scale == 1.0 else cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+        row, col = divmod(i, cols)
+        y0 = row * tile_h + (tile_h - resized.shape[0]) // 2
+        x0 = col * tile_w + (tile_w - resized.shape[1]) // 2
+        mosaic[y0:y0 + resized.shape[0], x0:x0 + resized.shape[1]] = resized
+
+        # LABEL IN TOP-LEFT CORNER OF THE TILE
+        (text_w, text_h), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)
+        lx, ly = col * tile_w, row * tile_h
+        cv2.rectangle(mosaic, (lx, ly), (lx + text_w + 12, ly + text_h + baseline + 12), (0, 0, 0), -1)
+        cv2.putText(mosaic, label, (lx + 6, ly + text_h + 6), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), thickness)
+
+    return mosaic
+
+def estimate_image_tokens(width, height):
+    """APPROXIMATE HIGH-DETAIL VISION TOKENS (85 BASE + 170 PER 512PX TILE)"""
+    # API FITS IMAGE IN 2048x2048 THEN SCALES SHORT SIDE TO 768
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
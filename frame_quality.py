@@ -0,0 +1,126 @@
+import time
+import argparse
+import cv2
+import numpy as np
+
+# LONG SIDE OF THE GRAYSCALE COPY THE SCORES ARE COMPUTED ON - GLASSES MOTION BLUR SPANS MANY PIXELS, SO IT SURVIVES THE DOWNSCALE
+QUALITY_SIDE = 480
+# LAPLACIAN VARIANCE (AT QUALITY_SIDE) WHERE THE SHARPNESS SCORE REACHES 0.5 - SHARP HANDHELD VIDEO SITS AROUND 30-120
+SHARPNESS_MIDPOINT = 30.0
+# GRAY LEVELS AT OR PAST THESE COUNT AS CRUSHED / BLOWN OUT
+DARK_LEVEL = 8
+BRIGHT_LEVEL = 247
+# STD DEV OF GRAY LEVELS BELOW THIS READS AS FLAT (UNDEREXPOSED, FOGGED, LENS COVERED)
+MIN_CONTRAST = 40.0
+# SHARE OF THE SELECTION SCORE A BAD FRAME CAN LOSE (0 = RANK BY DETECTION CONFIDENCE ONLY)
+QUALITY_WEIGHT = 0.5
+
+LEVELS = np.arange(256, dtype=np.float64)
+
+def quality_gray(frame, side=QUALITY_SIDE):
+    """DOWNSCALED GRAYSCALE COPY - GRAY FIRST (ONE CHANNEL TO RESAMPLE), LINEAR RESIZE (INTER_AREA IS ~10x SLOWER AT ODD SCALES)"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    height, width = gray.shape
+    scale = min(1.0, side / max(height, width))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_LINEAR)
+    return gray
+
+def score_frame(frame, side=QUALITY_SIDE):
+    """SHARPNESS (LAPLACIAN VARIANCE) AND EXPOSURE (HISTOGRAM STATS) OF AN UNANNOTATED FRAME, score IN [0, 1]"""
+    gray = quality_gray(frame, side)
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+    # ONE 256-BIN HISTOGRAM GIVES MEAN, CONTRAST AND CLIPPING
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel().astype(np.float64)
+    total = hist.sum()
+    brightness = float(hist @ LEVELS / total)
+    contrast = float(np.sqrt(hist @ (LEVELS - brightness) ** 2 / total))
+    clipped = float((hist[:DARK_LEVEL + 1].sum() + hist[BRIGHT_LEVEL:].sum()) / total)
+
+    sharp_score = sharpness / (sharpness + SHARPNESS_MIDPOINT)
+    exposure_score = max(0.0, 1.0 - 2.0 * clipped) * min(1.0, contrast / MIN_CONTRAST)
+    return {
+        "sharpness": round(sharpness, 2),
+        "brightness": round(brightness, 1),
+        "contrast": round(contrast, 1),
+        "clipped": round(clipped, 4),
+        "score": round(sharp_score * exposure_score, 4),
+    }
+
+def selection_score(confidence, quality, weight=QUALITY_WEIGHT):
+    """DETECTION CONFIDENCE DISCOUNTED BY UP TO weight FOR A BLURRY OR BADLY EXPOSED FRAME"""
+    if not quality:
+        return confidence
+    return confidence * (1.0 - weight + weight * quality["score"])
+
+def motion_blur(frame, length):
+    """HORIZONTAL MOTION BLUR OF length PIXELS - STANDS IN FOR A HEAD TURN"""
+    kernel = np.zeros((length, length), dtype=np.float32)
+    kernel[length // 2, :] = 1.0 / length
+    return cv2.filter2D(frame, -1, kernel)
+
+def synthetic_scene(width, height, seed=0):
+    """TEXTURED FRAME WITH EDGES AT EVERY SCALE"""
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, size=(height // 16, width // 16, 3), dtype=np.uint8)
+    frame = cv2.resize(small, (width, height), interpolation=cv2.INTER_NEAREST)
+    for _ in range(40):
+        x, y = int(rng.integers(0, width)), int(rng.integers(0, height))
+        color = tuple(int(c) for c in rng.integers(0, 255, size=3))
+        cv2.putText(frame, "SIGN", (x, y), cv2.FONT_HERSHEY_SIMPLEX, 1.5, color, 3)
+    return frame
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frame quality scoring: per-frame cost and blur / exposure ranking")
+    parser.add_argument("--frames", type=int, default=200, help="frames timed per resolution")
+    parser.add_argument("--side", type=int, default=QUALITY_SIDE, help="long side of the scored copy")
+    parser.add_argument("--video", help="also score every 10th frame of this video against a motion-blurred copy")
+    args = parser.parse_args()
+
+    print(f"\n{'Resolution':<11} | {'Score ms':>9} | {'dhash ms':>9}")
+    print("-" * 36)
+    from frame_hash import dhash
+    for width, height in ((640, 360), (1280, 720), (1920, 1080)):
+        frame = synthetic_scene(width, height)
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            score_frame(frame, args.side)
+        score_ms = (time.perf_counter() - start) * 1000 / args.frames
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            dhash(frame)
+        hash_ms = (time.perf_counter() - start) * 1000 / args.frames
+        print(f"{f'{width}x{height}':<11} | {score_ms:>9.3f} | {hash_ms:>9.3f}")
+
+    # SAME SCENE, DEGRADED - SCORES SHOULD FALL MONOTONICALLY
+    frame = synthetic_scene(1280, 720)
+    variants = {
+        "sharp": frame,
+        "blur 9px": motion_blur(frame, 9),
+        "blur 25px": motion_blur(frame, 25),
+        "blur 61px": motion_blur(frame, 61),
+        "dark": (frame * 0.15).astype(np.uint8),
+        "blown out": cv2.add(frame, np.full_like(frame, 170)),
+    }
+    print(f"\n{'Variant':<10} | {'Sharpness':>9} | {'Bright':>6} | {'Contrast':>8} | {'Clipped':>7} | {'Score':>6} | {'Select @ conf 0.9':>17}")
+    print("-" * 82)
+    for name, image in variants.items():
+        q = score_frame(image, args.side)
+        print(f"{name:<10} | {q['sharpness']:>9} | {q['brightness']:>6} | {q['contrast']:>8} | {q['clipped']:>7} | {q['score']:>6} | {selection_score(0.9, q):>17.3f}")
+
+    if args.video:
+        cap = cv2.VideoCapture(args.video)
+        sharp, blurred, index = [], [], 0
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if index % 10 == 0:
+                sharp.append(score_frame(frame, args.side)["score"])
+                blurred.append(score_frame(motion_blur(frame, 25), args.side)["score"])
+            index += 1
+        cap.release()
+        if sharp:
+            wins = sum(s > b for s, b in zip(sharp, blurred))
+            print(f"\n{args.video}: {len(sharp)} FRAMES, MEAN SCORE {np.mean(sharp):.3f} SHARP VS {np.mean(blurred):.3f} BLURRED, SHARP RANKED FIRST {wins}/{len(sharp)}")
@@ -5,9 +5,19 @@ import configparser
 from pathlib import Path
 import base64
 import cv2
+from metrics import METRICS
+from frame_mosaic import estimate_image_tokens
+from request_scheduler import SCHEDULER as SHARED_SCHEDULER, estimate_text_tokens, current_deadline, time_remaining, DeadlineExceeded
+from request_hedging import HedgePolicy
+
+class EncodedImage:
+    def __init__(self, data, width, height):
+        """BASE64 JPEG READY TO SEND - shape LETS TOKEN ESTIMATES TREAT IT LIKE A FRAME"""
+        self.data = data
+        self.shape = (height, width, 3)
 
 class GPTHandler:
-    def __init__(self, API_KEY=None, PROFILE="default"):
+    def __init__(self, API_KEY=None, PROFILE="default", SCHEDULER=None, BASE_URL=None):
         """INITIALIZE GPT HANDLER WITH API KEY"""
         # FIRST TRY DIRECT API KEY
         self.API_KEY = API_KEY
@@ -28,7 +38,15 @@ class GPTHandler:
                     "OR ADDED TO ~/.aws/credentials AS 'OPENAI_API_KEY'"
                 )
         
-        self.CLIENT = OpenAI(api_key=self.API_KEY)
+        # SCHEDULER OWNS RETRIES SO A 429 PAUSES EVERY THREAD, NOT JUST THE ONE THAT HIT IT
+        # BASE_URL POINTS AT A COMPATIBLE SERVER (E.G. fake_openai_server FOR LATENCY TESTS)
+        self.BASE_URL = BASE_URL
+        self.CLIENT = self.new_client()
+        self.SCHEDULER = SCHEDULER if SCHEDULER is not None else SHARED_SCHEDULER
+        # PER-CALL CAP - THE CALLER'S request_deadline TIGHTENS IT
+        self.TIMEOUT = 60.0
+        # OPTIONAL HedgePolicy - SEE enable_hedging
+        self.HEDGE = None
         
         # DEFAULT SETTINGS
         self.MODEL = "gpt-3.5-turbo"        # MOST COST-EFFECTIVE MODEL
@@ -36,14 +54,54 @@ class GPTHandler:
         self.TEMPERATURE = 0.7              # CONTROLS RANDOMNESS
         self.MAX_TOKENS = 150               # LIMITS RESPONSE LENGTH
         self.VISION_MAX_TOKENS = 300        # LONGER FOR IMAGE DESCRIPTIONS
+        self.IMAGE_DETAIL = "auto"          # "low" = 85 TOKENS PER IMAGE
+
+    def new_client(self):
+        return OpenAI(api_key=self.API_KEY, base_url=self.BASE_URL, max_retries=0)
+
+    def enable_hedging(self, percentile=95, min_samples=20, max_hedge_rate=0.1):
+        """DUPLICATE REQUESTS THAT OUTLIVE THE OBSERVED percentile LATENCY, KEEP THE FIRST ANSWER"""
+        self.HEDGE = HedgePolicy(self.new_client, percentile=percentile, min_samples=min_samples, max_hedge_rate=max_hedge_rate)
+        return self.HEDGE
+
+    def call_timeout(self):
+        """THIS CALL'S TIMEOUT - WHATEVER IS LEFT OF THE DEADLINE, AT MOST self.TIMEOUT"""
+        remaining = time_remaining()
+        if remaining is None:
+            return self.TIMEOUT
+        if remaining <= 0:
+            METRICS.incr("gpt.deadline_exceeded")
+            raise DeadlineExceeded("DEADLINE PASSED BEFORE THE REQUEST WAS SENT")
+        return min(self.TIMEOUT, remaining)
+
+    def create_completion(self, MODEL, TOKENS, SPAN, **REQUEST):
+        """ONE chat.completions.create UNDER THE CALLER'S DEADLINE, HEDGED WHEN A POLICY IS SET"""
+        TIMEOUT = self.call_timeout()
+        with METRICS.span(SPAN):
+            if self.HEDGE is None:
+                return self.CLIENT.with_options(timeout=TIMEOUT).chat.completions.create(model=MODEL, **REQUEST)
+
+            def attempt(CLIENT, REMAINING):
+                return CLIENT.with_options(timeout=TIMEOUT if REMAINING is None else min(TIMEOUT, REMAINING)).chat.completions.create(model=MODEL, **REQUEST)
+            # THE DUPLICATE SPENDS RATE BUDGET TOO - ONLY HEDGE WHEN IT FITS WITHOUT QUEUEING
+            return self.HEDGE.run(SPAN, attempt, lambda: self.SCHEDULER.try_acquire(MODEL, TOKENS))
+
+    def record_usage(self, RESPONSE, NAME):
+        """COUNT TOKENS REPORTED BY THE API"""
+        USAGE = getattr(RESPONSE, "usage", None)
+        if USAGE is not None:
+            METRICS.incr(f"gpt.{NAME}.prompt_tokens", USAGE.prompt_tokens or 0)
+            METRICS.incr(f"gpt.{NAME}.completion_tokens", USAGE.completion_tokens or 0)
     
     def encode_image(self, image):
         """ENCODE CV2 IMAGE TO BASE64 STRING"""
         try:
-            # ENCODE IMAGE TO JPG
-            _, buffer = cv2.imencode('.jpg', image)
-            # CONVERT TO BASE64
-            image_base64 = base64.b64encode(buffer).decode('utf-8')
+            with METRICS.span("gpt.encode_image"):
+                # ENCODE IMAGE TO JPG
+                _, buffer = cv2.imencode('.jpg', image)
+                # CONVERT TO BASE64
+                image_base64 = base64.b64encode(buffer).decode('utf-8')
+            METRICS.incr("gpt.image_bytes", len(image_base64))
             return image_base64
         except Exception as e:
             print(f"ERROR ENCODING IMAGE: {str(e)}")
@@ -52,19 +110,27 @@ class GPTHandler:
     def get_completion(self, PROMPT, ROLE="You are a helpful AI assistant."):
         """GET COMPLETION FROM GPT"""
         try:
-            RESPONSE = self.CLIENT.chat.completions.create(
-                model=self.MODEL,
-                messages=[
-                    {"role": "system", "content": ROLE},
-                    {"role": "user", "content": PROMPT}
-                ],
-                temperature=self.TEMPERATURE,
-                max_tokens=self.MAX_TOKENS
-            )
+            # PROMPT + MAX COMPLETION IS WHAT COUNTS AGAINST THE TOKEN LIMIT
+            TOKENS = estimate_text_tokens(ROLE + PROMPT) + self.MAX_TOKENS
+
+            def send():
+                return self.create_completion(
+                    self.MODEL, TOKENS, "gpt.completion",
+                    messages=[
+                        {"role": "system", "content": ROLE},
+                        {"role": "user", "content": PROMPT}
+                    ],
+                    temperature=self.TEMPERATURE,
+                    max_tokens=self.MAX_TOKENS
+                )
+            
+            RESPONSE = self.SCHEDULER.run(self.MODEL, TOKENS, send)
+            self.record_usage(RESPONSE, "completion")
             
             return RESPONSE.choices[0].message.content
             
         except Exception as e:
+            METRICS.incr("gpt.completion.errors")
             print(f"ERROR GETTING GPT COMPLETION: {str(e)}")
             return None
     
@@ -77,68 +143,122 @@ class GPTHandler:
             else:
                 text_prompt = "Describe the main objects you see in this image. Focus on identifying what each object is and any notable details about them."
             
-            content = [
-                {"type": "text", "text": text_prompt},
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{self.encode_image(image)}"
-                    }
-                }
-            ]
-            
-            RESPONSE = self.CLIENT.chat.completions.create(
-                model=self.VISION_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are an expert at identifying and describing objects in images. Be specific and detailed in your descriptions."},
-                    {"role": "user", "content": content}
-                ],
-                temperature=self.TEMPERATURE,
-                max_tokens=self.VISION_MAX_TOKENS
+            RESPONSE = self.send_vision(
+                [image], text_prompt,
+                "You are an expert at identifying and describing objects in images. Be specific and detailed in your descriptions.",
+                "gpt.describe_image", self.VISION_MAX_TOKENS
             )
+            self.record_usage(RESPONSE, "describe_image")
             
             return RESPONSE.choices[0].message.content
             
         except Exception as e:
+            METRICS.incr("gpt.describe_image.errors")
             print(f"ERROR DESCRIBING IMAGE OBJECTS: {str(e)}")
             return None
 
+    def build_image_content(self, images, custom_prompt, detail="auto"):
+        """BUILD USER MESSAGE CONTENT: PROMPT TEXT FOLLOWED BY EACH IMAGE"""
+        content = [{"type": "text", "text": custom_prompt}]
+        
+        # ADD ALL IMAGES TO CONTENT
+        for i, image in enumerate(images):
+            # PRE-ENCODED PAYLOADS SKIP THE JPEG + BASE64 STEP
+            image_base64 = image.data if isinstance(image, EncodedImage) else self.encode_image(image)
+            if image_base64:
+                image_url = {"url": f"data:image/jpeg;base64,{image_base64}"}
+                if detail != "auto":
+                    image_url["detail"] = detail
+                content.append({"type": "image_url", "image_url": image_url})
+        return content
+
+    def estimate_vision_tokens(self, images, text, detail, max_tokens):
+        """PROMPT + IMAGE + MAX COMPLETION TOKENS FOR ONE VISION REQUEST"""
+        if detail == "low":
+            image_tokens = 85 * len(images)
+        else:
+            image_tokens = sum(estimate_image_tokens(i.shape[1], i.shape[0]) for i in images)
+        return estimate_text_tokens(text) + image_tokens + max_tokens
+
+    def send_vision(self, images, custom_prompt, system_role, span_name, max_tokens, **kwargs):
+        """SEND A VISION REQUEST THROUGH THE SCHEDULER, SHRINKING IT IF IT CAN'T FIT"""
+        state = {"images": list(images), "detail": self.IMAGE_DETAIL}
+
+        def request():
+            images, detail = list(state["images"]), state["detail"]
+            tokens = self.estimate_vision_tokens(images, system_role + custom_prompt, detail, max_tokens)
+            def send():
+                content = self.build_image_content(images, custom_prompt, detail)
+                return self.create_completion(
+                    self.VISION_MODEL, tokens, span_name,
+                    messages=[
+                        {"role": "system", "content": system_role},
+                        {"role": "user", "content": content}
+                    ],
+                    temperature=self.TEMPERATURE,
+                    max_tokens=max_tokens,
+                    **kwargs
+                )
+            return tokens, send
+
+        def downgrade():
+            # LOW DETAIL FIRST, THEN DROP TRAILING (LEAST RELEVANT) FRAMES
+            if state["detail"] != "low":
+                state["detail"] = "low"
+            elif len(state["images"]) > 1:
+                state["images"].pop()
+            else:
+                return None
+            print(f"DOWNGRADING VISION REQUEST TO {len(state['images'])} IMAGES AT {state['detail']} DETAIL")
+            return request()
+
+        TOKENS, send = request()
+        return self.SCHEDULER.run(self.VISION_MODEL, TOKENS, send, downgrade)
+
     def describe_multiple_images_collectively(self, images, custom_prompt):
         """ANALYZE MULTIPLE IMAGES TOGETHER AND PROVIDE ONE UNIFIED DESCRIPTION"""
         try:
             if not images:
                 return "No images provided for analysis."
             
-            # PREPARE MESSAGE CONTENT WITH MULTIPLE IMAGES
-            content = [{"type": "text", "text": custom_prompt}]
-            
-            # ADD ALL IMAGES TO CONTENT
-            for i, image in enumerate(images):
-                image_base64 = self.encode_image(image)
-                if image_base64:
-                    content.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{image_base64}"
-                        }
-                    })
+            METRICS.incr("gpt.describe_multiple.images", len(images))
             
-            RESPONSE = self.CLIENT.chat.completions.create(
-                model=self.VISION_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are an expert at analyzing multiple images together to provide comprehensive descriptions. Look across all images to understand the complete context."},
-                    {"role": "user", "content": content}
-                ],
-                temperature=self.TEMPERATURE,
-                max_tokens=self.VISION_MAX_TOKENS
+            RESPONSE = self.send_vision(
+                images, custom_prompt,
+                "You are an expert at analyzing multiple images together to provide comprehensive descriptions. Look across all images to understand the complete context.",
+                "gpt.describe_multiple", self.VISION_MAX_TOKENS
             )
+            self.record_usage(RESPONSE, "describe_multiple")
             
             return RESPONSE.choices[0].message.content
             
         except Exception as e:
+            METRICS.incr("gpt.describe_multiple.errors")
             print(f"ERROR ANALYZING MULTIPLE IMAGES: {str(e)}")
             return None
 
+    def get_json_vision_completion(self, images, custom_prompt):
+        """ONE VISION REQUEST WITH JSON OUTPUT (FUSED CLASSIFY + ANSWER)"""
+        try:
+            RESPONSE = self.send_vision(
+                images, custom_prompt,
+                "You are a smart-glasses assistant. You classify the user's question and answer it in a single JSON response.",
+                "gpt.json_vision", self.VISION_MAX_TOKENS + 100,  # ROOM FOR THE JSON FIELDS
+                response_format={"type": "json_object"}
+            )
+            self.record_usage(RESPONSE, "json_vision")
+            
+            return json.loads(RESPONSE.choices[0].message.content)
+            
+        except json.JSONDecodeError:
+            METRICS.incr("gpt.json_errors")
+            print("ERROR: GPT VISION RESPONSE WAS NOT VALID JSON")
+            return None
+        except Exception as e:
+            METRICS.incr("gpt.json_vision.errors")
+            print(f"ERROR GETTING JSON VISION COMPLETION: {str(e)}")
+            return None
+
     def get_json_completion(self, PROMPT, ROLE="You are a helpful AI assistant."):
         """GET COMPLETION AND PARSE AS JSON"""
         try:
@@ -147,5 +267,6 @@ class GPTHandler:
                 return json.loads(RESPONSE)
             return None
         except json.JSONDecodeError:
+            METRICS.incr("gpt.json_errors")
             print("ERROR: GPT RESPONSE WAS NOT VALID JSON")
             return None 
\ No newline at end of file
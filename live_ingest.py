@@ -0,0 +1,187 @@
+import os
+import time
+import threading
+from collections import deque
+import cv2
+from metrics import METRICS
+
+def parse_source(source):
+    """TURN CLI SOURCE INTO SOMETHING cv2.VideoCapture ACCEPTS"""
+    # DEVICE INDEX ("0", "1", ...)
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+def is_file_source(source):
+    """FILES GET REPLAYED AT REAL-TIME PACE"""
+    return isinstance(source, str) and os.path.exists(source)
+
+class FrameRingBuffer:
+    def __init__(self, window_seconds=10, max_fps=10):
+        """INIT FIXED-SIZE BUFFER OF RECENT FRAMES AND DETECTIONS"""
+        self.window_seconds = window_seconds
+        # CAPACITY NEVER CHANGES SO MEMORY STAYS CONSTANT
+        self.capacity = max(1, int(window_seconds * max_fps))
+        self.entries = deque(maxlen=self.capacity)  # (TIMESTAMP, FRAME_ID, FRAME, TRACKER)
+        self.lock = threading.Lock()
+        self.next_id = 0
+
+    def append(self, timestamp, frame, tracker):
+        """ADD DETECTION RESULT, OLDEST ENTRY FALLS OFF WHEN FULL"""
+        with self.lock:
+            frame_id = f"live-{self.next_id}"
+            self.next_id += 1
+            tracker.add_image_id(frame_id)
+            tracker.timestamp = timestamp
+            self.entries.append((timestamp, frame_id, frame, tracker))
+        return frame_id
+
+    def snapshot(self, now=None):
+        """GET ENTRIES INSIDE THE TIME WINDOW, OLDEST FIRST"""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            return [e for e in self.entries if now - e[0] <= self.window_seconds]
+
+    def latest(self):
+        """GET MOST RECENT ENTRY"""
+        with self.lock:
+            return self.entries[-1] if self.entries else None
+
+    def get_frame(self, frame_id):
+        """GET FRAME BY ID (SAME INTERFACE AS LocalFrameStorage)"""
+        with self.lock:
+            for _, entry_id, frame, _ in self.entries:
+                if entry_id == frame_id:
+                    return frame
+        print(f"Frame {frame_id} no longer in ring buffer")
+        return None
+
+    def __len__(self):
+        return len(self.entries)
+
+class LiveIngest:
+    def __init__(self, source, detect_fn, window_seconds=10, max_fps=10):
+        """INIT LIVE INGESTION FROM ANY cv2.VideoCapture SOURCE"""
+        self.source = parse_source(source)
+        self.detect_fn = detect_fn
+        self.max_fps = max_fps
+        self.buffer = FrameRingBuffer(window_seconds, max_fps)
+        self.stop_event = threading.Event()
+        self.error = None
+        # SET WHEN THE SOURCE RUNS OUT (FILE EOF, CAMERA GONE) - THE BUFFER STAYS QUESTIONABLE
+        self.ended_at = None
+
+        # SINGLE HANDOFF SLOT - DETECTOR ALWAYS TAKES THE NEWEST FRAME
+        self.slot = None
+        self.slot_cond = threading.Condition()
+
+        # COUNTERS
+        self.captured = 0
+        self.offered = 0
+        self.processed = 0
+        self.dropped = 0
+
+        self.threads = []
+
+    def start(self):
+        """START CAPTURE AND DETECTION THREADS"""
+        self.threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._detect_loop, daemon=True),
+        ]
+        for t in self.threads:
+            t.start()
+
+    def stop(self):
+        """STOP THREADS AND WAIT FOR THEM"""
+        self.stop_event.set()
+        with self.slot_cond:
+            self.slot_cond.notify_all()
+        for t in self.threads:
+            t.join(timeout=5)
+
+    def _capture_loop(self):
+        """READ FRAMES AND OFFER THEM TO THE DETECTOR AT MAX_FPS"""
+        cap = cv2.VideoCapture(self.source)
+        try:
+            if not cap.isOpened():
+                raise Exception(f"ERROR: COULD NOT OPEN SOURCE {self.source}")
+
+            # FILES HAVE NO NATURAL PACE SO REPLAY THEM AT THEIR OWN FPS
+            pace_fps = cap.get(cv2.CAP_PROP_FPS) if is_file_source(self.source) else 0
+            offer_interval = 1.0 / self.max_fps
+            start = time.monotonic()
+            last_offer = None
+
+            while not self.stop_event.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                self.captured += 1
+                now = time.monotonic()
+
+                if pace_fps > 0:
+                    delay = start + self.captured / pace_fps - now
+                    if delay > 0:
+                        time.sleep(delay)
+                        now = time.monotonic()
+
+                # SAMPLE AT MAX_FPS
+                if last_offer is not None and now - last_offer < offer_interval:
+                    continue
+                last_offer = now
+
+                with self.slot_cond:
+                    # UNCONSUMED FRAME GETS REPLACED = DETECTOR FELL BEHIND
+                    if self.slot is not None:
+                        self.dropped += 1
+                        METRICS.incr("live.dropped")
+                    self.slot = (now, frame)
+                    self.offered += 1
+                    self.slot_cond.notify()
+        except Exception as e:
+            self.error = str(e)
+            print(f"ERROR IN LIVE CAPTURE: {str(e)}")
+        finally:
+            cap.release()
+            self.ended_at = time.monotonic()
+            self.stop_event.set()
+            with self.slot_cond:
+                self.slot_cond.notify_all()
+
+    def _detect_loop(self):
+        """RUN DETECTION ON NEWEST FRAME AND PUSH INTO RING BUFFER"""
+        while True:
+            with self.slot_cond:
+                while self.slot is None and not self.stop_event.is_set():
+                    self.slot_cond.wait(timeout=0.5)
+                if self.slot is None:
+                    return
+                timestamp, frame = self.slot
+                self.slot = None
+
+            try:
+                processed_frame, tracker = self.detect_fn(frame)
+                self.buffer.append(timestamp, processed_frame, tracker)
+                self.processed += 1
+                METRICS.observe("live.frame_age", (time.monotonic() - timestamp) * 1000)
+            except Exception as e:
+                print(f"ERROR IN LIVE DETECTION: {str(e)}")
+
+    def is_running(self):
+        return not self.stop_event.is_set()
+
+    def snapshot(self):
+        """GET THE RECENT WINDOW - ONCE THE SOURCE ENDS, THE LAST window_seconds BEFORE IT ENDED"""
+        return self.buffer.snapshot(now=self.ended_at)
+
+    def get_stats(self):
+        """GET INGEST COUNTERS AND DROP RATE"""
+        return {
+            "captured": self.captured,
+            "offered": self.offered,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "drop_rate": round(self.dropped / self.offered, 3) if self.offered else 0.0,
+            "buffered": len(self.buffer),
+        }
@@ -3,19 +3,22 @@ import os
 import uuid
 from pathlib import Path
 import shutil
+from metrics import METRICS
 
 class LocalFrameStorage:
-    def __init__(self, base_dir="frames"):
+    def __init__(self, base_dir="frames", persistent=False):
         """INIT FRAME STORAGE"""
         self.base_dir = Path(base_dir)
+        # PERSISTENT STORAGE KEEPS EXISTING FRAMES AND SURVIVES GARBAGE COLLECTION
+        self.persistent = persistent
         
         # CLEAN OLD FRAMES
-        if self.base_dir.exists():
+        if self.base_dir.exists() and not persistent:
             shutil.rmtree(str(self.base_dir))
             print(f"Cleaned up existing frames in {self.base_dir}")
             
         # INIT NEW DIR
-        self.base_dir.mkdir(exist_ok=True)
+        self.base_dir.mkdir(parents=True, exist_ok=True)
         print(f"Created new frames directory at {self.base_dir}")
         
     def save_frame(self, frame):
@@ -24,7 +27,9 @@ class LocalFrameStorage:
         frame_path = self.base_dir / f"{frame_id}.jpg"
         
         # SAVE TO DISK
-        cv2.imwrite(str(frame_path), frame)
+        with METRICS.span("storage.jpeg_write"):
+            cv2.imwrite(str(frame_path), frame)
+        METRICS.incr("storage.frames_saved")
         return frame_id
         
     def get_frame(self, frame_id):
@@ -32,12 +37,23 @@ class LocalFrameStorage:
         frame_path = self.base_dir / f"{frame_id}.jpg"
         if not frame_path.exists():
             print(f"Frame {frame_id} not found")
+            METRICS.incr("storage.frames_missing")
             return None
             
         # READ FROM DISK
-        frame = cv2.imread(str(frame_path))
+        with METRICS.span("storage.get_frame"):
+            frame = cv2.imread(str(frame_path))
         return frame
     
+    def delete_frame(self, frame_id):
+        """REMOVE ONE FRAME (RETENTION EVICTION)"""
+        frame_path = self.base_dir / f"{frame_id}.jpg"
+        try:
+            frame_path.unlink()
+            METRICS.incr("storage.frames_deleted")
+        except FileNotFoundError:
+            pass
+    
     def cleanup(self):
         """REMOVE ALL FRAMES"""
         for frame_file in self.base_dir.glob("*.jpg"):
@@ -45,6 +61,8 @@ class LocalFrameStorage:
             
     def __del__(self):
         """AUTO CLEANUP"""
+        if self.persistent:
+            return
         try:
             self.cleanup()
         except:
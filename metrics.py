@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import threading
+from collections import defaultdict, deque
+
+# LATENCY BUCKET UPPER BOUNDS IN MS
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+class _NullSpan:
+    """SHARED NO-OP SPAN USED WHEN METRICS ARE DISABLED"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS, max_samples=2048):
+        """FIXED BUCKETS FOR EXPORT PLUS RECENT SAMPLES FOR PERCENTILES"""
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=max_samples)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def percentile(self, pct):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum, 3),
+            "mean_ms": round(self.sum / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+class Metrics:
+    def __init__(self, enabled=False):
+        """INIT REGISTRY OF COUNTERS, GAUGES AND LATENCY HISTOGRAMS"""
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = defaultdict(float)
+            self.gauges = {}
+            self.histograms = defaultdict(Histogram)
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name):
+        """TIME A BLOCK INTO THE NAMED HISTOGRAM"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def observe(self, name, value_ms):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.histograms[name].observe(value_ms)
+
+    def incr(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        """GET ALL METRICS AS A JSON-SERIALIZABLE DICT"""
+        with self.lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {name: h.to_dict() for name, h in self.histograms.items()},
+            }
+
+    def to_prometheus(self, prefix="pipeline"):
+        """RENDER PROMETHEUS TEXT EXPOSITION FORMAT"""
+        def metric_name(name):
+            return f"{prefix}_{name}".replace(".", "_").replace("-", "_")
+
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                full = metric_name(name) + "_total"
+                lines += [f"# TYPE {full} counter", f"{full} {value}"]
+            for name, value in sorted(self.gauges.items()):
+                full = metric_name(name)
+                lines += [f"# TYPE {full} gauge", f"{full} {value}"]
+            for name, h in sorted(self.histograms.items()):
+                full = metric_name(name) + "_ms"
+                lines.append(f"# TYPE {full} histogram")
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.bucket_counts):
+                    cumulative += count
+                    lines.append(f'{full}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f'{full}_bucket{{le="+Inf"}} {h.count}')
+                lines.append(f"{full}_sum {h.sum}")
+                lines.append(f"{full}_count {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path):
+        """WRITE PROMETHEUS TEXT FOR .prom/.txt PATHS, JSON OTHERWISE"""
+        with open(path, "w") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.snapshot(), f, indent=2)
+
+# PROCESS-WIDE REGISTRY - OFF UNLESS PIPELINE_METRICS=1 OR ENABLED EXPLICITLY
+METRICS = Metrics(enabled=os.getenv("PIPELINE_METRICS") == "1")
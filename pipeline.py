@@ -1,43 +1,151 @@
 import threading
+import time
 import queue
 import cv2
 import os
 import math
 import heapq
+from collections import defaultdict
+from functools import partial
 from concurrent.futures import ThreadPoolExecutor
-from yolo_detector import download_yolo_files, load_yolo, process_image, display_image, ObjectTracker
+from yolo_detector import download_yolo_files, load_yolo, process_image, process_image_buffered, process_image_with_detector, annotate_detections, display_image, ObjectTracker
 from local_frame_storage import LocalFrameStorage
+from live_ingest import LiveIngest
+from metrics import METRICS
+from frame_hash import dhash, is_near_duplicate, NEAR_DUPLICATE_DISTANCE
+from frame_quality import score_frame, QUALITY_WEIGHT
+from frame_decoder import FrameDecoder
+from rate_controller import AdaptiveRateController
+from buffer_pool import FramePool, BlobBuffer, DetectionArrays
+from shm_transport import SharedMemoryDetectors
+from frame_mosaic import build_mosaic, crop_box, tile_labels, DEFAULT_PIXEL_BUDGET
+from temporal_index import TemporalIndex
+from retention import FrameRetention
+from answer_payloads import PayloadCache
+from request_scheduler import request_deadline
+from detector_backends import load_detector, OpenCVDetector, DETECTOR_BACKENDS, YOLO_FORMATS
+from tiled_detection import TiledDetector, load_tiled_detector, parse_roi, DEFAULT_TILE_SIZE
 import numpy as np
-from prompt_handler import GPTHandler, get_initial_prompt, get_collective_frames_prompt, get_direct_answer_prompt
+from prompt_handler import GPTHandler, get_initial_prompt, get_collective_frames_prompt, get_direct_answer_prompt, get_fused_prompt, parse_question_objects, parse_time_window
 from pathlib import Path
 import json
 
+# "WHAT IS THIS?" WITH NO TIME WINDOW - PICK CANDIDATES FROM THIS MANY OF THE NEWEST FRAMES
+FUSED_RECENT_FRAMES = 30
+
 class VideoPipeline:
-    def __init__(self):
-        self.gpt = GPTHandler()
+    def __init__(self, gpt=None, model=None, frame_storage=None, net_lock=None, payload_mode="multi", detection_only=False):
+        """INIT PIPELINE, OPTIONALLY SHARING A WARM GPT HANDLER / YOLO MODEL"""
+        # DETECTION-ONLY PIPELINES (BATCH INDEXING) NEVER TALK TO GPT
+        if detection_only:
+            self.gpt = None
+        else:
+            self.gpt = gpt if gpt is not None else GPTHandler()
         self.question_result = None
         self.user_question = None  # STORE QUESTION
         self.question_queue = queue.Queue()
-        self.video_queue = queue.Queue()
+        self.video_queue = queue.Queue()  # ONLY FILLED BY process_video_to_queue (THE INTERACTIVE RUNNERS)
         self.trackers = []
         self.detected_objects = set()
         self.frame_futures = []
+        self.frames_processed = 0  # ALL TIME - trackers MAY BE COMPACTED
+        # TIMESTAMPED VIEW OF trackers FOR TIME-RANGE QUESTIONS
+        self.temporal_index = TemporalIndex()
+        # OPTIONAL FrameRetention - BOUNDS trackers AND FRAMES FOR LONG RECORDINGS
+        self.retention = None
+        # HOW SELECTED FRAMES ARE SENT: "multi" (ONE IMAGE EACH), "mosaic" (ONE GRID), "crops" (GRID OF OBJECT CROPS)
+        self.payload_mode = payload_mode
+        self.mosaic_pixel_budget = DEFAULT_PIXEL_BUDGET
+        # OPTIONAL PayloadCache - BEST FRAME PER CLASS ENCODED DURING INGEST, "multi" PAYLOADS ONLY
+        self.payload_cache = None
+        # FRAME SELECTION RANKS BY CONFIDENCE DISCOUNTED FOR BLUR / EXPOSURE, 0 = CONFIDENCE ONLY
+        self.quality_weight = QUALITY_WEIGHT
+        # ONE VISION CALL THAT CLASSIFIES AND ANSWERS ONCE FRAMES ARE READY
+        self.fused_mode = False
+        # SECONDS answer_question MAY SPEND ON GPT CALLS, NONE = NO DEADLINE
+        self.answer_deadline = None
+        # DECODE SETTINGS
+        self.target_fps = 10
+        self.decode_scale = 1.0           # < 1 DETECTS ON DOWNSCALED FRAMES
+        self.decode_threaded = False      # DECODE ON A DEDICATED THREAD
+        self.decode_backend = "opencv"    # OR "pyav" (OPTIONAL DEPENDENCY)
+        # OPTIONAL AdaptiveRateController - TUNES target_fps FROM MEASURED COST, LAG AND BACKLOG
+        self.rate_controller = None
+        self.pending_saves = 0
+        self.pending_lock = threading.Lock()
+        # BUFFER-POOL MODE - PREALLOCATED FRAMES, BLOB AND DETECTION ARRAYS
+        self.use_buffer_pool = False
+        self.frame_pool_size = 16
+        self.frame_pool = None
+        self.blob_buffer = BlobBuffer()
+        self.detection_arrays = DetectionArrays()
+        # OPTIONAL detector_backends DETECTOR (ONNX / TORCH) IN PLACE OF THE cv2.dnn NET
+        self.detector = None
+        # OPTIONAL DETECTOR PROCESSES FED FRAMES THROUGH SHARED MEMORY - FACTORY MUST BE PICKLABLE
+        self.detector_processes = 0
+        self.detector_factory = None
         
         # INIT YOLO
-        print("SETTING UP YOLO...")
-        download_yolo_files()
-        self.net, self.classes, self.colors, self.output_layers = load_yolo()
+        if model is None:
+            print("SETTING UP YOLO...")
+            download_yolo_files()
+            model = load_yolo()
+        self.net, self.classes, self.colors, self.output_layers = model
+        # cv2.dnn NETS ARE NOT THREAD SAFE - SHARE THE LOCK WHEN SHARING THE NET
+        self.net_lock = net_lock if net_lock is not None else threading.Lock()
         
         # INIT STORAGE
-        self.frame_storage = LocalFrameStorage()
+        self.frame_storage = frame_storage if frame_storage is not None else LocalFrameStorage()
 
     def save_frame_task(self, data):
         """SAVE FRAME AND UPDATE TRACKER"""
         processed_frame, tracker = data
-        frame_id = self.frame_storage.save_frame(processed_frame)
+        with METRICS.span("pipeline.save_frame_task"):
+            frame_id = self.frame_storage.save_frame(processed_frame)
+        if self.payload_cache is not None and frame_id:
+            self.payload_cache.offer(tracker, processed_frame, frame_id)
+        # PERSISTENCE IS THE LAST USER OF A POOLED FRAME
+        if self.frame_pool is not None:
+            self.frame_pool.release(processed_frame)
         if frame_id:
             tracker.add_image_id(frame_id)
         return tracker
+
+    def detect_frame(self, frame):
+        """RUN YOLO ON ONE FRAME AND RETURN ANNOTATED FRAME + TRACKER"""
+        # HASH AND SCORE BEFORE BOXES GET DRAWN ON THE FRAME
+        with METRICS.span("pipeline.frame_hash"):
+            frame_hash = dhash(frame)
+        with METRICS.span("pipeline.frame_quality"):
+            quality = score_frame(frame)
+        with METRICS.span("pipeline.detect_wait"):
+            self.net_lock.acquire()
+        try:
+            with METRICS.span("pipeline.process_image"):
+                if self.detector is not None:
+                    processed_frame, boxes, class_ids, confidences, tracker = process_image_with_detector(
+                        frame, self.detector, self.colors
+                    )
+                elif self.use_buffer_pool:
+                    # SHARED BLOB / RESULT ARRAYS ARE SAFE UNDER THE NET LOCK
+                    processed_frame, boxes, class_ids, confidences, tracker = process_image_buffered(
+                        frame, self.net, self.classes, self.colors, self.output_layers,
+                        self.blob_buffer, self.detection_arrays
+                    )
+                else:
+                    processed_frame, boxes, class_ids, confidences, tracker = process_image(
+                        frame, self.net, self.classes, self.colors, self.output_layers
+                    )
+        finally:
+            self.net_lock.release()
+        tracker.frame_hash = frame_hash
+        tracker.quality = quality
+        return processed_frame, tracker
+
+    def analyze_question(self, question):
+        """CLASSIFY QUESTION WITH GPT"""
+        prompt = get_initial_prompt(question)
+        return self.gpt.get_json_completion(prompt)
         
     def process_question(self):
         """GET AND PROCESS USER QUESTION"""
@@ -46,8 +154,7 @@ class VideoPipeline:
         self.user_question = question
         print("PROCESSING QUESTION WITH GPT...")
         
-        prompt = get_initial_prompt(question)
-        response = self.gpt.get_json_completion(prompt)
+        response = self.analyze_question(question)
         
         if response:
             self.question_result = response
@@ -57,70 +164,257 @@ class VideoPipeline:
             self.question_queue.put(None)
             print("\nQUESTION ANALYSIS FAILED")
 
-    def process_video(self, video_path):
-        """PROCESS VIDEO FRAMES"""
+    def process_video_to_queue(self, video_path):
+        """process_video ON A BACKGROUND THREAD - THE QUESTION SIDE READS THE RESULT FROM video_queue"""
+        self.video_queue.put(self.process_video(video_path))
+
+    def process_video(self, video_path, start_frame=0, checkpoint_fn=None, checkpoint_every=300):
+        """PROCESS VIDEO FRAMES, OPTIONALLY RESUMING AND CHECKPOINTING"""
+        transport = None
         try:
-            # INIT VIDEO
-            cap = cv2.VideoCapture(video_path)
-            if not cap.isOpened():
-                raise Exception("ERROR: VIDEO FILE ACCESS FAILED")
-
-            # SET FPS
-            original_fps = cap.get(cv2.CAP_PROP_FPS)
-            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-            target_fps = 10
-            frame_interval = int(original_fps / target_fps)
+            # INIT VIDEO - DECODER ONLY HANDS BACK FRAMES SAMPLED AT TARGET_FPS
+            # FRESH POOL PER VIDEO - SHAPE IS FIXED ON FIRST FRAME
+            if self.detector_processes:
+                # DECODER RETRIEVES STRAIGHT INTO SHARED SLOTS THE DETECTOR PROCESSES READ
+                transport = SharedMemoryDetectors(self.detector_factory, self.detector_processes, self.frame_pool_size).start()
+                self.frame_pool = transport.pool
+            else:
+                self.frame_pool = FramePool(self.frame_pool_size) if self.use_buffer_pool else None
+            controller = self.rate_controller
+            if controller is not None:
+                controller.reset()
+            decoder = FrameDecoder(
+                video_path, controller.rate if controller is not None else self.target_fps, scale=self.decode_scale, threaded=self.decode_threaded,
+                backend=self.decode_backend, start_frame=start_frame, frame_pool=self.frame_pool
+            )
+            if start_frame > 0:
+                print(f"RESUMING FROM FRAME {start_frame}")
+
+            # LATER VIDEOS (SESSION SEGMENTS) CONTINUE THE TIMELINE, RESUMES KEEP SOURCE TIME
+            end_time = self.temporal_index.end_time()
+            time_offset = end_time + 1.0 / (self.target_fps or 30) if start_frame == 0 and end_time is not None else 0.0
             
-            frame_count = 0
             processed_count = 0
+            last_checkpoint = start_frame
+            last_compaction = time_offset
             
             # PROCESS FRAMES
             with ThreadPoolExecutor(max_workers=10) as executor:
-                while cap.isOpened():
-                    ret, frame = cap.read()
-                    if not ret:
-                        break
+                # WALL TIME PER SAMPLED FRAME INCLUDES DECODING THE FRAMES SKIPPED BEFORE IT
+                frame_start = time.perf_counter()
+                # RUN DETECTION
+                for frame_index, timestamp, processed_frame, tracker in self.detected_frames(decoder, transport):
+                    processed_count += 1
+                    self.frames_processed += 1
+                    METRICS.incr("pipeline.frames_processed")
                     
-                    # PROCESS NTH FRAME
-                    if frame_count % frame_interval == 0:
-                        processed_count += 1
-                        
-                        # RUN DETECTION
-                        processed_frame, boxes, class_ids, confidences, tracker = process_image(
-                            frame, self.net, self.classes, self.colors, self.output_layers
-                        )
-                        
-                        # SAVE RESULTS
-                        self.trackers.append(tracker)
-                        self.detected_objects.update(tracker.object_counts.keys())
-                        
-                        # SAVE FRAME
-                        future = executor.submit(self.save_frame_task, (processed_frame, tracker))
-                        self.frame_futures.append(future)
+                    # SAVE RESULTS
+                    tracker.timestamp = time_offset + timestamp
+                    tracker.frame_index = frame_index
+                    self.trackers.append(tracker)
+                    self.temporal_index.add(tracker)
                     
-                    frame_count += 1
+                    # FOLD OLD FOOTAGE INTO SUMMARIES ONCE PER SEGMENT OF NEW FOOTAGE
+                    if self.retention is not None and tracker.timestamp - last_compaction >= self.retention.segment_seconds:
+                        self.compact_history()
+                        last_compaction = tracker.timestamp
+                    self.detected_objects.update(tracker.object_counts.keys())
+                    
+                    # SAVE FRAME
+                    with self.pending_lock:
+                        self.pending_saves += 1
+                    future = executor.submit(self.save_frame_task, (processed_frame, tracker))
+                    future.add_done_callback(self._save_done)
+                    self.frame_futures.append(future)
+                    # NO RETENTION MEANS NO compact_history - DROP FINISHED SAVES HERE
+                    if processed_count % 256 == 0:
+                        self.frame_futures = [f for f in self.frame_futures if not f.done()]
+
+                    # FEED THE CONTROLLER AND RESAMPLE AT ITS NEW RATE
+                    if controller is not None:
+                        now = time.perf_counter()
+                        decoder.set_target_fps(controller.update(timestamp, now - frame_start, self.pending_saves, tracker.frame_hash))
+                        frame_start = now
+
+                    # CHECKPOINT ONLY AFTER EVERY EARLIER FRAME IS ON DISK
+                    if checkpoint_fn and frame_index + 1 - last_checkpoint >= checkpoint_every:
+                        for future in self.frame_futures:
+                            future.result()
+                        last_checkpoint = frame_index + 1
+                        checkpoint_fn(last_checkpoint)
                 
                 print("\nFRAME PROCESSING COMPLETE - SAVING FRAMES...")
                 # WAIT FOR SAVES
                 for future in self.frame_futures:
                     future.result()
+                self.frame_futures = []
+            if transport is not None:
+                transport.stop()
+            if self.retention is not None:
+                self.compact_history()
             
-            cap.release()
+            decoder.release()
+            METRICS.incr("pipeline.frames_decoded", decoder.frames_grabbed)
+            print(f"DECODED {decoder.frames_grabbed} FRAMES, PROCESSED {processed_count}")
+            # DETECTOR PROCESSES KEEP THEIR OWN TILE STATS
+            if isinstance(self.detector, TiledDetector) and transport is None:
+                stats = self.detector.get_stats()
+                print(f"TILED DETECTION: {stats['tiles_per_frame']} TILES/FRAME, +{stats['extra_ms_per_frame']}MS/FRAME ({stats['extra_compute']}x THE FULL-FRAME PASS), {stats['from_tiles']} OF {stats['detections']} DETECTIONS FROM TILES")
+            if controller is not None:
+                stats = controller.get_stats()
+                print(f"SAMPLE RATE: MEAN {stats['mean_rate']} FPS (RANGE {stats['min_rate']}-{stats['max_rate']}), {stats['cost_ms']}MS PER FRAME")
             print("ALL FRAMES SAVED")
             print("VIDEO THREAD FINISHED")
-            self.video_queue.put(True)
+            return True
             
         except Exception as e:
             print(f"ERROR IN VIDEO PROCESSING: {str(e)}")
-            self.video_queue.put(False)
+            if transport is not None:
+                transport.stop()
+            return False
+
+    def detected_frames(self, decoder, transport=None):
+        """(FRAME_INDEX, TIMESTAMP, ANNOTATED FRAME, TRACKER) IN DECODE ORDER - IN PROCESS OR VIA DETECTOR PROCESSES"""
+        if transport is None:
+            for frame_index, timestamp, frame in decoder:
+                processed_frame, tracker = self.detect_frame(frame)
+                yield frame_index, timestamp, processed_frame, tracker
+            return
+        for frame_index, timestamp, frame in decoder:
+            # HASH AND SCORE HERE BEFORE BOXES ARE DRAWN - WORKERS ONLY RETURN DETECTIONS
+            with METRICS.span("pipeline.frame_hash"):
+                frame_hash = dhash(frame)
+            with METRICS.span("pipeline.frame_quality"):
+                quality = score_frame(frame)
+            transport.submit(frame, (frame_index, timestamp, frame_hash, quality))
+            for result in transport.ready():
+                yield self.finish_remote_frame(*result)
+        for result in transport.drain():
+            yield self.finish_remote_frame(*result)
+
+    def finish_remote_frame(self, frame, meta, detections):
+        """DRAW A DETECTOR PROCESS'S RESULTS ONTO ITS SHARED SLOT AND BUILD THE TRACKER"""
+        frame_index, timestamp, frame_hash, quality = meta
+        boxes, class_ids, confidences = detections
+        tracker = annotate_detections(frame, boxes, class_ids, confidences, self.classes, self.colors)
+        tracker.frame_hash = frame_hash
+        tracker.quality = quality
+        return frame_index, timestamp, frame, tracker
+
+    def _save_done(self, future):
+        with self.pending_lock:
+            self.pending_saves -= 1
+
+    def restore_trackers(self, trackers):
+        """LOAD TRACKERS (E.G. FROM A CHECKPOINT) AND REBUILD THE INDEXES"""
+        self.trackers = list(trackers)
+        self.detected_objects = set()
+        self.temporal_index.clear()
+        if self.payload_cache is not None:
+            self.payload_cache.clear()
+        for tracker in self.trackers:
+            self.detected_objects.update(tracker.object_counts.keys())
+            self.temporal_index.add(tracker)
+
+    def compact_history(self):
+        """FOLD TRACKERS OLDER THAN THE RETENTION WINDOW INTO SUMMARIES, DROP THEIR OTHER FRAMES"""
+        # FINISHED SAVES ARE NO LONGER NEEDED
+        self.frame_futures = [f for f in self.frame_futures if not f.done()]
+        if self.retention is None:
+            return
+        kept = self.retention.compact(self.trackers, self.frame_storage)
+        if len(kept) == len(self.trackers):
+            return
+
+        # SWAP IN NEW OBJECTS SO CONCURRENT QUESTIONS SEE A CONSISTENT VIEW
+        index = TemporalIndex(self.temporal_index.max_gap)
+        for tracker in self.retention.representatives() + kept:
+            index.add(tracker)
+        self.trackers = kept
+        self.temporal_index = index
+        print(f"COMPACTED HISTORY: {len(kept)} FRAMES IN FULL DETAIL, {self.retention.get_stats()}")
+
+    def searchable_trackers(self):
+        """RECENT TRACKERS PLUS REPRESENTATIVE FRAMES OF COMPACTED FOOTAGE"""
+        if self.retention is None or not self.retention.segments:
+            return self.trackers
+        return self.retention.representatives() + self.trackers
+
+    def history_summary(self, relevant_objects=None):
+        """TEXT SUMMARY OF COMPACTED FOOTAGE FOR PROMPTS, NONE WITHOUT RETENTION"""
+        if self.retention is None:
+            return None
+        objects = [o for o in (relevant_objects or []) if o != "no relevant object found"]
+        return self.retention.describe(objects or None)
+
+    def trackers_between(self, start=None, end=None):
+        """PROCESSED FRAMES WITH start <= TIMESTAMP <= end (SECONDS)"""
+        return self.temporal_index.frames_between(start, end)
+
+    def get_best_frames_between(self, target_object, start=None, end=None, n=3):
+        """BEST N FRAME IDS FOR A CLASS INSIDE A TIME RANGE"""
+        trackers = self.temporal_index.best_frames(target_object, start, end, n, self.quality_weight)
+        return [t.image_ids[0] for t in trackers if t.image_ids]
+
+    def get_frames_for_objects_between(self, relevant_objects, start=None, end=None, max_frames=3):
+        """SAME AS get_frames_for_objects, RESTRICTED TO A TIME RANGE"""
+        return self.get_frames_for_objects(relevant_objects, max_frames, trackers=self.trackers_between(start, end))
+
+    def first_last_appearances(self):
+        """{CLASS: (FIRST SEEN, LAST SEEN)} IN SECONDS"""
+        first_last = self.temporal_index.first_last()
+        # SUMMARIES REMEMBER EXACT TIMES EVEN AFTER NON-REPRESENTATIVE FRAMES ARE GONE
+        if self.retention is not None:
+            for object_class, entry in self.retention.class_history().items():
+                first, last = first_last.get(object_class, (entry["first_seen"], entry["last_seen"]))
+                first_last[object_class] = (min(first, entry["first_seen"]), max(last, entry["last_seen"]))
+        return dict(sorted(first_last.items()))
+
+    def objects_seen_between(self, start=None, end=None):
+        """{CLASS: [APPEARANCE INTERVALS]} FOR CLASSES IN VIEW DURING [start, end]"""
+        return {c: [a.to_dict() for a in self.temporal_index.appearances_between(c, start, end)] for c in self.temporal_index.classes_between(start, end)}
+
+    def trackers_for_question(self, question, trackers=None):
+        """NARROW TO THE TIME WINDOW A QUESTION REFERS TO ("10 SECONDS AGO") - NONE IF IT HAS NONE"""
+        window = parse_time_window(question)
+        if window is None:
+            return None
+        if trackers is None:
+            end_time = self.temporal_index.end_time()
+            if end_time is None:
+                return None
+            start, end = end_time - window[0], end_time - window[1]
+            in_range = self.temporal_index.frames_between(start, end)
+        else:
+            timed = [t for t in trackers if t.timestamp is not None]
+            if not timed:
+                return None
+            end_time = max(t.timestamp for t in timed)
+            start, end = end_time - window[0], end_time - window[1]
+            in_range = [t for t in timed if start <= t.timestamp <= end]
+
+        if not in_range:
+            print(f"NO FRAMES BETWEEN {start:.1f}s AND {end:.1f}s, USING ALL FRAMES")
+            return None
+        print(f"TIME WINDOW {max(0.0, start):.1f}s - {end:.1f}s: {len(in_range)} FRAMES")
+        return in_range
+
+    def most_seen_objects(self, trackers, n=3):
+        """CLASSES IN THE MOST FRAMES - STAND-IN WHEN THE QUESTION NAMES NO OBJECT"""
+        frames_per_class = defaultdict(int)
+        for tracker in trackers:
+            for object_class in tracker.object_counts:
+                frames_per_class[object_class] += 1
+        return sorted(frames_per_class, key=frames_per_class.get, reverse=True)[:n]
 
     def get_top_frames(self, target_object, n=3):
         """GET BEST N FRAMES BY CONFIDENCE"""
-        if not self.trackers:
+        trackers = self.searchable_trackers()
+        if not trackers:
             return []
         
         # SET TARGET OBJECT FOR ALL TRACKERS
-        temp_trackers = self.trackers.copy()
+        temp_trackers = list(trackers)
         for tracker in temp_trackers:
             tracker.set_target_object(target_object)
         
@@ -136,18 +430,23 @@ class VideoPipeline:
         
         return top_frames[:n]
 
-    def get_frames_for_objects(self, relevant_objects, max_frames=3):
+    def get_frames_for_objects(self, relevant_objects, max_frames=3, trackers=None, min_hamming=NEAR_DUPLICATE_DISTANCE):
         """GET ONE FRAME FOR EACH OBJECT, OR RANDOM FRAMES IF OBJECT NOT FOUND"""
-        if not self.trackers:
+        trackers = self.searchable_trackers() if trackers is None else trackers
+        if not trackers:
             return []
         
         selected_frames = []
         used_frame_ids = set()  # AVOID DUPLICATES
+        selected_hashes = []  # AVOID NEAR-DUPLICATES
+
+        def is_redundant(tracker):
+            return is_near_duplicate(tracker.frame_hash, selected_hashes, min_hamming)
         
         for obj in relevant_objects[:max_frames]:  # LIMIT TO MAX_FRAMES
             if obj == "no relevant object found":
                 # GET RANDOM FRAME THAT HASN'T BEEN USED
-                available_trackers = [t for t in self.trackers if t.image_ids and not any(img_id in used_frame_ids for img_id in t.image_ids)]
+                available_trackers = [t for t in trackers if t.image_ids and not any(img_id in used_frame_ids for img_id in t.image_ids) and not is_redundant(t)]
                 if available_trackers:
                     import random
                     random_tracker = random.choice(available_trackers)
@@ -155,34 +454,46 @@ class VideoPipeline:
                         frame_id = random_tracker.image_ids[0]
                         selected_frames.append(frame_id)
                         used_frame_ids.add(frame_id)
+                        selected_hashes.append(random_tracker.frame_hash)
                         print(f"Random frame for unknown object: {frame_id}")
             else:
-                # GET BEST FRAME FOR THIS SPECIFIC OBJECT
-                best_tracker = None
-                best_confidence = 0
-                
-                for tracker in self.trackers:
+                # GET BEST FRAME FOR THIS SPECIFIC OBJECT - CONFIDENCE DISCOUNTED FOR BLUR / BAD EXPOSURE
+                ranked = []
+                for tracker in trackers:
                     if obj in tracker.object_counts and tracker.image_ids:
                         # SKIP IF ALL FRAMES FROM THIS TRACKER ALREADY USED
                         if all(img_id in used_frame_ids for img_id in tracker.image_ids):
                             continue
                         
-                        confidence = tracker.average_confidences.get(obj, 0)
-                        if confidence > best_confidence:
-                            best_confidence = confidence
-                            best_tracker = tracker
-                
-                if best_tracker and best_tracker.image_ids:
+                        score = tracker.selection_score(obj, self.quality_weight)
+                        if score > 0:
+                            ranked.append((score, tracker))
+                ranked.sort(key=lambda entry: entry[0], reverse=True)
+
+                # BEST VIEW LOOKS LIKE A FRAME ALREADY SELECTED - DON'T PAY FOR IT TWICE, TAKE THE NEXT BEST
+                best_tracker = None
+                for rank, (score, tracker) in enumerate(ranked):
+                    if not is_redundant(tracker):
+                        best_tracker = tracker
+                        break
+                    METRICS.incr("pipeline.near_duplicates_skipped")
+                    if rank == 0:
+                        print(f"Best frame for {obj} is a near-duplicate of a selected frame, trying the next best")
+                if ranked and best_tracker is None:
+                    print(f"Every frame of {obj} is a near-duplicate of a selected frame, skipping")
+                elif best_tracker and best_tracker.image_ids:
                     # GET FIRST UNUSED FRAME FROM BEST TRACKER
                     for frame_id in best_tracker.image_ids:
                         if frame_id not in used_frame_ids:
                             selected_frames.append(frame_id)
                             used_frame_ids.add(frame_id)
-                            print(f"Best frame for {obj}: {frame_id} (confidence: {best_confidence:.3f})")
+                            selected_hashes.append(best_tracker.frame_hash)
+                            quality = best_tracker.quality["score"] if best_tracker.quality else None
+                            print(f"Best frame for {obj}: {frame_id} (confidence: {best_tracker.average_confidences.get(obj, 0):.3f}, quality: {quality})")
                             break
                 else:
                     # OBJECT NOT FOUND - GET RANDOM FRAME
-                    available_trackers = [t for t in self.trackers if t.image_ids and not any(img_id in used_frame_ids for img_id in t.image_ids)]
+                    available_trackers = [t for t in trackers if t.image_ids and not any(img_id in used_frame_ids for img_id in t.image_ids) and not is_redundant(t)]
                     if available_trackers:
                         import random
                         random_tracker = random.choice(available_trackers)
@@ -190,11 +501,12 @@ class VideoPipeline:
                             frame_id = random_tracker.image_ids[0]
                             selected_frames.append(frame_id)
                             used_frame_ids.add(frame_id)
+                            selected_hashes.append(random_tracker.frame_hash)
                             print(f"Random frame for missing {obj}: {frame_id}")
         
         # FILL WITH RANDOM FRAMES IF LESS THAN MAX_FRAMES
         # while len(selected_frames) < max_frames:
-        #     available_trackers = [t for t in self.trackers if t.image_ids and not any(img_id in used_frame_ids for img_id in t.image_ids)]
+        #     available_trackers = [t for t in trackers if t.image_ids and not any(img_id in used_frame_ids for img_id in t.image_ids)]
         #     if available_trackers:
         #         import random
         #         random_tracker = random.choice(available_trackers)
@@ -241,31 +553,94 @@ class VideoPipeline:
         cv2.waitKey(0)
         cv2.destroyAllWindows()
 
-    def describe_objects_in_frames(self, frame_ids, user_question, relevant_objects=None):
-        """ANALYZE OBJECTS IN SELECTED FRAMES"""
-        images = []
-        successful_frames = []
-        
+    def describe_objects_in_frames(self, frame_ids, user_question, relevant_objects=None, frame_source=None, trackers=None):
+        """ANALYZE OBJECTS IN SELECTED FRAMES - trackers IS THE LIST THEY WERE SELECTED FROM"""
         # LOAD FRAMES
-        for frame_id in frame_ids:
-            image = self.frame_storage.get_frame(frame_id)
-            if image is not None:
-                images.append(image)
-                successful_frames.append(frame_id)
+        images, successful_frames = self.load_frames(frame_ids, relevant_objects, frame_source)
         
         if not images:
             return "Could not retrieve any images for analysis."
         
         print(f"Successfully loaded {len(images)} images: {successful_frames}")
         
+        METRICS.incr("pipeline.frames_described", len(images))
+        history = self.history_summary(relevant_objects)
+
+        # PACK INTO ONE LABELED GRID IMAGE
+        if self.payload_mode in ("mosaic", "crops"):
+            images, labels = self.build_mosaic_payload(images, successful_frames, relevant_objects, trackers)
+            prompt = get_collective_frames_prompt(user_question, relevant_objects, tile_labels=labels, history=history)
+            description = self.gpt.describe_multiple_images_collectively(images, prompt)
+            return description if description else "Failed to analyze images collectively."
+
         # GET COLLECTIVE ANALYSIS PROMPT WITH USER QUESTION
-        prompt = get_collective_frames_prompt(user_question, relevant_objects)
+        prompt = get_collective_frames_prompt(user_question, relevant_objects, history=history)
         
         # ANALYZE ALL IMAGES TOGETHER
         description = self.gpt.describe_multiple_images_collectively(images, prompt)
         
         return description if description else "Failed to analyze images collectively."
 
+    def load_frames(self, frame_ids, relevant_objects=None, frame_source=None):
+        """IMAGES FOR SELECTED FRAMES - CACHED ENCODED PAYLOADS WHEN POSSIBLE, ELSE FROM STORAGE"""
+        # CACHE KEYS ARE OUR OWN STORAGE IDS, AND MOSAICS NEED DECODED PIXELS
+        cache = self.payload_cache if (frame_source is None or frame_source is self.frame_storage) and self.payload_mode == "multi" else None
+        frame_source = self.frame_storage if frame_source is None else frame_source
+        images, loaded_ids = [], []
+        hits, saved_ms = 0, 0.0
+        start = time.perf_counter()
+        for frame_id in frame_ids:
+            payload = cache.lookup(frame_id, relevant_objects) if cache is not None else None
+            if payload is not None:
+                images.append(payload.image)
+                loaded_ids.append(frame_id)
+                hits += 1
+                saved_ms += payload.encode_ms
+                continue
+            image = frame_source.get_frame(frame_id)
+            if image is not None:
+                images.append(image)
+                loaded_ids.append(frame_id)
+        if cache is not None:
+            cache.hits += hits
+            cache.misses += len(frame_ids) - hits
+            METRICS.incr("payloads.hits", hits)
+            METRICS.incr("payloads.misses", len(frame_ids) - hits)
+            if hits:
+                METRICS.observe("payloads.encode_saved", saved_ms)
+                print(f"PAYLOAD CACHE: {hits}/{len(frame_ids)} FRAMES READY, LOADED IN {(time.perf_counter() - start) * 1000:.2f}MS "
+                      f"({saved_ms:.1f}MS OF ENCODING DONE AT INGEST, {hits} DISK READS SKIPPED)")
+        return images, loaded_ids
+
+    def find_tracker(self, frame_id, trackers=None):
+        """GET TRACKER THAT OWNS A STORED FRAME ID - SEARCH THE LIST THE FRAME WAS SELECTED FROM"""
+        # RETENTION REPRESENTATIVES AND LIVE-BUFFER FRAMES ARE NOT IN self.trackers
+        for tracker in self.searchable_trackers() if trackers is None else trackers:
+            if frame_id in tracker.image_ids:
+                return tracker
+        return None
+
+    def build_mosaic_payload(self, images, frame_ids, relevant_objects=None, trackers=None):
+        """TURN LOADED FRAMES (OR THEIR OBJECT CROPS) INTO ONE MOSAIC IMAGE"""
+        tiles = images
+        if self.payload_mode == "crops" and relevant_objects:
+            tiles = []
+            for image, frame_id in zip(images, frame_ids):
+                # CROP AROUND THE BEST BOX OF ANY RELEVANT OBJECT, ELSE KEEP FULL FRAME
+                tracker = self.find_tracker(frame_id, trackers)
+                box = None
+                if tracker is not None:
+                    for obj in relevant_objects:
+                        box = tracker.best_box(obj)
+                        if box is not None:
+                            break
+                tiles.append(crop_box(image, box) if box is not None else image)
+
+        labels = tile_labels(len(tiles))
+        with METRICS.span("pipeline.build_mosaic"):
+            mosaic = build_mosaic(tiles, labels, self.mosaic_pixel_budget)
+        return [mosaic], labels
+
     def answer_question_directly(self, question):
         """PROVIDE DIRECT FACTUAL ANSWER FOR QUESTIONS THAT DON'T NEED VIDEO"""
         prompt = get_direct_answer_prompt(question)
@@ -274,12 +649,132 @@ class VideoPipeline:
         answer = self.gpt.get_completion(prompt, system_role)
         return answer if answer else "Unable to provide an answer."
 
+    def answer_fused(self, question, trackers=None, frame_source=None):
+        """CLASSIFY AND ANSWER IN ONE VISION REQUEST - (ANSWER, CLASSIFICATION), NONE MEANS FALL BACK TO TWO CALLS"""
+        windowed = self.trackers_for_question(question, trackers)
+        trackers = windowed or (self.searchable_trackers() if trackers is None else trackers)
+        if not trackers:
+            return None
+
+        # CHEAP LOCAL PARSE INSTEAD OF THE CLASSIFICATION CALL
+        candidates = [c for c in parse_question_objects(question) if any(c in t.object_counts for t in trackers)]
+        if not candidates:
+            # "WHAT IS THIS?" NAMES NOTHING - USE WHAT WAS MOST IN VIEW (IN THE WINDOW, ELSE RECENTLY); THE MODEL STILL
+            # CLASSIFIES, SO A GENERAL-KNOWLEDGE QUESTION IS ANSWERED FROM TEXT IN THE SAME CALL
+            candidates = self.most_seen_objects(windowed or trackers[-FUSED_RECENT_FRAMES:])
+            METRICS.incr("pipeline.fused_recent_candidates")
+        if not candidates:
+            return None
+        selected_frames = self.get_frames_for_objects(candidates, 3, trackers=trackers)
+        if not selected_frames:
+            return None
+
+        images, loaded_ids = self.load_frames(selected_frames, candidates, frame_source)
+        if not images:
+            return None
+        print(f"Fused request with {len(images)} frames for {candidates}: {loaded_ids}")
+
+        labels = None
+        if self.payload_mode in ("mosaic", "crops"):
+            images, labels = self.build_mosaic_payload(images, loaded_ids, candidates, trackers)
+        prompt = get_fused_prompt(question, candidates, tile_labels=labels, history=self.history_summary(candidates))
+
+        result = self.gpt.get_json_vision_completion(images, prompt)
+        if not result or not result.get('answer'):
+            METRICS.incr("pipeline.fused_fallbacks")
+            return None
+        METRICS.incr("pipeline.fused_answers")
+        # RETURNED, NOT STORED - CONCURRENT ASKS SHARE THIS PIPELINE
+        return result['answer'], {'needs_video': result.get('needs_video', True), 'relevant_objects': result.get('relevant_objects', candidates)}
+
+    def answer_from_analysis(self, question, question_result, trackers=None, frame_source=None):
+        """ANSWER USING AN ALREADY CLASSIFIED QUESTION"""
+        if not question_result['needs_video']:
+            return self.answer_question_directly(question)
+
+        relevant_objects = question_result['relevant_objects']
+        windowed = self.trackers_for_question(question, trackers)
+        if windowed is not None:
+            trackers = windowed
+            # "WHAT DID I WALK PAST?" NAMES NOTHING - USE WHAT WAS IN VIEW THEN
+            if not relevant_objects or relevant_objects == ["no relevant object found"]:
+                relevant_objects = self.most_seen_objects(windowed) or ["no relevant object found"]
+                selected_frames = self.get_frames_for_objects(relevant_objects, 3, trackers=trackers)
+                if selected_frames:
+                    return self.describe_objects_in_frames(selected_frames, question, relevant_objects, frame_source=frame_source, trackers=trackers)
+        if relevant_objects and relevant_objects != ["no relevant object found"]:
+            selected_frames = self.get_frames_for_objects(relevant_objects, 3, trackers=trackers)
+            if selected_frames:
+                return self.describe_objects_in_frames(selected_frames, question, relevant_objects, frame_source=frame_source, trackers=trackers)
+        return f"Could not find frames for objects: {relevant_objects}"
+
+    def answer_question(self, question, trackers=None, frame_source=None, deadline=None):
+        """ANSWER ONE QUESTION AGAINST PROCESSED FRAMES (NO CONSOLE INPUT)"""
+        # EVERY GPT CALL BELOW SHARES ONE DEADLINE, COUNTED FROM NOW
+        with request_deadline(self.answer_deadline if deadline is None else deadline):
+            return self._answer_question(question, trackers, frame_source)
+
+    def _answer_question(self, question, trackers=None, frame_source=None):
+        if self.fused_mode:
+            fused = self.answer_fused(question, trackers=trackers, frame_source=frame_source)
+            if fused is not None:
+                return fused[0]
+
+        question_result = self.analyze_question(question)
+        if not question_result:
+            return "Failed to analyze question."
+        return self.answer_from_analysis(question, question_result, trackers=trackers, frame_source=frame_source)
+
+    def run_fused(self, video_path, wait_seconds=2.0):
+        """ONE ROUND TRIP WHEN VIDEO IS READY, CLASSIFY WHILE IT FINISHES OTHERWISE"""
+        print("\nSTARTING PIPELINE (FUSED)...")
+        video_thread = threading.Thread(target=self.process_video_to_queue, args=(video_path,))
+        video_thread.start()
+
+        print("\nEnter your question about the video:")
+        question = input().strip()
+        self.user_question = question
+
+        # SHORT GRACE PERIOD - MOST CLIPS FINISH WHILE THE USER IS TYPING
+        video_thread.join(timeout=wait_seconds)
+        if not video_thread.is_alive():
+            video_result = self.video_queue.get()
+            if video_result:
+                print("\nVIDEO READY - SKIPPING CLASSIFICATION, ONE VISION REQUEST...")
+                fused = self.answer_fused(question)
+                if fused is not None:
+                    answer, self.question_result = fused
+                else:
+                    question_result = self.analyze_question(question)
+                    answer = self.answer_from_analysis(question, question_result) if question_result else "Failed to analyze question."
+            else:
+                question_result = self.analyze_question(question)
+                answer = self.answer_question_directly(question) if question_result and not question_result['needs_video'] else "ERROR: Video analysis required but video processing failed"
+        else:
+            # OVERLAP CLASSIFICATION WITH THE REST OF THE VIDEO
+            print("\nVIDEO STILL PROCESSING - CLASSIFYING QUESTION MEANWHILE...")
+            question_result = self.analyze_question(question)
+            self.question_result = question_result
+            video_thread.join()
+            video_result = self.video_queue.get()
+            if not question_result:
+                answer = "Failed to analyze question."
+            elif question_result['needs_video'] and not video_result:
+                answer = "ERROR: Video analysis required but video processing failed"
+            else:
+                answer = self.answer_from_analysis(question, question_result)
+
+        print("\nANSWER:")
+        print("=" * 60)
+        print(answer)
+        print("=" * 60)
+
     def run(self, video_path):
         """MAIN PIPELINE EXECUTION"""
         print("\nSTARTING PIPELINE...")
         print("STARTING VIDEO PROCESSING THREAD...")
         # START VIDEO THREAD
-        video_thread = threading.Thread(target=self.process_video, args=(video_path,))
+        video_thread = threading.Thread(target=self.process_video_to_queue, args=(video_path,))
         video_thread.start()
         
         print("STARTING QUESTION THREAD...")
@@ -341,13 +836,167 @@ class VideoPipeline:
         else:
             print("ERROR: PIPELINE FAILED")
 
+    def answer_live(self, live, question):
+        """ANSWER QUESTION AGAINST WHAT IS IN VIEW RIGHT NOW"""
+        question_result = self.analyze_question(question)
+        if not question_result:
+            return "Failed to analyze question."
+
+        if not question_result['needs_video']:
+            return self.answer_question_directly(question)
+
+        # ONLY LOOK AT THE RECENT WINDOW
+        entries = live.snapshot()
+        if not entries:
+            return "Nothing in view yet."
+        trackers = [entry[3] for entry in entries]
+
+        relevant_objects = question_result['relevant_objects']
+        selected_frames = []
+        if relevant_objects and relevant_objects != ["no relevant object found"]:
+            selected_frames = self.get_frames_for_objects(relevant_objects, 3, trackers=trackers)
+
+        # FALL BACK TO THE NEWEST FRAME
+        if not selected_frames:
+            selected_frames = [entries[-1][1]]
+
+        return self.describe_objects_in_frames(selected_frames, question, relevant_objects, frame_source=live.buffer, trackers=trackers)
+
+    def run_live(self, source, window_seconds=10, max_fps=10):
+        """LIVE PIPELINE - ANSWER QUESTIONS WHILE INGESTING"""
+        print(f"\nSTARTING LIVE INGEST FROM {source}...")
+        live = LiveIngest(source, self.detect_frame, window_seconds, max_fps)
+        live.start()
+
+        ingest_ended = False
+        try:
+            # KEEP ASKING AFTER A FILE SOURCE HITS EOF - ONLY 'quit' OR A CLOSED STDIN ENDS THE SESSION
+            while True:
+                if not live.is_running() and not ingest_ended:
+                    ingest_ended = True
+                    if live.error and not len(live.buffer):
+                        print(f"LIVE INGEST FAILED BEFORE ANY FRAME: {live.error}")
+                        break
+                    print(f"\nINGEST FINISHED - QUESTIONS NOW COVER THE LAST {window_seconds}s BEFORE IT ENDED")
+                print("\nEnter your question about what is in view (or 'quit' to exit):")
+                try:
+                    question = input().strip()
+                except EOFError:
+                    break
+                if question.lower() in ('quit', 'exit'):
+                    break
+                if not question:
+                    continue
+
+                answer = self.answer_live(live, question)
+                print("\nANSWER:")
+                print("=" * 60)
+                print(answer)
+                print("=" * 60)
+                print(f"INGEST STATS: {live.get_stats()}")
+        finally:
+            live.stop()
+            print(f"LIVE INGEST STOPPED: {live.get_stats()}")
+
 if __name__ == "__main__":
+    import argparse
+
     # SET YOUR VIDEO PATH HERE
     VIDEO_PATH = "tesla.mp4"  # REPLACE WITH YOUR VIDEO PATH
+
+    parser = argparse.ArgumentParser(description="Smart glasses video QA pipeline")
+    parser.add_argument("video", nargs="?", default=VIDEO_PATH, help="video file to process")
+    parser.add_argument("--live", help="live source: device index, RTSP/HTTP URL, or file replayed in real time")
+    parser.add_argument("--window", type=float, default=10, help="seconds of recent frames kept in live mode")
+    parser.add_argument("--max-fps", type=float, default=10, help="max detection rate in live mode")
+    parser.add_argument("--target-fps", type=float, default=10, help="frames per second of video sent to the detector")
+    parser.add_argument("--adaptive-fps", action="store_true", help="adjust the sampling rate to keep up with the video")
+    parser.add_argument("--min-fps", type=float, default=2, help="lowest sampling rate for --adaptive-fps")
+    parser.add_argument("--max-sample-fps", type=float, default=30, help="highest sampling rate for --adaptive-fps")
+    parser.add_argument("--realtime-factor", type=float, default=1.0, help="throughput target for --adaptive-fps, in video seconds per wall second")
+    parser.add_argument("--max-lag", type=float, default=2.0, help="seconds behind the throughput target before --adaptive-fps backs off")
+    parser.add_argument("--rate-log", help="write the --adaptive-fps rate history (last 10000 updates) to this CSV")
+    parser.add_argument("--decode-scale", type=float, default=1.0, help="downscale factor applied to sampled frames")
+    parser.add_argument("--threaded-decode", action="store_true", help="decode on a dedicated thread")
+    parser.add_argument("--decoder", choices=["opencv", "pyav"], default="opencv", help="pyav uses FFmpeg threaded decoding")
+    parser.add_argument("--buffer-pool", action="store_true", help="reuse preallocated frame, blob and detection buffers")
+    parser.add_argument("--detector", choices=DETECTOR_BACKENDS, default="opencv", help="detection backend")
+    parser.add_argument("--detector-model", help="ONNX model path for --detector onnx")
+    parser.add_argument("--int8", action="store_true", help="INT8 dynamic quantization for --detector onnx")
+    parser.add_argument("--onnx-format", choices=YOLO_FORMATS, default="yolov5", help="raw YOLO ONNX export: yolov5 (pixel boxes, separate objectness) or darknet (normalized boxes, scores include objectness)")
+    parser.add_argument("--detector-threads", type=int, help="CPU threads for onnx/torch backends")
+    parser.add_argument("--detector-processes", type=int, default=0, help="run detection in this many processes, frames passed through shared memory")
+    parser.add_argument("--tiles", type=int, default=0, help="max extra high-resolution tile passes per frame around small / uncertain detections (0 = off)")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE, help="native pixels per side of a --tiles tile")
+    parser.add_argument("--roi", type=parse_roi, help="X,Y frame fractions always given a --tiles tile, e.g. 0.5,0.5 for the gaze center")
+    parser.add_argument("--tile-budget-ms", type=float, help="extra ms per frame --tiles may spend")
+    parser.add_argument("--payload", choices=["multi", "mosaic", "crops"], default="multi", help="send frames as separate images, one mosaic, or a mosaic of object crops")
+    parser.add_argument("--payload-cache", action="store_true", help="keep the best frame per class encoded during ingest")
+    parser.add_argument("--payload-crop", action="store_true", help="cache a crop around each class instead of the whole frame")
+    parser.add_argument("--quality-weight", type=float, default=QUALITY_WEIGHT, help="how much blur / bad exposure lowers a frame's selection score (0 = confidence only)")
+    parser.add_argument("--fused", action="store_true", help="classify and answer in one vision request once frames are ready")
+    parser.add_argument("--retain-seconds", type=float, help="keep full detail for this many recent seconds, summarize older footage")
+    parser.add_argument("--segment-seconds", type=float, default=60, help="summary segment length for --retain-seconds")
+    parser.add_argument("--max-segments", type=int, default=240, help="merge oldest summaries beyond this many")
+    parser.add_argument("--deadline", type=float, help="seconds GPT calls may take to answer a question")
+    parser.add_argument("--hedge", action="store_true", help="duplicate GPT requests slower than the observed p95, keep the first answer")
+    parser.add_argument("--metrics-out", help="enable metrics and write them here on exit (.prom/.txt for Prometheus text, JSON otherwise)")
+    args = parser.parse_args()
+
+    if args.metrics_out:
+        METRICS.enable()
+    
+    model = None
+    if args.detector != "opencv":
+        # NO DARKNET WEIGHTS NEEDED - KEEP CLASS NAMES AND COLORS FOR DRAWING
+        with open("coco.names", "r") as f:
+            classes = [line.strip() for line in f.readlines()]
+        model = (None, classes, np.random.uniform(0, 255, size=(len(classes), 3)), [])
     
-    pipeline = VideoPipeline()
+    pipeline = VideoPipeline(model=model, payload_mode=args.payload)
+    if args.detector != "opencv":
+        pipeline.detector = load_detector(args.detector, pipeline.classes, model_path=args.detector_model, quantize=args.int8, threads=args.detector_threads, yolo_format=args.onnx_format)
+    if args.detector_processes:
+        pipeline.detector_processes = args.detector_processes
+        pipeline.detector_factory = partial(load_detector, args.detector, model_path=args.detector_model, quantize=args.int8, threads=args.detector_threads, yolo_format=args.onnx_format)
+    if args.tiles:
+        # LOW-RES PASS WITH WHICHEVER BACKEND IS CONFIGURED, THEN TILES
+        tiling = dict(tile_size=args.tile_size, max_tiles=args.tiles, roi=args.roi, max_extra_ms=args.tile_budget_ms)
+        base = pipeline.detector or OpenCVDetector(pipeline.net, pipeline.classes, pipeline.output_layers)
+        pipeline.detector = TiledDetector(base, **tiling)
+        if args.detector_processes:
+            pipeline.detector_factory = partial(load_tiled_detector, pipeline.detector_factory, **tiling)
+    pipeline.target_fps = args.target_fps
+    if args.adaptive_fps:
+        pipeline.rate_controller = AdaptiveRateController(
+            args.min_fps, args.max_sample_fps, args.target_fps, realtime_factor=args.realtime_factor, max_lag=args.max_lag
+        )
+    pipeline.decode_scale = args.decode_scale
+    pipeline.decode_threaded = args.threaded_decode
+    pipeline.decode_backend = args.decoder
+    pipeline.use_buffer_pool = args.buffer_pool
+    pipeline.fused_mode = args.fused
+    pipeline.quality_weight = args.quality_weight
+    pipeline.answer_deadline = args.deadline
+    if args.hedge:
+        pipeline.gpt.enable_hedging()
+    if args.payload_cache:
+        pipeline.payload_cache = PayloadCache(crop=args.payload_crop, quality_weight=args.quality_weight)
+    if args.retain_seconds:
+        pipeline.retention = FrameRetention(args.retain_seconds, args.segment_seconds, max_segments=args.max_segments, quality_weight=args.quality_weight)
     
-    if not Path(VIDEO_PATH).exists():
+    if args.live is not None:
+        pipeline.run_live(args.live, args.window, args.max_fps)
+    elif not Path(args.video).exists():
         print("ERROR: VIDEO FILE NOT FOUND")
+    elif args.fused:
+        pipeline.run_fused(args.video)
     else:
-        pipeline.run(VIDEO_PATH) 
\ No newline at end of file
+        pipeline.run(args.video)
+
+    if args.rate_log and pipeline.rate_controller is not None:
+        pipeline.rate_controller.write_log(args.rate_log)
+        print(f"RATE LOG WRITTEN TO {args.rate_log}")
+    if args.metrics_out:
+        METRICS.dump(args.metrics_out)
+        print(f"METRICS WRITTEN TO {args.metrics_out}") 
\ No newline at end of file
@@ -1,5 +1,10 @@
 import os
+import re
+import sys
+import argparse
 from gpt_handler import GPTHandler
+from metrics import METRICS
+from request_scheduler import estimate_text_tokens
 
 # COCO CLASSES (80 OBJECTS)
 COCO_CLASSES = [
@@ -15,63 +20,105 @@ COCO_CLASSES = [
     'book', 'clock', 'vase', 'scissors', 'teddy bear', 'hair drier', 'toothbrush'
 ]
 
-def get_initial_prompt(USER_QUESTION):
-    """DETERMINE IF QUESTION REQUIRES VIDEO ANALYSIS FROM SMARTGLASSES"""
-    return f"""Analyze whether this question requires video analysis based on these STRICT rules:
+# COMMON NAMES THAT MAP STRAIGHT ONTO A COCO CLASS
+OBJECT_SYNONYMS = {
+    'people': 'person', 'man': 'person', 'men': 'person', 'woman': 'person', 'women': 'person',
+    'guy': 'person', 'girl': 'person', 'boy': 'person', 'kid': 'person', 'child': 'person', 'children': 'person',
+    'bike': 'bicycle', 'motorbike': 'motorcycle', 'plane': 'airplane', 'jet': 'airplane', 'ship': 'boat',
+    'tesla': 'car', 'suv': 'car', 'sedan': 'car', 'vehicle': 'car', 'puppy': 'dog', 'kitten': 'cat',
+    'phone': 'cell phone', 'iphone': 'cell phone', 'smartphone': 'cell phone', 'mobile': 'cell phone',
+    'television': 'tv', 'monitor': 'tv', 'computer': 'laptop', 'macbook': 'laptop', 'sofa': 'couch',
+    'table': 'dining table', 'plant': 'potted plant', 'fridge': 'refrigerator', 'mug': 'cup', 'glass': 'wine glass',
+    'ball': 'sports ball', 'football': 'sports ball', 'soccer': 'sports ball', 'bag': 'handbag', 'purse': 'handbag',
+    'doughnut': 'donut', 'hotdog': 'hot dog', 'teddy': 'teddy bear', 'hairdryer': 'hair drier',
+}
+
+# EVERY WORD A MATCH CAN USE - PLURALS ARE CHECKED AGAINST THIS BEFORE GUESSING
+OBJECT_WORDS = {part for coco_class in COCO_CLASSES for part in coco_class.split()} | set(OBJECT_SYNONYMS)
+
+def singularize(word):
+    """KNOWN OBJECT WORD IF ONE OF THE PLURAL STRIPS GIVES ONE ("buses" -> "bus", "horses" -> "horse"), ELSE A SUFFIX RULE"""
+    if word in OBJECT_WORDS or not word.endswith("s"):
+        return word
+    stems = [word[:-3] + "y"] if word.endswith("ies") else []
+    stems += [word[:-2], word[:-1]] if word.endswith("es") else [word[:-1]]
+    for stem in stems:
+        if stem in OBJECT_WORDS:
+            return stem
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "sses", "xes", "zes")):
+        return word[:-2]
+    if not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+def parse_question_objects(question):
+    """CHEAP LOCAL MATCH OF QUESTION WORDS TO COCO CLASSES (NO GPT CALL)"""
+    words = re.findall(r"[a-z]+", question.lower())
+    singular = [singularize(word) for word in words]
+    text = " " + " ".join(singular) + " "
+    raw_text = " " + " ".join(words) + " "
 
-1. VIDEO ANALYSIS REQUIRED WHEN (ANY):
-   - Demonstrative pronouns ("this/that/these/those")
-   - Definite articles ("the") with physical objects
-   - Possessive context ("my/your/our") with objects
-   - Location words ("here/there/current")
-   - Visual commands ("identify/read/describe")
+    found = []
+    # MULTI-WORD CLASSES FIRST SO "cell phone" BEATS "phone"
+    for coco_class in sorted(COCO_CLASSES, key=len, reverse=True):
+        if f" {coco_class} " in text or f" {coco_class} " in raw_text:
+            found.append(coco_class)
+            text = text.replace(f" {coco_class} ", " ")
+            raw_text = raw_text.replace(f" {coco_class} ", " ")
+    for word in text.split() + raw_text.split():
+        coco_class = OBJECT_SYNONYMS.get(word)
+        if coco_class and coco_class not in found:
+            found.append(coco_class)
+    return found
 
-2. GENERAL KNOWLEDGE WHEN:
-   - No reference to physically present objects
-   - Abstract/historical questions
+# "N SECONDS AGO", "IN THE LAST 2 MINUTES", "JUST NOW"
+TIME_UNITS = {'second': 1, 'sec': 1, 'minute': 60, 'min': 60, 'hour': 3600}
+NUMBER_WORDS = {'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'ten': 10, 'few': 5, 'couple': 2, 'thirty': 30, 'fifteen': 15, 'twenty': 20}
+
+def parse_time_window(question):
+    """LOCAL PARSE OF A RELATIVE TIME REFERENCE - (START_AGO, END_AGO) IN SECONDS OR NONE"""
+    text = question.lower()
+    match = re.search(r"(?:(\d+(?:\.\d+)?)|\b(a|an|one|two|three|four|five|ten|fifteen|twenty|thirty|few|couple)(?: of)?)\s*(second|sec|minute|min|hour)s?\b", text)
+    if match:
+        amount = float(match.group(1)) if match.group(1) else NUMBER_WORDS[match.group(2)]
+        seconds = amount * TIME_UNITS[match.group(3)]
+        # "IN THE LAST N SECONDS" = WHOLE WINDOW UP TO NOW
+        ago = text[match.end():].lstrip().startswith("ago")
+        if not ago and re.search(r"\b(last|the past|previous)\s*$", text[:match.start()]):
+            return seconds, 0.0
+        # "N SECONDS AGO" = A WINDOW AROUND THAT MOMENT
+        half_window = max(1.0, seconds * 0.25)
+        return seconds + half_window, max(0.0, seconds - half_window)
+    if re.search(r"\b(just now|a moment ago|just (?:saw|see|pass|passed|walk|walked|went|drove|looked))\b", text):
+        return 6.0, 0.0
+    return None
+
+# COMMA-SEPARATED CLASS LIST - A PYTHON LIST REPR SPENDS A QUOTE PAIR ON EVERY CLASS
+COCO_CLASS_LIST = ", ".join(COCO_CLASSES)
+
+# EACH TEMPLATE IS A STABLE PREFIX (IDENTICAL ON EVERY REQUEST, SO PROVIDER PROMPT CACHING
+# CAN REUSE IT) FOLLOWED BY A SHORT SUFFIX HOLDING EVERYTHING THAT CHANGES PER REQUEST
+INITIAL_PREFIX = f"""Analyze whether the user question at the end requires video analysis based on these STRICT rules:
+
+1. VIDEO ANALYSIS REQUIRED WHEN (ANY): demonstrative pronouns ("this/that/these/those"); definite articles ("the") with physical objects; possessive context ("my/your/our") with objects; location words ("here/there/current"); visual commands ("identify/read/describe")
+2. GENERAL KNOWLEDGE WHEN: no reference to physically present objects; abstract/historical questions
 
 OBJECT HANDLING RULES:
-1. ONLY match objects to COCO classes if they are EXTREMELY similar:
-   - "Tesla" -> "car" (specific brand)
-   - "iPhone" -> "cell phone" (specific product)
-   - "Labrador" -> "dog" (specific breed)
-   - "sparrow" -> "bird" (specific species)
-2. DO NOT match loosely related concepts:
-   - "grass" is NOT related to "sheep"
-   - "road" is NOT related to "car"
-   - "furniture" is NOT related to "chair"
-3. If no EXTREMELY close match exists in {COCO_CLASSES}, return "no relevant object found"
+1. ONLY match objects to COCO classes if they are EXTREMELY similar: "Tesla" -> "car" (brand), "iPhone" -> "cell phone" (product), "Labrador" -> "dog" (breed), "sparrow" -> "bird" (species)
+2. DO NOT match loosely related concepts: "grass" is NOT "sheep", "road" is NOT "car", "furniture" is NOT "chair"
+3. If no EXTREMELY close match exists in the COCO classes below, return "no relevant object found"
 4. Convert plurals to singular (cars -> car, people -> person)
 5. Return empty list for relevant_objects when needs_video is false
 
-USER QUESTION: "{USER_QUESTION}"
+COCO CLASSES: {COCO_CLASS_LIST}
 
 Return ONLY this JSON (NO explanations):
-{{
-    "needs_video": boolean,
-    "relevant_objects": ["exact-coco-class", "exact-coco-class"] or ["no relevant object found"] or []
-}}"""
+{{"needs_video": boolean, "relevant_objects": ["exact-coco-class", ...] or ["no relevant object found"] or []}}
+"""
 
-def get_collective_frames_prompt(user_question, relevant_objects=None):
-    """GENERATE PROMPT FOR ANALYZING MULTIPLE FRAMES TO ANSWER USER'S QUESTION"""
-    import re
-    
-    # SAFETY CHECKS FOR PLURALS AND COUNTS
-    def get_expected_counts(question):
-        """Extract expected counts of objects from question"""
-        counts = {}
-        words = question.lower().split()
-        for i, word in enumerate(words):
-            if word in ['these', 'those', 'the']:
-                if i + 1 < len(words) and words[i + 1].endswith('s'):
-                    base_word = words[i + 1].rstrip('s')
-                    counts[base_word] = 'multiple'
-        return counts
-    
-    expected_counts = get_expected_counts(user_question)
-    
-    # BUILD CONTEXT-AWARE PROMPT
-    prompt = f"""The user asked: "{user_question}"
+COLLECTIVE_PREFIX = """You are looking through the user's smart glasses. Answer the question at the end about what is currently in view.
 
 IMPORTANT CONTEXT:
 1. Focus on answering EXACTLY what the user asked about, regardless of what objects were used for frame selection
@@ -79,41 +126,178 @@ IMPORTANT CONTEXT:
 3. If you can't see what they asked about, be direct and honest about it
 
 RESPONSE STRUCTURE:
-1. FIRST LINE - DIRECT OBSERVATION:
-   - Start with "I'm seeing..." and describe exactly what you observe
-   - Include color, position, state, and any immediately visible details
-   - Keep this to a single sentence
+1. FIRST LINE - DIRECT OBSERVATION: start with "I'm seeing..." and describe exactly what you observe (color, position, state, visible details) in a single sentence.
    Example: "You are currently seeing a white Tesla car positioned at an angle, showing both the front and side of the vehicle."
-
-2. IDENTIFY SPECIFIC TYPE/MODEL:
-   - If you can identify a specific model/type/breed/variant, state it clearly
-   - Use a transition like "This appears to be..." or "I can identify this as..."
+2. IDENTIFY SPECIFIC TYPE/MODEL: if you can identify a specific model/type/breed/variant, state it clearly ("This appears to be..." or "I can identify this as...").
    Example: "This appears to be a Tesla Model X, the company's luxury SUV offering."
-
-3. GENERAL INFORMATION:
-   - Provide 2-3 interesting facts about that specific model/type
-   - Focus on notable features, specifications, or characteristics
-   - Use factual, informative tone
+3. GENERAL INFORMATION: 2-3 interesting facts about that specific model/type (notable features, specifications, characteristics) in a factual, informative tone.
    Example: "The Tesla Model X is known for its distinctive falcon-wing doors and was first introduced in 2015. It features all-wheel drive capability and can seat up to seven passengers."
+4. MAINTAIN NATURAL CONVERSATION: use real-time perspective throughout and end with an invitation for more specific questions if appropriate. If you can't see what they asked about: "I don't see [what they asked about] in my current view. Feel free to point me towards it if you'd like me to take a look!"
+"""
 
-4. MAINTAIN NATURAL CONVERSATION:
-   - Use real-time perspective throughout
-   - End with an invitation for more specific questions if appropriate
-   - If you can't see what they asked about: "I don't see [what they asked about] in my current view. Feel free to point me towards it if you'd like me to take a look!"
+FUSED_PREFIX = f"""You are a smart-glasses assistant. The attached image(s) show what the glasses currently see. Classify the user question at the end and answer it.
 
-Through my smart glasses, I'll analyze what's currently in view regarding what you asked about."""
-    
-    return prompt
+STEP 1 - DECIDE needs_video:
+- true if the question refers to something physically present ("this/that/these/those", "the" + object, "my/your/our" + object, "here/there/current", or "identify/read/describe")
+- false for general-knowledge, abstract or historical questions
+
+STEP 2 - relevant_objects:
+- The exact COCO class names the question is about, singular. COCO CLASSES: {COCO_CLASS_LIST}
+- ["no relevant object found"] if needs_video is true but nothing matches closely, [] if needs_video is false
+
+STEP 3 - answer:
+- If needs_video is true: start with "I'm seeing..." describing exactly what is visible (color, position, state), then identify the specific type/model if you can ("This appears to be..."), then give 2-3 interesting facts about it. If what they asked about is not visible say: "I don't see [it] in my current view. Feel free to point me towards it if you'd like me to take a look!"
+- If needs_video is false: ignore the images and give a direct factual answer in 1-2 sentences.
+
+Return ONLY this JSON:
+{{"needs_video": boolean, "relevant_objects": ["exact-coco-class"], "answer": "string"}}
+"""
+
+DIRECT_PREFIX = """Answer this question directly with factual information in simple, concise terms. Keep your response to 1-2 sentences and focus on key facts.
+"""
+
+PROMPT_PREFIXES = {
+    "initial": INITIAL_PREFIX,
+    "collective": COLLECTIVE_PREFIX,
+    "fused": FUSED_PREFIX,
+    "direct": DIRECT_PREFIX,
+}
+
+_TOKENIZER = []
+
+def get_tokenizer():
+    """tiktoken ENCODING WHEN INSTALLED, ELSE NONE"""
+    if not _TOKENIZER:
+        try:
+            import tiktoken
+            _TOKENIZER.append(tiktoken.get_encoding("cl100k_base"))
+        except Exception:
+            # NOT INSTALLED (OR NO ENCODING FILE OFFLINE) - FALL BACK TO THE SCHEDULER'S HEURISTIC
+            _TOKENIZER.append(None)
+    return _TOKENIZER[0]
+
+def count_tokens(text):
+    """EXACT COUNT WITH tiktoken WHEN INSTALLED, ELSE ~4 CHARACTERS PER TOKEN"""
+    tokenizer = get_tokenizer()
+    if tokenizer is None:
+        return estimate_text_tokens(text)
+    return len(tokenizer.encode(text))
+
+PREFIX_TOKENS = {}
+
+def build_prompt(name, suffix):
+    """PREFIX + SUFFIX, COUNTING TOKENS PER TEMPLATE FOR THE METRICS REPORT"""
+    if METRICS.enabled:
+        if name not in PREFIX_TOKENS:
+            PREFIX_TOKENS[name] = count_tokens(PROMPT_PREFIXES[name])
+        METRICS.incr(f"prompt.{name}.requests")
+        METRICS.incr(f"prompt.{name}.prefix_tokens", PREFIX_TOKENS[name])
+        METRICS.incr(f"prompt.{name}.suffix_tokens", count_tokens(suffix))
+    return PROMPT_PREFIXES[name] + suffix
+
+def get_initial_prompt(USER_QUESTION):
+    """DETERMINE IF QUESTION REQUIRES VIDEO ANALYSIS FROM SMARTGLASSES"""
+    return build_prompt("initial", f'\nUSER QUESTION: "{USER_QUESTION}"')
+
+def get_tile_section(tile_labels):
+    """MOSAIC PAYLOAD - ONE IMAGE MADE OF LABELED TILES"""
+    return f"""
+IMAGE LAYOUT: a grid of {len(tile_labels)} tiles ({", ".join(tile_labels)}), each a separate view from the glasses marked by the letter in its top-left corner. Treat them together as the current view; refer to a tile by its letter when it helps (e.g. "in tile B").
+"""
+
+def get_collective_frames_prompt(user_question, relevant_objects=None, tile_labels=None, history=None):
+    """GENERATE PROMPT FOR ANALYZING MULTIPLE FRAMES TO ANSWER USER'S QUESTION"""
+    suffix = ""
+    if tile_labels:
+        suffix += get_tile_section(tile_labels)
+    # OLDER FOOTAGE ONLY SURVIVES AS SUMMARIES
+    if history:
+        suffix += get_history_section(history)
+    suffix += f'\nThe user asked: "{user_question}"'
+    return build_prompt("collective", suffix)
+
+def get_history_section(history):
+    """SUMMARY OF COMPACTED FOOTAGE FOR WHOLE-DAY QUESTIONS"""
+    return f"""
+EARLIER FOOTAGE (SUMMARY ONLY, NO IMAGES):
+{history}
+Use this only for questions about earlier in the recording (how often, when first/last seen); describe the images for everything else.
+"""
+
+def get_fused_prompt(user_question, candidate_objects, tile_labels=None, history=None):
+    """ONE VISION REQUEST THAT DECIDES IF VIDEO IS NEEDED AND ANSWERS IN THE SAME CALL"""
+    candidates = ", ".join(candidate_objects) if candidate_objects else "none"
+    suffix = f"\nThe images were preselected for these detected objects: {candidates}.\n"
+    if tile_labels:
+        suffix += get_tile_section(tile_labels)
+    if history:
+        suffix += get_history_section(history)
+    suffix += f'\nThe user asked: "{user_question}"'
+    return build_prompt("fused", suffix)
 
 def get_direct_answer_prompt(question):
     """GENERATE PROMPT FOR DIRECT FACTUAL ANSWERS"""
-    return f"""Answer this question directly with factual information in simple, concise terms. Keep your response to 1-2 sentences and focus on key facts.
+    return build_prompt("direct", f"\nQuestion: {question}")
 
-Question: {question}
+# REPRESENTATIVE REQUESTS FOR THE SIZE REPORT - (TEMPLATE, DESCRIPTION, BUILDER)
+SAMPLE_QUESTION = "What model is this car?"
+SAMPLE_HISTORY = "car: seen 12 times between 09:14 and 11:02\nperson: seen 40 times between 08:55 and 11:30"
+# TOKEN CEILINGS USE THE ~4 CHARS/TOKEN ESTIMATE SO --check GIVES THE SAME ANSWER WITH OR WITHOUT tiktoken
+PROMPT_SAMPLES = [
+    # (TEMPLATE, REQUEST, BUILDER, TOKEN BUDGET)
+    ("initial", "question", lambda: get_initial_prompt(SAMPLE_QUESTION), 500),
+    ("collective", "frames", lambda: get_collective_frames_prompt(SAMPLE_QUESTION, ["car"]), 430),
+    ("collective", "mosaic + history", lambda: get_collective_frames_prompt(SAMPLE_QUESTION, ["car"], tile_labels=list("ABCD"), history=SAMPLE_HISTORY), 560),
+    ("fused", "frames", lambda: get_fused_prompt(SAMPLE_QUESTION, ["car", "person"]), 530),
+    ("fused", "mosaic + history", lambda: get_fused_prompt(SAMPLE_QUESTION, ["car", "person"], tile_labels=list("ABCD"), history=SAMPLE_HISTORY), 660),
+    ("direct", "question", lambda: get_direct_answer_prompt("Who invented the telephone?"), 50),
+]
+
+def prompt_report():
+    """TOKENS PER SAMPLE REQUEST, SPLIT INTO CACHEABLE PREFIX AND PER-REQUEST SUFFIX"""
+    rows = []
+    for name, description, build, budget in PROMPT_SAMPLES:
+        prompt = build()
+        prefix = PROMPT_PREFIXES[name]
+        assert prompt.startswith(prefix), f"{name} PROMPT NO LONGER STARTS WITH ITS STABLE PREFIX"
+        total = count_tokens(prompt)
+        prefix_tokens = count_tokens(prefix)
+        rows.append({
+            "template": name,
+            "request": description,
+            "prefix_tokens": prefix_tokens,
+            "suffix_tokens": total - prefix_tokens,
+            "total_tokens": total,
+            "estimated_tokens": estimate_text_tokens(prompt),
+            "budget": budget,
+        })
+    return rows
 
-Provide a clear, factual answer:"""
+def check_prompt_budgets():
+    """SAMPLE REQUESTS WHOSE (HEURISTIC, SO MACHINE-INDEPENDENT) SIZE EXCEEDS THE BUDGET"""
+    return [row for row in prompt_report() if row["estimated_tokens"] > row["budget"]]
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Try the classification prompt against GPT, or report / check prompt sizes")
+    parser.add_argument("--report", action="store_true", help="print tokens per template (prefix / suffix) and exit")
+    parser.add_argument("--check", action="store_true", help="exit non-zero if any template exceeds its token budget")
+    args = parser.parse_args()
+
+    if args.report or args.check:
+        print(f"TOKEN COUNTS FROM {'tiktoken' if get_tokenizer() is not None else '~4 CHARS PER TOKEN (tiktoken NOT INSTALLED)'}")
+        print(f"\n{'Template':<11} | {'Request':<17} | {'Prefix':>6} | {'Suffix':>6} | {'Total':>6} | {'Est.':>5} | {'Budget':>6}")
+        print("-" * 76)
+        for row in prompt_report():
+            print(f"{row['template']:<11} | {row['request']:<17} | {row['prefix_tokens']:>6} | {row['suffix_tokens']:>6} | {row['total_tokens']:>6} | {row['estimated_tokens']:>5} | {row['budget']:>6}")
+        if args.check:
+            over = check_prompt_budgets()
+            for row in over:
+                print(f"PROMPT SIZE REGRESSION: {row['template']} ({row['request']}) IS {row['estimated_tokens']} TOKENS, BUDGET {row['budget']}")
+            if not over:
+                print("\nALL PROMPTS WITHIN BUDGET")
+            sys.exit(1 if over else 0)
+        sys.exit(0)
+
     #INITIALIZE GPT
     GPT = GPTHandler()
     
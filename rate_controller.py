@@ -0,0 +1,115 @@
+import csv
+import time
+from collections import deque
+from metrics import METRICS
+from frame_hash import hamming_distance
+
+class AdaptiveRateController:
+    def __init__(self, min_fps=2, max_fps=30, initial_fps=10, realtime_factor=1.0, utilization=0.8,
+                 max_lag=2.0, max_backlog=20, scene_threshold=20, boost_factor=1.5, boost_seconds=2.0,
+                 max_step=0.25, smoothing=0.2, history_size=10000):
+        """FEEDBACK LOOP THAT PICKS THE SAMPLING RATE FROM MEASURED FRAME COST, LAG AND BACKLOG"""
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.rate = min(max(initial_fps, min_fps), max_fps)
+        # THROUGHPUT TARGET - VIDEO SECONDS PROCESSED PER WALL SECOND (1.0 = KEEP UP WITH REAL TIME)
+        self.realtime_factor = realtime_factor
+        # SHARE OF WALL TIME WE PLAN TO SPEND, HEADROOM FOR SAVES AND JITTER
+        self.utilization = utilization
+        # LATENCY TARGET - HOW FAR BEHIND REAL TIME WE MAY FALL (SECONDS)
+        self.max_lag = max_lag
+        self.max_backlog = max_backlog
+        # SCENE CHANGE BOOST - dhash DISTANCE BETWEEN CONSECUTIVE SAMPLED FRAMES
+        self.scene_threshold = scene_threshold
+        self.boost_factor = boost_factor
+        self.boost_seconds = boost_seconds
+        self.max_step = max_step
+        self.smoothing = smoothing
+
+        self.cost = None  # EWMA WALL SECONDS PER SAMPLED FRAME
+        self.start_wall = None
+        self.start_time = None
+        self.last_hash = None
+        self.boost_until = None
+        self.last_logged = self.rate
+        # LAST history_size UPDATES FOR THE CSV LOG - BOUNDED SO LIVE SESSIONS DON'T GROW FOREVER
+        self.history = deque(maxlen=history_size)  # (VIDEO TIME, RATE, COST MS, LAG S, BACKLOG, REASON)
+        # RUNNING AGGREGATES OVER EVERY UPDATE, NOT JUST THE RETAINED HISTORY
+        self.updates = 0
+        self.rate_sum = 0.0
+        self.min_rate = None
+        self.max_rate = None
+
+    def reset(self):
+        """NEW VIDEO - KEEP THE LEARNED COST AND RATE, RESTART THE CLOCKS"""
+        self.start_wall = None
+        self.start_time = None
+        self.last_hash = None
+        self.boost_until = None
+
+    def update(self, timestamp, frame_cost, backlog=0, frame_hash=None):
+        """FEED ONE SAMPLED FRAME'S COST, RETURN THE RATE FOR THE NEXT FRAMES"""
+        now = time.perf_counter()
+        if self.start_wall is None:
+            self.start_wall, self.start_time = now, timestamp
+        self.cost = frame_cost if self.cost is None else self.cost + self.smoothing * (frame_cost - self.cost)
+
+        # HOW FAR BEHIND THE THROUGHPUT TARGET WE ARE
+        lag = (now - self.start_wall) - (timestamp - self.start_time) / self.realtime_factor
+
+        # SUSTAINABLE RATE: rate * cost * realtime_factor <= utilization
+        capacity = self.utilization / (self.realtime_factor * max(self.cost, 1e-6))
+        desired = capacity
+        reason = "capacity"
+        if lag > self.max_lag:
+            # BEHIND - SAMPLE LESS UNTIL WE CATCH UP
+            desired *= 0.5
+            reason = "lag"
+        if backlog > self.max_backlog:
+            desired *= 0.75
+            reason = "backlog"
+
+        # FAST SCENE CHANGE - SAMPLE MORE FOR A WHILE, EVEN PAST CAPACITY
+        if frame_hash is not None and self.last_hash is not None and hamming_distance(frame_hash, self.last_hash) >= self.scene_threshold:
+            self.boost_until = timestamp + self.boost_seconds
+            METRICS.incr("rate.scene_changes")
+        if frame_hash is not None:
+            self.last_hash = frame_hash
+        if self.boost_until is not None and timestamp < self.boost_until and lag <= self.max_lag:
+            # BOOST IS RELATIVE TO CAPACITY SO REPEATED CHANGES DON'T COMPOUND
+            desired = max(desired, capacity * self.boost_factor)
+            reason = "scene_change"
+
+        # LIMIT STEP SIZE SO ONE SLOW FRAME DOESN'T SWING THE RATE
+        desired = min(max(desired, self.rate * (1 - self.max_step)), self.rate * (1 + self.max_step))
+        self.rate = min(max(desired, self.min_fps), self.max_fps)
+
+        rate = round(self.rate, 2)
+        self.history.append((round(timestamp, 3), rate, round(self.cost * 1000, 2), round(lag, 3), backlog, reason))
+        self.updates += 1
+        self.rate_sum += rate
+        self.min_rate = rate if self.min_rate is None else min(self.min_rate, rate)
+        self.max_rate = rate if self.max_rate is None else max(self.max_rate, rate)
+        METRICS.set_gauge("rate.sample_fps", self.rate)
+        METRICS.observe("rate.frame_cost", frame_cost * 1000)
+        if abs(self.rate - self.last_logged) / self.last_logged >= 0.2:
+            print(f"SAMPLE RATE {self.last_logged:.1f} -> {self.rate:.1f} FPS AT {timestamp:.1f}s ({reason}, {self.cost * 1000:.0f}ms/frame, lag {lag:.2f}s)")
+            self.last_logged = self.rate
+        return self.rate
+
+    def get_stats(self):
+        return {
+            "rate": round(self.rate, 2),
+            "mean_rate": round(self.rate_sum / self.updates, 2) if self.updates else None,
+            "min_rate": self.min_rate,
+            "max_rate": self.max_rate,
+            "cost_ms": round(self.cost * 1000, 2) if self.cost else None,
+            "updates": self.updates,
+        }
+
+    def write_log(self, path):
+        """RATE OVER TIME AS CSV - THE LAST history_size UPDATES"""
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["video_time", "sample_fps", "frame_cost_ms", "lag_s", "backlog", "reason"])
+            writer.writerows(self.history)
@@ -0,0 +1,171 @@
+import time
+import queue
+import threading
+from collections import defaultdict, deque
+from metrics import METRICS
+from request_scheduler import DeadlineExceeded, current_deadline, time_remaining
+
+class LatencyWindow:
+    def __init__(self, size=200):
+        """LAST size LATENCIES (MS) OF ONE KIND OF REQUEST"""
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, ms):
+        with self.lock:
+            self.samples.append(ms)
+
+    def percentile(self, pct):
+        with self.lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class HedgePolicy:
+    def __init__(self, make_client, percentile=95, min_samples=20, min_delay=0.05, max_hedge_rate=0.1, window=200):
+        """FIRE A DUPLICATE ONCE A REQUEST OUTLIVES THE OBSERVED percentile, KEEP THE FIRST ANSWER"""
+        # EACH ATTEMPT GETS ITS OWN CLIENT SO AN ABANDONED LOSER NEVER SHARES A CONNECTION POOL WITH LIVE CALLS
+        self.make_client = make_client
+        self.percentile = percentile
+        self.min_samples = min_samples  # NO HEDGING UNTIL WE KNOW WHAT "SLOW" MEANS
+        self.min_delay = min_delay
+        self.max_hedge_rate = max_hedge_rate  # CAP SO A UNIFORMLY SLOW API DOESN'T DOUBLE OUR LOAD
+        self.windows = defaultdict(lambda: LatencyWindow(window))
+        self.recent = deque(maxlen=window)  # WHETHER EACH RECENT REQUEST WAS HEDGED
+        self.idle = []
+        self.window = window
+        # ATTEMPT THREADS AND CALLERS ALL UPDATE THESE - ONLY TOUCH THEM UNDER self.lock
+        self.lock = threading.Lock()
+        self.stats = defaultdict(int)
+        self.latencies = {}  # KEY -> LAST window END-TO-END MS, FOR REPORTING
+
+    def checkout(self):
+        with self.lock:
+            if self.idle:
+                return self.idle.pop()
+        return self.make_client()
+
+    def checkin(self, client):
+        with self.lock:
+            self.idle.append(client)
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def abandon(self, client):
+        """STOP WAITING ON AN IN-FLIGHT ATTEMPT - ITS RESULT IS DISCARDED AND ITS CLIENT CLOSED, NEVER REUSED"""
+        # NOT A CANCELLATION: THE SYNC CLIENT CAN'T INTERRUPT A BLOCKING READ, SO THE REQUEST RUNS ON SERVER-SIDE
+        # AND ITS SOCKET GOES WHEN THE RESPONSE OR TIMEOUT ARRIVES
+        try:
+            client.close()
+        except Exception:
+            pass
+        self.count("abandoned")
+        METRICS.incr("gpt.hedge.abandoned")
+
+    def hedge_delay(self, key):
+        """SECONDS TO WAIT BEFORE HEDGING, NONE WHILE THERE ARE TOO FEW SAMPLES"""
+        window = self.windows[key]
+        if len(window) < self.min_samples:
+            return None
+        return max(self.min_delay, window.percentile(self.percentile) / 1000)
+
+    def hedge_rate(self):
+        with self.lock:
+            return sum(self.recent) / len(self.recent) if self.recent else 0.0
+
+    def run(self, key, attempt, can_hedge=None):
+        """attempt(client, timeout) -> RESULT. can_hedge() MAY VETO THE DUPLICATE (E.G. NO RATE BUDGET)"""
+        deadline = current_deadline()
+        results = queue.Queue()
+        clients = {}
+        started = {}
+
+        def launch(label):
+            client = self.checkout()
+            clients[label] = client
+            started[label] = time.perf_counter()
+            timeout = time_remaining(deadline) if deadline is not None else None
+
+            def target():
+                try:
+                    results.put((label, attempt(client, timeout), None))
+                except Exception as e:
+                    results.put((label, None, e))
+            threading.Thread(target=target, daemon=True).start()
+
+        def wait(seconds):
+            remaining = time_remaining(deadline) if deadline is not None else None
+            if remaining is not None:
+                seconds = remaining if seconds is None else min(seconds, remaining)
+                if seconds <= 0:
+                    raise queue.Empty
+            return results.get(timeout=seconds)
+
+        start = time.perf_counter()
+        self.count("requests")
+        launch("primary")
+        delay = self.hedge_delay(key)
+        hedged = False
+        outcome = None
+        try:
+            try:
+                outcome = wait(delay)
+            except queue.Empty:
+                remaining = time_remaining(deadline) if deadline is not None else None
+                if delay is None or remaining is not None and remaining <= 0:
+                    raise
+                if self.hedge_rate() >= self.max_hedge_rate:
+                    self.count("skipped_rate")
+                elif can_hedge is not None and not can_hedge():
+                    self.count("skipped_budget")
+                else:
+                    hedged = True
+                    self.count("hedged")
+                    METRICS.incr("gpt.hedge.fired")
+                    launch("hedge")
+                outcome = wait(None)
+            # FIRST FAILURE OF A HEDGED PAIR - THE OTHER ATTEMPT MAY STILL SUCCEED
+            if outcome[2] is not None and len(clients) == 2:
+                self.checkin(clients.pop(outcome[0]))
+                outcome = wait(None)
+        except queue.Empty:
+            for client in clients.values():
+                self.abandon(client)
+            self.count("deadline_exceeded")
+            METRICS.incr("gpt.hedge.deadline_exceeded")
+            raise DeadlineExceeded(f"NO RESPONSE FOR {key} BEFORE THE DEADLINE")
+        finally:
+            with self.lock:
+                self.recent.append(hedged)
+
+        label, result, error = outcome
+        for other, client in clients.items():
+            if other != label:
+                self.abandon(client)
+        self.checkin(clients[label])
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if error is not None:
+            raise error
+        # THE WINNER'S OWN LATENCY FEEDS THE PERCENTILE, THE CALLER'S WAIT IS WHAT WE REPORT
+        self.windows[key].add((time.perf_counter() - started[label]) * 1000)
+        with self.lock:
+            self.latencies.setdefault(key, deque(maxlen=self.window)).append(elapsed_ms)
+        if label == "hedge":
+            self.count("hedge_wins")
+            METRICS.incr("gpt.hedge.wins")
+        METRICS.observe(f"gpt.hedged.{key}", elapsed_ms)
+        return result
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats["hedge_rate"] = round(stats.get("hedged", 0) / stats["requests"], 3) if stats.get("requests") else 0.0
+        stats["delays_ms"] = {key: round(self.hedge_delay(key) * 1000, 1) for key in list(self.windows) if self.hedge_delay(key) is not None}
+        return stats
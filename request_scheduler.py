@@ -0,0 +1,241 @@
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+from contextlib import contextmanager
+from metrics import METRICS
+
+# LOWER RUNS FIRST
+INTERACTIVE = 0
+BACKGROUND = 10
+
+# PER-MODEL (REQUESTS PER MINUTE, TOKENS PER MINUTE) - SET TO YOUR ACCOUNT TIER
+DEFAULT_LIMITS = {
+    "gpt-3.5-turbo": (3500, 200000),
+    "gpt-4o": (500, 30000),
+}
+FALLBACK_LIMITS = (500, 30000)
+
+_PRIORITY = threading.local()
+_DEADLINE = threading.local()
+
+@contextmanager
+def request_priority(priority):
+    """RUN GPT CALLS MADE BY THIS THREAD INSIDE THE BLOCK AT THE GIVEN PRIORITY"""
+    previous = getattr(_PRIORITY, "value", INTERACTIVE)
+    _PRIORITY.value = priority
+    try:
+        yield
+    finally:
+        _PRIORITY.value = previous
+
+def current_priority():
+    return getattr(_PRIORITY, "value", INTERACTIVE)
+
+@contextmanager
+def request_deadline(seconds):
+    """GPT CALLS MADE BY THIS THREAD INSIDE THE BLOCK MUST FINISH WITHIN seconds - NESTED BLOCKS ONLY TIGHTEN IT"""
+    previous = getattr(_DEADLINE, "value", None)
+    if seconds is not None:
+        deadline = time.monotonic() + seconds
+        _DEADLINE.value = deadline if previous is None else min(previous, deadline)
+    try:
+        yield
+    finally:
+        _DEADLINE.value = previous
+
+def current_deadline():
+    return getattr(_DEADLINE, "value", None)
+
+def time_remaining(deadline=None):
+    """SECONDS LEFT BEFORE THE DEADLINE (THIS THREAD'S BY DEFAULT), NONE WITHOUT ONE"""
+    deadline = current_deadline() if deadline is None else deadline
+    return None if deadline is None else deadline - time.monotonic()
+
+def estimate_text_tokens(text):
+    """ROUGH TOKEN COUNT (~4 CHARACTERS PER TOKEN)"""
+    return len(text) // 4 + 1
+
+class RequestTooLarge(Exception):
+    """REQUEST CAN NEVER FIT THE MODEL'S TOKEN BUDGET, EVEN AFTER DOWNGRADING"""
+
+class DeadlineExceeded(Exception):
+    """THE USER REQUEST'S DEADLINE PASSED BEFORE THE GPT CALL COULD FINISH"""
+
+def retry_after_seconds(error, default=1.0):
+    """READ retry-after-ms / Retry-After FROM A RATE-LIMIT ERROR'S RESPONSE"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass  # HTTP-DATE FORM - USE BACKOFF INSTEAD
+    return default
+
+def is_rate_limited(error):
+    return getattr(error, "status_code", None) == 429
+
+def is_oversized(error):
+    return getattr(error, "status_code", None) == 413 or getattr(error, "code", None) == "context_length_exceeded"
+
+class ModelBudget:
+    def __init__(self, rpm, tpm, window=60.0):
+        """SLIDING ONE-MINUTE WINDOW OF REQUESTS AND TOKENS FOR ONE MODEL"""
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.events = deque()  # (SEND TIME, TOKENS)
+        self.tokens_in_window = 0
+        self.paused_until = 0.0
+
+    def _expire(self, now):
+        while self.events and self.events[0][0] <= now - self.window:
+            self.tokens_in_window -= self.events.popleft()[1]
+
+    def wait_time(self, tokens, now):
+        """SECONDS UNTIL A REQUEST OF THIS SIZE FITS (0 = SEND NOW)"""
+        self._expire(now)
+        wait = max(0.0, self.paused_until - now)
+        if len(self.events) >= self.rpm:
+            wait = max(wait, self.events[0][0] + self.window - now)
+
+        # WAIT FOR ENOUGH OLD TOKENS TO LEAVE THE WINDOW
+        excess = self.tokens_in_window + tokens - self.tpm
+        if excess > 0:
+            freed = 0
+            for sent, count in self.events:
+                freed += count
+                if freed >= excess:
+                    wait = max(wait, sent + self.window - now)
+                    break
+        return wait
+
+    def record(self, tokens, now):
+        self.events.append((now, tokens))
+        self.tokens_in_window += tokens
+
+    def pause(self, seconds, now):
+        """SERVER SAID SLOW DOWN - HOLD EVERY REQUEST FOR THIS MODEL"""
+        self.paused_until = max(self.paused_until, now + seconds)
+
+class RequestScheduler:
+    def __init__(self, limits=None, max_retries=3):
+        """PRIORITY QUEUE IN FRONT OF THE API, ONE RPM/TPM BUDGET PER MODEL"""
+        self.limits = dict(DEFAULT_LIMITS)
+        self.limits.update(limits or {})
+        self.max_retries = max_retries
+        self.budgets = {}
+        self.waiting = {}  # MODEL -> HEAP OF (PRIORITY, SEQUENCE) TICKETS
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+
+    def budget(self, model):
+        if model not in self.budgets:
+            self.budgets[model] = ModelBudget(*self.limits.get(model, FALLBACK_LIMITS))
+        return self.budgets[model]
+
+    def set_limits(self, model, rpm, tpm):
+        with self.condition:
+            self.limits[model] = (rpm, tpm)
+            budget = self.budget(model)
+            budget.rpm = rpm
+            budget.tpm = tpm
+            self.condition.notify_all()
+
+    def max_request_tokens(self, model):
+        with self.condition:
+            return self.budget(model).tpm
+
+    def acquire(self, model, tokens, priority=INTERACTIVE, deadline=None):
+        """BLOCK UNTIL THIS REQUEST IS FIRST IN LINE FOR ITS MODEL AND FITS THE BUDGET - OR ITS DEADLINE PASSES"""
+        start = time.perf_counter()
+        ticket = (priority, next(self.sequence))
+        with self.condition:
+            budget = self.budget(model)
+            heap = self.waiting.setdefault(model, [])
+            heapq.heappush(heap, ticket)
+            self.condition.notify_all()
+            METRICS.set_gauge(f"gpt.queue_depth.{model}", len(heap))
+            while True:
+                remaining = time_remaining(deadline) if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    # GIVE UP OUR PLACE IN LINE
+                    heap.remove(ticket)
+                    heapq.heapify(heap)
+                    METRICS.set_gauge(f"gpt.queue_depth.{model}", len(heap))
+                    self.condition.notify_all()
+                    METRICS.incr("gpt.scheduler.deadline_exceeded")
+                    raise DeadlineExceeded(f"DEADLINE PASSED WHILE QUEUED FOR {model}")
+                if heap[0] != ticket:
+                    self.condition.wait(remaining)
+                    continue
+                now = time.monotonic()
+                wait = budget.wait_time(tokens, now)
+                if wait <= 0:
+                    heapq.heappop(heap)
+                    budget.record(tokens, now)
+                    METRICS.set_gauge(f"gpt.queue_depth.{model}", len(heap))
+                    self.condition.notify_all()
+                    break
+                self.condition.wait(wait if remaining is None else min(wait, remaining))
+
+        waited = time.perf_counter() - start
+        METRICS.observe("gpt.queue_wait", waited * 1000)
+        METRICS.observe(f"gpt.queue_wait.{'interactive' if priority <= INTERACTIVE else 'background'}", waited * 1000)
+        return waited
+
+    def try_acquire(self, model, tokens):
+        """TAKE BUDGET ONLY IF NOTHING IS QUEUED AND IT FITS RIGHT NOW - FOR OPTIONAL EXTRA REQUESTS LIKE HEDGES"""
+        with self.condition:
+            budget = self.budget(model)
+            now = time.monotonic()
+            if self.waiting.get(model) or budget.wait_time(tokens, now) > 0:
+                return False
+            budget.record(tokens, now)
+            return True
+
+    def run(self, model, tokens, send, downgrade=None, priority=None):
+        """SEND THROUGH THE BUDGET - SHRINK OVERSIZED REQUESTS, RETRY 429s AFTER Retry-After"""
+        priority = current_priority() if priority is None else priority
+        deadline = current_deadline()
+        attempt = 0
+        while True:
+            # TRY CHEAPER VERSIONS BEFORE GIVING UP ON A REQUEST THAT CAN NEVER FIT
+            while tokens > self.max_request_tokens(model):
+                smaller = downgrade() if downgrade else None
+                if smaller is None:
+                    METRICS.incr("gpt.scheduler.rejected")
+                    raise RequestTooLarge(f"REQUEST OF ~{tokens} TOKENS EXCEEDS {model} BUDGET OF {self.max_request_tokens(model)} TOKENS/MIN")
+                METRICS.incr("gpt.scheduler.downgraded")
+                tokens, send = smaller
+
+            self.acquire(model, tokens, priority, deadline)
+            try:
+                return send()
+            except Exception as e:
+                if is_rate_limited(e) and attempt < self.max_retries:
+                    attempt += 1
+                    delay = retry_after_seconds(e, default=2.0 ** attempt)
+                    METRICS.incr("gpt.scheduler.rate_limited")
+                    remaining = time_remaining(deadline) if deadline is not None else None
+                    if remaining is not None and remaining <= delay:
+                        raise DeadlineExceeded(f"RATE LIMITED ON {model} AND ONLY {max(remaining, 0):.1f}s LEFT") from e
+                    print(f"RATE LIMITED ON {model}, RETRYING IN {delay:.1f}s ({attempt}/{self.max_retries})")
+                    with self.condition:
+                        self.budget(model).pause(delay, time.monotonic())
+                        self.condition.notify_all()
+                    continue
+                if is_oversized(e) and downgrade:
+                    smaller = downgrade()
+                    if smaller is not None:
+                        METRICS.incr("gpt.scheduler.downgraded")
+                        tokens, send = smaller
+                        continue
+                raise
+
+# ONE SCHEDULER PER PROCESS - RATE LIMITS ARE PER ACCOUNT, NOT PER HANDLER
+SCHEDULER = RequestScheduler()
@@ -0,0 +1,204 @@
+import math
+from collections import defaultdict
+from metrics import METRICS
+from frame_quality import QUALITY_WEIGHT
+
+def format_time(seconds):
+    """SECONDS -> H:MM:SS"""
+    seconds = int(max(0, seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class ClassSummary:
+    def __init__(self):
+        """ONE CLASS INSIDE ONE SEGMENT"""
+        self.frames = 0  # FRAMES THE CLASS APPEARED IN
+        self.detections = 0
+        self.confidence_sum = 0.0
+        self.max_confidence = 0.0
+        self.first_seen = math.inf
+        self.last_seen = -math.inf
+        self.representatives = []  # [(SELECTION SCORE, TRACKER)] BEST FIRST - SHARP FRAMES OUTLIVE BLURRY ONES
+
+    @property
+    def mean_confidence(self):
+        return self.confidence_sum / self.frames if self.frames else 0.0
+
+    def add(self, tracker, object_class, quality_weight=QUALITY_WEIGHT):
+        confidence = tracker.average_confidences.get(object_class, 0)
+        self.frames += 1
+        self.detections += tracker.object_counts[object_class]
+        self.confidence_sum += confidence
+        self.max_confidence = max(self.max_confidence, confidence)
+        self.first_seen = min(self.first_seen, tracker.timestamp)
+        self.last_seen = max(self.last_seen, tracker.timestamp)
+        self.representatives.append((tracker.selection_score(object_class, quality_weight), tracker))
+
+    def merge(self, other):
+        self.frames += other.frames
+        self.detections += other.detections
+        self.confidence_sum += other.confidence_sum
+        self.max_confidence = max(self.max_confidence, other.max_confidence)
+        self.first_seen = min(self.first_seen, other.first_seen)
+        self.last_seen = max(self.last_seen, other.last_seen)
+        self.representatives.extend(other.representatives)
+
+    def keep_best(self, count):
+        self.representatives.sort(key=lambda r: r[0], reverse=True)
+        del self.representatives[count:]
+
+    def to_dict(self):
+        return {
+            "frames": self.frames,
+            "detections": self.detections,
+            "max_confidence": round(self.max_confidence, 3),
+            "mean_confidence": round(self.mean_confidence, 3),
+            "first_seen": round(self.first_seen, 3),
+            "last_seen": round(self.last_seen, 3),
+            "representative_frames": [t.image_ids[0] for _, t in self.representatives if t.image_ids],
+        }
+
+class SegmentSummary:
+    def __init__(self, start, end, level=0):
+        """COMPACTED STRETCH OF FOOTAGE - LEVEL GROWS EACH TIME TWO SEGMENTS ARE MERGED"""
+        self.start = start
+        self.end = end
+        self.level = level
+        self.frames = 0
+        self.classes = defaultdict(ClassSummary)
+
+    def add(self, tracker, quality_weight=QUALITY_WEIGHT):
+        self.frames += 1
+        for object_class in tracker.object_counts:
+            self.classes[object_class].add(tracker, object_class, quality_weight)
+
+    def merge(self, other):
+        self.start = min(self.start, other.start)
+        self.end = max(self.end, other.end)
+        self.level = max(self.level, other.level) + 1
+        self.frames += other.frames
+        for object_class, summary in other.classes.items():
+            self.classes[object_class].merge(summary)
+
+    def representative_trackers(self):
+        return {id(t): t for summary in self.classes.values() for _, t in summary.representatives}
+
+    def to_dict(self):
+        return {
+            "start": round(self.start, 3),
+            "end": round(self.end, 3),
+            "level": self.level,
+            "frames": self.frames,
+            "classes": {c: s.to_dict() for c, s in sorted(self.classes.items())},
+        }
+
+class FrameRetention:
+    def __init__(self, recent_seconds=300, segment_seconds=60, reps_per_class=2, max_segments=240, quality_weight=QUALITY_WEIGHT):
+        """FULL DETAIL FOR THE RECENT WINDOW, BOUNDED SEGMENT SUMMARIES FOR EVERYTHING OLDER"""
+        self.recent_seconds = recent_seconds
+        # SAME RANKING AS FRAME SELECTION (--quality-weight), SO 0 KEEPS THE MOST CONFIDENT FRAMES REGARDLESS OF BLUR
+        self.quality_weight = quality_weight
+        self.segment_seconds = segment_seconds
+        self.reps_per_class = reps_per_class
+        self.max_segments = max_segments
+        self.segments = []  # OLDEST FIRST
+        self.frames_evicted = 0
+
+    def representatives(self):
+        """TRACKERS OF EVERY FRAME STILL KEPT FOR COMPACTED FOOTAGE, OLDEST FIRST"""
+        kept = {}
+        for segment in self.segments:
+            kept.update(segment.representative_trackers())
+        return sorted(kept.values(), key=lambda t: t.timestamp)
+
+    def compact(self, trackers, frame_storage):
+        """FOLD TRACKERS OLDER THAN THE RECENT WINDOW INTO SUMMARIES - RETURN TRACKERS STILL IN FULL DETAIL"""
+        timed = [t for t in trackers if t.timestamp is not None]
+        if not timed:
+            return trackers
+        cutoff = max(t.timestamp for t in timed) - self.recent_seconds
+
+        # ONLY FRAMES ALREADY ON DISK CAN BE COMPACTED
+        old = [t for t in trackers if t.timestamp is not None and t.timestamp < cutoff and t.image_ids]
+        if not old:
+            return trackers
+        old_ids = {id(t) for t in old}
+        kept = [t for t in trackers if id(t) not in old_ids]
+
+        with METRICS.span("retention.compact"):
+            before = self.representatives()
+            for tracker in old:
+                self.segment_for(tracker.timestamp).add(tracker, self.quality_weight)
+            for segment in self.segments:
+                for summary in segment.classes.values():
+                    summary.keep_best(self.reps_per_class)
+            self.merge_oldest()
+
+            # DELETE EVERY COMPACTED FRAME THAT IS NOT A REPRESENTATIVE
+            representative_ids = {id(t) for t in self.representatives()}
+            for tracker in before + old:
+                if id(tracker) not in representative_ids:
+                    for frame_id in tracker.image_ids:
+                        frame_storage.delete_frame(frame_id)
+            self.frames_evicted += len(old)
+        METRICS.incr("retention.frames_compacted", len(old))
+        METRICS.set_gauge("retention.segments", len(self.segments))
+        return kept
+
+    def segment_for(self, timestamp):
+        """SEGMENT COVERING THIS TIME, CREATED ON THE FIXED segment_seconds GRID"""
+        for segment in reversed(self.segments):
+            if segment.start <= timestamp < segment.end:
+                return segment
+            if segment.end <= timestamp:
+                break
+        start = math.floor(timestamp / self.segment_seconds) * self.segment_seconds
+        segment = SegmentSummary(start, start + self.segment_seconds)
+        self.segments.append(segment)
+        self.segments.sort(key=lambda s: s.start)
+        return segment
+
+    def merge_oldest(self):
+        """OVER BUDGET - MERGE THE OLDEST ADJACENT PAIR OF EQUAL LEVEL, SO OLDER FOOTAGE GETS COARSER"""
+        while self.max_segments and len(self.segments) > self.max_segments:
+            pair = next((i for i in range(len(self.segments) - 1) if self.segments[i].level == self.segments[i + 1].level), 0)
+            first, second = self.segments[pair], self.segments.pop(pair + 1)
+            first.merge(second)
+            for summary in first.classes.values():
+                summary.keep_best(self.reps_per_class)
+
+    def class_history(self, object_classes=None):
+        """PER-CLASS TOTALS ACROSS ALL SUMMARIES"""
+        history = {}
+        for segment in self.segments:
+            for object_class, summary in segment.classes.items():
+                if object_classes and object_class not in object_classes:
+                    continue
+                entry = history.setdefault(object_class, {"segments": 0, "frames": 0, "max_confidence": 0.0, "first_seen": math.inf, "last_seen": -math.inf})
+                entry["segments"] += 1
+                entry["frames"] += summary.frames
+                entry["max_confidence"] = max(entry["max_confidence"], summary.max_confidence)
+                entry["first_seen"] = min(entry["first_seen"], summary.first_seen)
+                entry["last_seen"] = max(entry["last_seen"], summary.last_seen)
+        return history
+
+    def describe(self, object_classes=None, max_lines=20):
+        """SHORT TEXT HISTORY FOR PROMPTS - NONE WHEN NOTHING IS COMPACTED YET"""
+        if not self.segments:
+            return None
+        history = self.class_history(object_classes)
+        lines = [f"Compacted footage {format_time(self.segments[0].start)} - {format_time(self.segments[-1].end)} ({len(self.segments)} segments):"]
+        for object_class, entry in sorted(history.items(), key=lambda item: -item[1]["frames"])[:max_lines]:
+            lines.append(
+                f"- {object_class}: in {entry['segments']} segments / {entry['frames']} frames, "
+                f"first {format_time(entry['first_seen'])}, last {format_time(entry['last_seen'])}, "
+                f"max confidence {entry['max_confidence']:.2f}"
+            )
+        return "\n".join(lines)
+
+    def get_stats(self):
+        return {
+            "segments": len(self.segments),
+            "frames_compacted": self.frames_evicted,
+            "representative_frames": len(self.representatives()),
+            "oldest": self.segments[0].start if self.segments else None,
+        }
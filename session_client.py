@@ -0,0 +1,174 @@
+import json
+import time
+import socket
+import random
+import argparse
+import threading
+
+DEFAULT_QUESTIONS = [
+    "What car is this?",
+    "What color is the car in front of me?",
+    "How many people are here?",
+    "What is the capital of France?",
+    "Describe what I'm looking at.",
+]
+
+class SessionClient:
+    def __init__(self, host="127.0.0.1", port=8765, unix_path=None, timeout=300):
+        """CONNECT TO SESSION SERVER OVER TCP OR A UNIX SOCKET"""
+        if unix_path:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(unix_path)
+        else:
+            self.sock = socket.create_connection((host, port))
+        self.sock.settimeout(timeout)
+        self.reader = self.sock.makefile("rb")
+
+    def request(self, op, **kwargs):
+        """SEND ONE REQUEST AND WAIT FOR ITS RESPONSE"""
+        payload = dict(kwargs, op=op)
+        self.sock.sendall((json.dumps(payload) + "\n").encode())
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("SERVER CLOSED CONNECTION")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RuntimeError(response.get("error", "UNKNOWN SERVER ERROR"))
+        return response
+
+    def create_session(self):
+        return self.request("create_session")["session"]
+
+    def append_segment(self, session, path, wait=False):
+        return self.request("append_segment", session=session, path=path, wait=wait)
+
+    def ask(self, session, question, wait=False, background=False, deadline=None):
+        fields = {"deadline": deadline} if deadline is not None else {}
+        return self.request("ask", session=session, question=question, wait=wait, priority="background" if background else "interactive", **fields)
+
+    def session_stats(self, session):
+        return self.request("session_stats", session=session)
+
+    def stats(self):
+        return self.request("stats")
+
+    def close_session(self, session):
+        return self.request("close_session", session=session)
+
+    def close(self):
+        self.reader.close()
+        self.sock.close()
+
+def run_load(connect_kwargs, session, questions, total_requests=50, concurrency=8):
+    """FIRE QUESTIONS FROM CONCURRENT CLIENTS AND REPORT CLIENT-SIDE LATENCY"""
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(total_requests))
+
+    def worker():
+        client = SessionClient(**connect_kwargs)
+        try:
+            while True:
+                with lock:
+                    if next(counter, None) is None:
+                        return
+                question = random.choice(questions)
+                start = time.perf_counter()
+                try:
+                    client.ask(session, question)
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+                except Exception as e:
+                    with lock:
+                        errors.append(str(e))
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    def pct(p):
+        if not ordered:
+            return None
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000, 2)
+
+    return {
+        "requests": total_requests,
+        "concurrency": concurrency,
+        "completed": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Client and load generator for session_server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="connect to this unix socket path instead of TCP")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("create")
+    append = sub.add_parser("append")
+    append.add_argument("session")
+    append.add_argument("path")
+    append.add_argument("--wait", action="store_true")
+    ask = sub.add_parser("ask")
+    ask.add_argument("session")
+    ask.add_argument("question")
+    ask.add_argument("--wait", action="store_true", help="wait for queued segments first")
+    ask.add_argument("--background", action="store_true", help="queue behind interactive questions for the GPT budget")
+    ask.add_argument("--deadline", type=float, help="seconds the server may spend on GPT calls for this answer")
+    stats = sub.add_parser("stats")
+    stats.add_argument("session", nargs="?")
+    close = sub.add_parser("close")
+    close.add_argument("session")
+    load = sub.add_parser("load")
+    load.add_argument("--video", help="create a session and append this video first")
+    load.add_argument("--session", help="reuse an existing session")
+    load.add_argument("--requests", type=int, default=50)
+    load.add_argument("--concurrency", type=int, default=8)
+    load.add_argument("--question", action="append", help="question to send (repeatable)")
+    args = parser.parse_args()
+
+    connect_kwargs = {"host": args.host, "port": args.port, "unix_path": args.unix}
+    client = SessionClient(**connect_kwargs)
+
+    if args.command == "create":
+        print(client.create_session())
+    elif args.command == "append":
+        print(json.dumps(client.append_segment(args.session, args.path, args.wait), indent=2))
+    elif args.command == "ask":
+        response = client.ask(args.session, args.question, args.wait, args.background, args.deadline)
+        print(response["answer"])
+        print(f"\n({response['latency_ms']} ms)")
+    elif args.command == "stats":
+        result = client.session_stats(args.session) if args.session else client.stats()
+        print(json.dumps(result, indent=2))
+    elif args.command == "close":
+        client.close_session(args.session)
+    elif args.command == "load":
+        session = args.session
+        if session is None:
+            session = client.create_session()
+            print(f"CREATED SESSION {session}")
+        if args.video:
+            print(f"APPENDING {args.video}...")
+            client.append_segment(session, args.video, wait=True)
+
+        print(f"RUNNING LOAD: {args.requests} REQUESTS, CONCURRENCY {args.concurrency}")
+        result = run_load(connect_kwargs, session, args.question or DEFAULT_QUESTIONS, args.requests, args.concurrency)
+        print(json.dumps(result, indent=2))
+        print(json.dumps(client.session_stats(session)["latency"], indent=2))
+
+    client.close()
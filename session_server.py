@@ -0,0 +1,288 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import asyncio
+import argparse
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from yolo_detector import download_yolo_files, load_yolo
+from local_frame_storage import LocalFrameStorage
+from prompt_handler import GPTHandler
+from pipeline import VideoPipeline
+from retention import FrameRetention
+from metrics import METRICS
+from request_scheduler import request_priority, INTERACTIVE, BACKGROUND
+
+def percentile(values, pct):
+    """NEAREST-RANK PERCENTILE, NONE FOR EMPTY INPUT"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+class LatencyStats:
+    def __init__(self, max_samples=1000):
+        """INIT PER-OPERATION LATENCY WINDOWS"""
+        self.samples = defaultdict(lambda: deque(maxlen=max_samples))
+        self.counts = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def record(self, op, seconds, ok=True):
+        with self.lock:
+            self.samples[op].append(seconds)
+            self.counts[op] += 1
+            if not ok:
+                self.errors[op] += 1
+
+    def summary(self):
+        """GET COUNT / ERRORS / P50 / P95 / P99 / MAX IN MS PER OPERATION"""
+        with self.lock:
+            result = {}
+            for op, samples in self.samples.items():
+                values = [s * 1000 for s in samples]
+                result[op] = {
+                    "count": self.counts[op],
+                    "errors": self.errors[op],
+                    "p50_ms": round(percentile(values, 50), 2),
+                    "p95_ms": round(percentile(values, 95), 2),
+                    "p99_ms": round(percentile(values, 99), 2),
+                    "max_ms": round(max(values), 2),
+                }
+            return result
+
+class Session:
+    def __init__(self, session_id, pipeline):
+        """INIT ISOLATED SESSION STATE"""
+        self.session_id = session_id
+        self.pipeline = pipeline
+        # ONE WORKER SO APPENDED SEGMENTS ARE PROCESSED IN ORDER
+        self.segment_executor = ThreadPoolExecutor(max_workers=1)
+        self.pending_segments = []
+        self.segments = []
+        self.latency = LatencyStats()
+        self.created = time.time()
+        # CLOSE WAITS FOR IN-FLIGHT ASKS BEFORE THE FRAMES THEY READ ARE DELETED
+        self.closing = False
+        self.active_asks = 0
+        self.idle = threading.Condition()
+
+    def begin_ask(self):
+        with self.idle:
+            if self.closing:
+                raise RuntimeError(f"SESSION {self.session_id} IS CLOSING")
+            self.active_asks += 1
+
+    def end_ask(self):
+        with self.idle:
+            self.active_asks -= 1
+            self.idle.notify_all()
+
+    def close(self):
+        """REJECT NEW ASKS, THEN BLOCK UNTIL THE ONES IN FLIGHT FINISH"""
+        with self.idle:
+            self.closing = True
+            self.idle.wait_for(lambda: self.active_asks == 0)
+
+    def get_stats(self):
+        return {
+            "session": self.session_id,
+            "segments": self.segments,
+            "pending_segments": len([f for f in self.pending_segments if not f.done()]),
+            "processed_frames": self.pipeline.frames_processed,
+            "detected_objects": sorted(self.pipeline.detected_objects),
+            "latency": self.latency.summary(),
+            "retention": self.pipeline.retention.get_stats() if self.pipeline.retention else None,
+        }
+
+class SessionServer:
+    def __init__(self, frames_root="session_frames", question_workers=8, retain_seconds=None, answer_deadline=None, hedge=False):
+        """INIT SERVER WITH WARM GPT HANDLER AND YOLO MODEL"""
+        self.frames_root = frames_root
+        # LONG-LIVED SESSIONS KEEP FULL DETAIL ONLY FOR THE RECENT WINDOW
+        self.retain_seconds = retain_seconds
+        self.gpt = GPTHandler()
+        # DEFAULT DEADLINE FOR ask - A REQUEST'S OWN "deadline" OVERRIDES IT
+        self.answer_deadline = answer_deadline
+        if hedge:
+            self.gpt.enable_hedging()
+
+        print("SETTING UP YOLO...")
+        download_yolo_files()
+        self.model = load_yolo()
+        self.net_lock = threading.Lock()
+
+        self.sessions = {}
+        self.question_executor = ThreadPoolExecutor(max_workers=question_workers)
+        self.latency = LatencyStats()
+
+    def create_session(self):
+        """CREATE SESSION WITH ITS OWN TRACKERS AND FRAME DIRECTORY"""
+        session_id = str(uuid.uuid4())[:8]
+        storage = LocalFrameStorage(os.path.join(self.frames_root, session_id))
+        pipeline = VideoPipeline(gpt=self.gpt, model=self.model, frame_storage=storage, net_lock=self.net_lock)
+        if self.retain_seconds:
+            pipeline.retention = FrameRetention(self.retain_seconds, quality_weight=pipeline.quality_weight)
+        self.sessions[session_id] = Session(session_id, pipeline)
+        print(f"CREATED SESSION {session_id}")
+        return session_id
+
+    def close_session(self, session_id):
+        """DROP SESSION STATE AND ITS FRAMES"""
+        session = self.sessions.pop(session_id)
+        session.close()
+        session.segment_executor.shutdown(wait=True)
+        shutil.rmtree(str(session.pipeline.frame_storage.base_dir), ignore_errors=True)
+        print(f"CLOSED SESSION {session_id}")
+
+    def get_session(self, request):
+        session_id = request.get("session")
+        if session_id not in self.sessions:
+            raise KeyError(f"UNKNOWN SESSION {session_id}")
+        return self.sessions[session_id]
+
+    def _process_segment(self, session, path):
+        """PROCESS ONE APPENDED SEGMENT ON THE SESSION'S SEGMENT WORKER"""
+        start = time.perf_counter()
+        before = session.pipeline.frames_processed
+        ok = session.pipeline.process_video(path)
+        elapsed = time.perf_counter() - start
+        session.latency.record("segment", elapsed, ok)
+        self.latency.record("segment", elapsed, ok)
+        session.segments.append({"path": path, "ok": ok, "frames": session.pipeline.frames_processed - before, "seconds": round(elapsed, 3)})
+        return ok
+
+    def _answer(self, session, question, priority, deadline=None):
+        with request_priority(priority):
+            return session.pipeline.answer_question(question, deadline=deadline)
+
+    async def wait_for_segments(self, session):
+        pending = [asyncio.wrap_future(f) for f in session.pending_segments if not f.done()]
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def handle_request(self, request):
+        """DISPATCH ONE JSON REQUEST"""
+        loop = asyncio.get_running_loop()
+        op = request.get("op")
+
+        if op == "create_session":
+            return {"session": self.create_session()}
+
+        if op == "close_session":
+            session = self.get_session(request)
+            await loop.run_in_executor(None, self.close_session, session.session_id)
+            return {}
+
+        if op == "append_segment":
+            session = self.get_session(request)
+            path = request["path"]
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"SEGMENT NOT FOUND: {path}")
+            future = session.segment_executor.submit(self._process_segment, session, path)
+            session.pending_segments = [f for f in session.pending_segments if not f.done()] + [future]
+            if request.get("wait"):
+                return {"processed": await asyncio.wrap_future(future)}
+            return {"queued": True}
+
+        if op == "ask":
+            session = self.get_session(request)
+            session.begin_ask()
+            start = time.perf_counter()
+            try:
+                # OPTIONALLY WAIT SO THE ANSWER COVERS EVERY APPENDED SEGMENT
+                if request.get("wait"):
+                    await self.wait_for_segments(session)
+                start = time.perf_counter()
+                # BACKGROUND QUESTIONS YIELD THE GPT BUDGET TO INTERACTIVE ONES
+                priority = BACKGROUND if request.get("priority") == "background" else INTERACTIVE
+                answer = await loop.run_in_executor(
+                    self.question_executor, self._answer, session, request["question"], priority,
+                    request.get("deadline", self.answer_deadline)
+                )
+            except Exception:
+                # FAILED ASKS COUNT AS ERRORS (AND THEIR TIME) IN THE SESSION STATS
+                session.latency.record("ask", time.perf_counter() - start, ok=False)
+                raise
+            finally:
+                session.end_ask()
+            elapsed = time.perf_counter() - start
+            session.latency.record("ask", elapsed)
+            return {"answer": answer, "latency_ms": round(elapsed * 1000, 2)}
+
+        if op == "session_stats":
+            return self.get_session(request).get_stats()
+
+        if op == "stats":
+            response = {"sessions": sorted(self.sessions), "latency": self.latency.summary()}
+            if self.gpt.HEDGE is not None:
+                response["hedging"] = self.gpt.HEDGE.get_stats()
+            if METRICS.enabled:
+                response["metrics"] = METRICS.snapshot()
+            return response
+
+        raise ValueError(f"UNKNOWN OP {op}")
+
+    async def handle_client(self, reader, writer):
+        """ONE JSON REQUEST PER LINE, ONE JSON RESPONSE PER LINE"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                start = time.perf_counter()
+                op = None
+                try:
+                    request = json.loads(line)
+                    op = request.get("op")
+                    response = await self.handle_request(request)
+                    response["ok"] = True
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                self.latency.record(op or "invalid", time.perf_counter() - start, response["ok"])
+
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765, unix_path=None):
+        """SERVE OVER TCP OR A UNIX SOCKET UNTIL CANCELLED"""
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            server = await asyncio.start_unix_server(self.handle_client, path=unix_path)
+            print(f"SESSION SERVER LISTENING ON {unix_path}")
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port)
+            print(f"SESSION SERVER LISTENING ON {host}:{port}")
+
+        async with server:
+            await server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-question session server over a warm pipeline")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="serve on this unix socket path instead of TCP")
+    parser.add_argument("--frames-root", default="session_frames")
+    parser.add_argument("--question-workers", type=int, default=8)
+    parser.add_argument("--retain-seconds", type=float, help="summarize session footage older than this")
+    parser.add_argument("--deadline", type=float, help="default seconds an ask may spend on GPT calls")
+    parser.add_argument("--hedge", action="store_true", help="duplicate GPT requests slower than the observed p95")
+    parser.add_argument("--metrics", action="store_true", help="collect per-stage metrics and include them in stats")
+    args = parser.parse_args()
+
+    if args.metrics:
+        METRICS.enable()
+
+    server = SessionServer(args.frames_root, args.question_workers, args.retain_seconds, args.deadline, args.hedge)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        print("\nSESSION SERVER STOPPED")
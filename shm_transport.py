@@ -0,0 +1,271 @@
+import time
+import queue
+import argparse
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+from buffer_pool import FramePool
+from metrics import METRICS
+
+class SharedFramePool(FramePool):
+    def __init__(self, count=16):
+        """FramePool WHOSE SLOTS LIVE IN ONE SHARED MEMORY BLOCK - OTHER PROCESSES MAP THEM WITHOUT COPYING"""
+        super().__init__(count)
+        self.shm = None
+
+    def _allocate(self, shape):
+        with self.lock:
+            if self.shape is not None:
+                return
+            frame_bytes = int(np.prod(shape))
+            self.shm = shared_memory.SharedMemory(create=True, size=frame_bytes * self.count)
+            self.buffers = [
+                np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf, offset=i * frame_bytes)
+                for i in range(self.count)
+            ]
+            self.slot_of = {id(b): i for i, b in enumerate(self.buffers)}
+            for i in range(self.count):
+                self.free.put(i)
+            self.shape = shape
+        METRICS.set_gauge("shm.pool_bytes", frame_bytes * self.count)
+
+    def handle(self, buffer):
+        """SMALL PICKLABLE (SHM NAME, SHAPE, SLOT) THAT NAMES A SLOT IN ANOTHER PROCESS"""
+        return self.shm.name, self.shape, self.slot_of[id(buffer)]
+
+    def close(self):
+        """FREE THE BLOCK - EVERY VIEW MUST BE DROPPED FIRST"""
+        if self.shm is None:
+            return
+        self.buffers = []
+        self.slot_of = {}
+        try:
+            self.shm.close()
+        except BufferError:
+            # A VIEW IS STILL REFERENCED SOMEWHERE - THE MAPPING GOES WHEN IT DOES
+            pass
+        self.shm.unlink()
+        self.shm = None
+
+class SlotReader:
+    def __init__(self):
+        """WORKER SIDE - ATTACH EACH POOL ONCE AND HAND OUT SLOT VIEWS"""
+        self.attached = {}  # SHM NAME -> SharedMemory
+
+    def view(self, handle):
+        name, shape, slot = handle
+        if name not in self.attached:
+            # CHILD PROCESSES SHARE THE PARENT'S RESOURCE TRACKER - THE CREATOR'S unlink() CLEANS UP
+            self.attached[name] = shared_memory.SharedMemory(name=name)
+        frame_bytes = int(np.prod(shape))
+        return np.ndarray(shape, dtype=np.uint8, buffer=self.attached[name].buf, offset=slot * frame_bytes)
+
+    def close(self):
+        for shm in self.attached.values():
+            shm.close()
+        self.attached = {}
+
+def detector_worker(make_detector, handles, results):
+    """DETECTOR PROCESS - READ FRAMES IN PLACE, SEND BACK ONLY THE (SMALL) DETECTIONS"""
+    detector = make_detector()
+    reader = SlotReader()
+    while True:
+        item = handles.get()
+        if item is None:
+            break
+        seq, handle, meta = item
+        start = time.perf_counter()
+        try:
+            frame = reader.view(handle)
+            detections = detector.detect(frame)
+            del frame
+            results.put((seq, meta, detections, (time.perf_counter() - start) * 1000, None))
+        except Exception as e:
+            results.put((seq, meta, None, 0.0, f"{type(e).__name__}: {e}"))
+    reader.close()
+
+class SharedMemoryDetectors:
+    def __init__(self, make_detector, workers=2, pool_size=16, max_in_flight=None, context=None):
+        """DETECTOR PROCESSES FED SLOT HANDLES, RESULTS HANDED BACK IN SUBMIT ORDER"""
+        self.make_detector = make_detector  # PICKLABLE, RETURNS A detector_backends.Detector
+        self.workers = workers
+        self.pool = SharedFramePool(pool_size)
+        # SLOTS HELD BY UNCONSUMED RESULTS CAN'T BE REFILLED - KEEP SOME FREE SO THE DECODER NEVER DEADLOCKS
+        self.max_in_flight = max_in_flight or max(1, min(2 * workers, pool_size // 2))
+        # SPAWN, NOT FORK - THE PARENT ALREADY RUNS DECODER / SAVE THREADS AND HOLDS LOCKS (METRICS, POOLS) A FORKED CHILD COULD INHERIT LOCKED
+        self.context = context or mp.get_context("spawn")
+        self.handles = None
+        self.results = None
+        self.processes = []
+        self.next_seq = 0
+        self.next_out = 0
+        self.frames = {}  # SEQ -> BUFFER WAITING FOR ITS DETECTIONS
+        self.done = {}  # SEQ -> RESULT, ARRIVED OUT OF ORDER
+
+    def start(self):
+        # POOL IS ALLOCATED ON THE FIRST FRAME - START THE TRACKER NOW SO WORKERS INHERIT IT
+        # INSTEAD OF LAUNCHING THEIR OWN, WHICH WOULD UNLINK THE BLOCK WHEN THEY EXIT
+        resource_tracker.ensure_running()
+        self.handles = self.context.Queue()
+        self.results = self.context.Queue()
+        self.processes = [
+            self.context.Process(target=detector_worker, args=(self.make_detector, self.handles, self.results), daemon=True)
+            for _ in range(self.workers)
+        ]
+        for process in self.processes:
+            process.start()
+        return self
+
+    def in_flight(self):
+        return self.next_seq - self.next_out
+
+    def submit(self, buffer, meta=None):
+        """QUEUE A FRAME ALREADY WRITTEN INTO A POOL SLOT - ONLY THE HANDLE CROSSES THE PROCESS BOUNDARY"""
+        if not self.pool.owns(buffer):
+            # FRAME FROM OUTSIDE THE POOL (E.G. PYAV DECODER) - ONE COPY INTO A SLOT
+            slot_buffer = self.pool.acquire(buffer.shape)
+            np.copyto(slot_buffer, buffer)
+            buffer = slot_buffer
+            METRICS.incr("shm.copied_in")
+        seq = self.next_seq
+        self.next_seq += 1
+        self.frames[seq] = buffer
+        self.handles.put((seq, self.pool.handle(buffer), meta))
+        METRICS.set_gauge("shm.in_flight", self.in_flight())
+
+    def _collect(self, block):
+        try:
+            seq, meta, detections, detect_ms, error = self.results.get(block=block)
+        except queue.Empty:
+            return False
+        if error is not None:
+            raise RuntimeError(f"DETECTOR PROCESS FAILED ON FRAME {seq}: {error}")
+        METRICS.observe("shm.detect", detect_ms)
+        self.done[seq] = (meta, detections)
+        return True
+
+    def ready(self, block=False):
+        """(BUFFER, META, DETECTIONS) FOR EVERY FRAME WHOSE PREDECESSORS ARE ALL DONE - BLOCKS WHILE AT max_in_flight"""
+        while self._collect(False):
+            pass
+        while block and self.in_flight() and self.next_out not in self.done:
+            self._collect(True)
+        while self.in_flight() >= self.max_in_flight and self.next_out not in self.done:
+            self._collect(True)
+        while self.next_out in self.done:
+            meta, detections = self.done.pop(self.next_out)
+            yield self.frames.pop(self.next_out), meta, detections
+            self.next_out += 1
+
+    def drain(self):
+        """EVERYTHING STILL IN FLIGHT, IN ORDER"""
+        while self.in_flight():
+            yield from self.ready(block=True)
+
+    def stop(self):
+        for _ in self.processes:
+            self.handles.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.frames = {}
+        self.pool.close()
+
+# TRANSPORT BENCHMARK - SAME READERS, FRAMES PICKLED THROUGH A QUEUE VS SLOT HANDLES
+
+def touch(frame):
+    """CHEAP READ OF EVERY ROW SO BOTH MODES ACTUALLY ACCESS THE PIXELS"""
+    return int(frame[:, ::64].sum())
+
+def copy_reader(frames, results):
+    while True:
+        item = frames.get()
+        if item is None:
+            break
+        seq, frame = item
+        results.put((seq, touch(frame)))
+
+def shm_reader(handles, results, done):
+    reader = SlotReader()
+    while True:
+        item = handles.get()
+        if item is None:
+            break
+        seq, handle = item
+        frame = reader.view(handle)
+        value = touch(frame)
+        del frame
+        results.put((seq, value))
+        done.put(handle[2])
+    reader.close()
+
+def run_transport(mode, frame, count, workers, slots=16):
+    """FRAMES/S MOVING count FRAMES TO workers READER PROCESSES"""
+    context = mp.get_context("spawn")
+    inbox, results = context.Queue(maxsize=slots), context.Queue()
+    pool, free, readers = None, None, []
+    if mode == "shm":
+        pool = SharedFramePool(slots)
+        pool._allocate(frame.shape)
+        free = context.Queue()
+        readers = [context.Process(target=shm_reader, args=(inbox, results, free)) for _ in range(workers)]
+    else:
+        readers = [context.Process(target=copy_reader, args=(inbox, results)) for _ in range(workers)]
+    for reader in readers:
+        reader.start()
+
+    start = time.perf_counter()
+    for seq in range(count):
+        if mode == "shm":
+            # SLOTS COME BACK FROM READERS OVER A QUEUE OF SLOT NUMBERS
+            while True:
+                try:
+                    pool.free.put(free.get_nowait())
+                except queue.Empty:
+                    break
+            if pool.available() == 0:
+                pool.free.put(free.get())
+            buffer = pool.acquire(frame.shape)
+            # STANDS IN FOR cap.retrieve(image=buffer) - THE DECODER'S OWN WRITE
+            np.copyto(buffer, frame)
+            inbox.put((seq, pool.handle(buffer)))
+        else:
+            inbox.put((seq, frame))
+    received = [results.get() for _ in range(count)]
+    elapsed = time.perf_counter() - start
+
+    for _ in readers:
+        inbox.put(None)
+    for reader in readers:
+        reader.join()
+    if pool is not None:
+        pool.close()
+    assert sorted(seq for seq, _ in received) == list(range(count))
+    frame_mb = frame.nbytes / 1e6
+    return {
+        "mode": mode,
+        "frames": count,
+        "frames_per_s": round(count / elapsed, 1),
+        "mb_per_s": round(count * frame_mb / elapsed, 1),
+        "ms_per_frame": round(elapsed * 1000 / count, 3),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Frame transport throughput: pickled copies vs shared memory slots")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--slots", type=int, default=16)
+    args = parser.parse_args()
+
+    frame = np.random.randint(0, 255, size=(args.height, args.width, 3), dtype=np.uint8)
+    print(f"{args.frames} FRAMES OF {args.width}x{args.height} ({frame.nbytes / 1e6:.1f}MB) TO {args.workers} PROCESSES")
+    print(f"\n{'Mode':<6} | {'Frames/s':>9} | {'MB/s':>8} | {'ms/frame':>9}")
+    print("-" * 42)
+    results = [run_transport(mode, frame, args.frames, args.workers, args.slots) for mode in ("copy", "shm")]
+    for r in results:
+        print(f"{r['mode']:<6} | {r['frames_per_s']:>9} | {r['mb_per_s']:>8} | {r['ms_per_frame']:>9}")
+    print(f"\nSHARED MEMORY SPEEDUP: {results[1]['frames_per_s'] / results[0]['frames_per_s']:.2f}x")
@@ -0,0 +1,137 @@
+import bisect
+import heapq
+import threading
+from collections import defaultdict
+from frame_quality import selection_score, QUALITY_WEIGHT
+
+# DETECTIONS OF A CLASS LESS THAN THIS FAR APART COUNT AS ONE APPEARANCE
+DEFAULT_MAX_GAP = 1.0
+
+class Appearance:
+    def __init__(self, start, tracker, confidence):
+        """ONE CONTINUOUS STRETCH OF TIME A CLASS WAS IN VIEW"""
+        self.start = start
+        self.end = start
+        self.frames = 1
+        self.best_confidence = confidence
+        self.best_tracker = tracker
+
+    def extend(self, timestamp, tracker, confidence):
+        self.end = max(self.end, timestamp)
+        self.frames += 1
+        if confidence > self.best_confidence:
+            self.best_confidence = confidence
+            self.best_tracker = tracker
+
+    def to_dict(self):
+        return {"start": round(self.start, 3), "end": round(self.end, 3), "frames": self.frames, "best_confidence": round(self.best_confidence, 3)}
+
+class TemporalIndex:
+    def __init__(self, max_gap=DEFAULT_MAX_GAP):
+        """SORTED TIMESTAMPS + PER-CLASS APPEARANCE INTERVALS OVER PROCESSED FRAMES"""
+        self.max_gap = max_gap
+        # SEGMENT WORKERS add() WHILE ASK THREADS QUERY - EVERY PUBLIC METHOD HOLDS THIS
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.times = []  # SORTED TIMESTAMPS OF EVERY INDEXED FRAME
+        self.trackers = []  # SAME ORDER AS times
+        self.class_times = defaultdict(list)  # CLASS -> SORTED TIMESTAMPS
+        self.class_entries = defaultdict(list)  # CLASS -> [(CONFIDENCE, TRACKER)] SAME ORDER
+        self.appearances = defaultdict(list)  # CLASS -> [Appearance] SORTED, NON-OVERLAPPING
+        self.appearance_ends = defaultdict(list)  # CLASS -> [Appearance.end] SAME ORDER (DISJOINT, SO SORTED)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.times)
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+
+    def add(self, tracker):
+        """INDEX ONE FRAME - O(log n) IN TIME ORDER (BISECT, THEN INSERT AT THE END), O(n) FOR A LATE FRAME (MID-LIST INSERT + REBUILD)"""
+        with self.lock:
+            timestamp = tracker.timestamp
+            if timestamp is None:
+                return
+            position = bisect.bisect_right(self.times, timestamp)
+            self.times.insert(position, timestamp)
+            self.trackers.insert(position, tracker)
+
+            for object_class in tracker.object_counts:
+                confidence = tracker.average_confidences.get(object_class, 0)
+                times = self.class_times[object_class]
+                position = bisect.bisect_right(times, timestamp)
+                times.insert(position, timestamp)
+                self.class_entries[object_class].insert(position, (confidence, tracker))
+
+                if position == len(times) - 1:
+                    self._extend_appearances(object_class, timestamp, tracker, confidence)
+                else:
+                    # OUT-OF-ORDER FRAME - REBUILD THIS CLASS'S INTERVALS
+                    self._rebuild_appearances(object_class)
+
+    def _extend_appearances(self, object_class, timestamp, tracker, confidence):
+        appearances = self.appearances[object_class]
+        ends = self.appearance_ends[object_class]
+        if appearances and timestamp - appearances[-1].end <= self.max_gap:
+            appearances[-1].extend(timestamp, tracker, confidence)
+            ends[-1] = appearances[-1].end
+        else:
+            appearances.append(Appearance(timestamp, tracker, confidence))
+            ends.append(timestamp)
+
+    def _rebuild_appearances(self, object_class):
+        self.appearances[object_class] = []
+        self.appearance_ends[object_class] = []
+        for timestamp, (confidence, tracker) in zip(self.class_times[object_class], self.class_entries[object_class]):
+            self._extend_appearances(object_class, timestamp, tracker, confidence)
+
+    def start_time(self):
+        with self.lock:
+            return self.times[0] if self.times else None
+
+    def end_time(self):
+        with self.lock:
+            return self.times[-1] if self.times else None
+
+    def frames_between(self, start=None, end=None):
+        """TRACKERS WITH start <= TIMESTAMP <= end, IN TIME ORDER"""
+        with self.lock:
+            lo = 0 if start is None else bisect.bisect_left(self.times, start)
+            hi = len(self.times) if end is None else bisect.bisect_right(self.times, end)
+            return self.trackers[lo:hi]
+
+    def best_frames(self, object_class, start=None, end=None, n=3, quality_weight=QUALITY_WEIGHT):
+        """TOP-N TRACKERS BY SELECTION SCORE (CONFIDENCE DISCOUNTED FOR BLUR) FOR A CLASS INSIDE A TIME RANGE"""
+        with self.lock:
+            times = self.class_times.get(object_class, [])
+            lo = 0 if start is None else bisect.bisect_left(times, start)
+            hi = len(times) if end is None else bisect.bisect_right(times, end)
+            entries = self.class_entries.get(object_class, [])[lo:hi]
+            return [tracker for _, tracker in heapq.nlargest(n, entries, key=lambda e: selection_score(e[0], e[1].quality, quality_weight))]
+
+    def appearances_between(self, object_class, start=None, end=None):
+        """APPEARANCE INTERVALS OF A CLASS THAT OVERLAP [start, end]"""
+        with self.lock:
+            appearances = self.appearances.get(object_class, [])
+            lo = 0 if start is None else bisect.bisect_left(self.appearance_ends.get(object_class, []), start)
+            result = []
+            for appearance in appearances[lo:]:
+                # STARTS ARE SORTED TOO - NOTHING LATER CAN OVERLAP
+                if end is not None and appearance.start > end:
+                    break
+                result.append(appearance)
+            return result
+
+    def classes_between(self, start=None, end=None):
+        """CLASSES IN VIEW AT ANY POINT IN [start, end]"""
+        with self.lock:
+            return sorted(c for c in self.appearances if self.appearances_between(c, start, end))
+
+    def first_last(self):
+        """FIRST AND LAST TIMESTAMP EACH CLASS WAS SEEN"""
+        with self.lock:
+            return {c: (times[0], times[-1]) for c, times in sorted(self.class_times.items()) if times}
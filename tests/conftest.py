@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# MODULES LIVE FLAT AT THE REPO ROOT
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,83 @@
+import time
+import openai
+import pytest
+from fake_openai_server import FakeOpenAIServer
+from gpt_handler import GPTHandler
+from request_hedging import HedgePolicy
+from request_scheduler import RequestScheduler, DeadlineExceeded, request_deadline
+
+MODEL = "gpt-3.5-turbo"
+MESSAGES = [{"role": "user", "content": "question"}]
+
+@pytest.fixture
+def server():
+    # NO DRAWN STUCK RESPONSES - EACH TEST PICKS ITS LATENCY WITH X-Fake-Latency
+    server = FakeOpenAIServer(latency=0.02, jitter=0.0, slow_rate=0.0).start()
+    yield server
+    server.stop()
+
+def make_handler(server):
+    return GPTHandler(API_KEY="fake", BASE_URL=server.base_url, SCHEDULER=RequestScheduler({MODEL: (100000, 10**8)}))
+
+def test_deadline_expires_on_slow_response(server):
+    gpt = make_handler(server)
+    start = time.monotonic()
+    with request_deadline(0.3):
+        with pytest.raises(openai.APITimeoutError):
+            gpt.create_completion(MODEL, 100, "gpt.completion", messages=MESSAGES, extra_headers={"X-Fake-Latency": "3"})
+        # DEADLINE ALREADY GONE - THE NEXT CALL NEVER REACHES THE SERVER
+        time.sleep(max(0.0, 0.3 - (time.monotonic() - start)))
+        with pytest.raises(DeadlineExceeded):
+            gpt.create_completion(MODEL, 100, "gpt.completion", messages=MESSAGES)
+    assert time.monotonic() - start < 1.5
+    assert server.stats["requests"] == 1
+    assert server.stats["completed"] == 0
+
+def test_hedge_wins_and_loser_is_abandoned(server):
+    gpt = make_handler(server)
+    policy = HedgePolicy(gpt.new_client, min_samples=5, min_delay=0.05, max_hedge_rate=1.0)
+    for _ in range(5):
+        policy.windows["gpt.completion"].add(20.0)
+    # PRIMARY STUCK, DUPLICATE FAST
+    latencies = ["3", "0.02"]
+
+    def attempt(client, timeout):
+        return client.chat.completions.create(model=MODEL, messages=MESSAGES, extra_headers={"X-Fake-Latency": latencies.pop(0)})
+
+    start = time.monotonic()
+    response = policy.run("gpt.completion", attempt)
+    assert time.monotonic() - start < 1.0
+    assert response.choices[0].message.content == "A fake answer."
+    stats = policy.get_stats()
+    assert stats["hedged"] == 1
+    assert stats["hedge_wins"] == 1
+    assert stats["abandoned"] == 1
+    assert server.stats["requests"] == 2
+    assert len(policy.latencies["gpt.completion"]) == 1
+
+def test_scheduler_refuses_retry_past_deadline(server):
+    gpt = make_handler(server)
+
+    def send():
+        return gpt.create_completion(MODEL, 100, "gpt.completion", messages=MESSAGES, extra_headers={"X-Fake-Status": "429", "X-Fake-Retry-After": "5"})
+
+    start = time.monotonic()
+    with request_deadline(2.0):
+        with pytest.raises(DeadlineExceeded):
+            gpt.SCHEDULER.run(MODEL, 100, send)
+    # ONE ATTEMPT, NO 5s WAIT
+    assert time.monotonic() - start < 1.0
+    assert server.stats["requests"] == 1
+    assert server.stats["failed"] == 1
+
+def test_scheduler_retries_within_deadline(server):
+    gpt = make_handler(server)
+    gpt.SCHEDULER.max_retries = 2
+
+    def send():
+        return gpt.create_completion(MODEL, 100, "gpt.completion", messages=MESSAGES, extra_headers={"X-Fake-Status": "429", "X-Fake-Retry-After": "0.05"})
+
+    with request_deadline(5.0):
+        with pytest.raises(openai.RateLimitError):
+            gpt.SCHEDULER.run(MODEL, 100, send)
+    assert server.stats["requests"] == 3
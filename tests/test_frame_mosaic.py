@@ -0,0 +1,27 @@
+import cv2
+import numpy as np
+import pytest
+from frame_mosaic import build_mosaic, crop_box, DEFAULT_PIXEL_BUDGET
+
+def frames(count, height, width, seed=0):
+    rng = np.random.default_rng(seed)
+    # BLOCKY TEXTURE, LIKE A DOWNSCALED SCENE
+    return [cv2.resize(rng.integers(0, 255, (height // 20, width // 20, 3), dtype=np.uint8), (width, height), interpolation=cv2.INTER_NEAREST) for _ in range(count)]
+
+@pytest.mark.parametrize("count", [1, 2, 3, 4])
+def test_small_frame_mosaic_not_larger_than_inputs(count):
+    inputs = frames(count, 360, 640)
+    mosaic = build_mosaic(inputs)
+    # SAME PIXELS AS THE INPUTS (THE TILE LABELS ARE DRAWN OVER THEM), SO NO MORE TO ENCODE
+    assert mosaic.shape[0] * mosaic.shape[1] <= sum(f.shape[0] * f.shape[1] for f in inputs)
+
+def test_crops_are_not_upscaled():
+    frame = frames(1, 720, 1280)[0]
+    crops = [crop_box(frame, box) for box in ((100, 100, 80, 60), (600, 300, 80, 60))]
+    mosaic = build_mosaic(crops)
+    assert mosaic.shape[0] <= max(c.shape[0] for c in crops) * 2
+    assert mosaic.shape[1] <= max(c.shape[1] for c in crops) * 2
+
+def test_large_frames_stay_within_budget():
+    mosaic = build_mosaic(frames(4, 1080, 1920))
+    assert mosaic.shape[0] * mosaic.shape[1] <= DEFAULT_PIXEL_BUDGET
@@ -0,0 +1,43 @@
+import pytest
+from prompt_handler import (PROMPT_PREFIXES, parse_question_objects, PROMPT_SAMPLES, prompt_report, check_prompt_budgets, get_initial_prompt,
+                            get_collective_frames_prompt, get_fused_prompt, get_direct_answer_prompt)
+
+BUILDERS = {
+    "initial": get_initial_prompt,
+    "collective": lambda question: get_collective_frames_prompt(question, ["car"], tile_labels=list("AB"), history="car: seen 2 times"),
+    "fused": lambda question: get_fused_prompt(question, ["car"], tile_labels=list("AB"), history="car: seen 2 times"),
+    "direct": get_direct_answer_prompt,
+}
+
+def test_prompt_report_within_budget():
+    rows = prompt_report()
+    assert len(rows) == len(PROMPT_SAMPLES)
+    for row in rows:
+        assert row["estimated_tokens"] <= row["budget"], f"{row['template']} ({row['request']}) OVER BUDGET"
+        assert row["prefix_tokens"] + row["suffix_tokens"] == row["total_tokens"]
+    assert check_prompt_budgets() == []
+
+@pytest.mark.parametrize("name", sorted(PROMPT_PREFIXES))
+def test_prompt_starts_with_cacheable_prefix(name):
+    prefix = PROMPT_PREFIXES[name]
+    for question in ("What model is this car?", "Who invented the telephone?"):
+        prompt = BUILDERS[name](question)
+        assert prompt.startswith(prefix)
+        # THE QUESTION BELONGS TO THE PER-REQUEST SUFFIX, NEVER THE CACHED PREFIX
+        assert question not in prefix
+        assert question in prompt[len(prefix):]
+
+def test_sample_builders_start_with_prefix():
+    for name, description, build, budget in PROMPT_SAMPLES:
+        assert build().startswith(PROMPT_PREFIXES[name]), f"{name} ({description})"
+
+@pytest.mark.parametrize("question, expected", [
+    ("How many buses went past?", ["bus"]),
+    ("Were there any benches or sandwiches?", ["sandwich", "bench"]),
+    ("Did you see horses?", ["horse"]),
+    ("Any puppies or boys?", ["dog", "person"]),
+    ("Where did I leave the boxes?", []),
+    ("What color were the traffic lights?", ["traffic light"]),
+])
+def test_parse_question_objects_plurals(question, expected):
+    assert parse_question_objects(question) == expected
@@ -0,0 +1,214 @@
+import time
+import argparse
+import cv2
+import numpy as np
+from metrics import METRICS
+from detector_backends import Detector, empty_detections
+
+# NATIVE PIXELS PER SIDE OF A HIGH-RESOLUTION TILE - AT A 416 NET INPUT A 1080p FRAME IS SEEN ~3.5x SHARPER
+DEFAULT_TILE_SIZE = 608
+# LOW-RES BOXES BELOW THIS SHARE OF THE FRAME ARE "SMALL" AND WORTH A CLOSER LOOK
+SMALL_BOX_FRACTION = 0.01
+# TILE DETECTIONS THIS CLOSE TO AN INNER TILE EDGE ARE CUT OFF - THE FULL-FRAME PASS OR ANOTHER TILE OWNS THEM
+EDGE_MARGIN = 4
+
+class TiledDetector(Detector):
+    def __init__(self, base, tile_size=DEFAULT_TILE_SIZE, max_tiles=2, roi=None, candidate_threshold=0.2,
+                 small_fraction=SMALL_BOX_FRACTION, max_extra_ms=None):
+        """LOW-RES FULL-FRAME PASS, THEN HIGH-RES PASSES ON TILES AROUND CANDIDATES / A GAZE REGION, MERGED WITH ONE NMS"""
+        super().__init__(base.classes, base.conf_threshold, base.nms_threshold)
+        self.base = base
+        self.name = f"tiled_{base.name}"
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles  # HARD CAP ON EXTRA PASSES PER FRAME
+        self.roi = roi  # (X, Y) FRACTIONS OF THE FRAME ALWAYS LOOKED AT CLOSELY - GAZE OR CENTER, NONE = CANDIDATES ONLY
+        self.candidate_threshold = candidate_threshold
+        self.small_fraction = small_fraction
+        self.max_extra_ms = max_extra_ms  # OPTIONAL TIME CAP - TILES ALLOWED = BUDGET / MEASURED MS PER TILE
+        # BASE PASSES KEEP WEAK BOXES TOO - THEY ARE WHERE A CLOSER LOOK PAYS OFF. FINAL NMS RE-APPLIES conf_threshold
+        self.base.conf_threshold = min(base.conf_threshold, candidate_threshold)
+        self.tile_ms = None  # EWMA MS PER TILE
+        self.stats = {"frames": 0, "tiles": 0, "base_ms": 0.0, "extra_ms": 0.0, "detections": 0, "from_tiles": 0, "budget_limited": 0}
+
+    def tiles_allowed(self):
+        if self.max_extra_ms is None or self.tile_ms is None:
+            return self.max_tiles
+        allowed = max(0, min(self.max_tiles, int(self.max_extra_ms / self.tile_ms)))
+        if allowed == 0:
+            # NO TILES, NO NEW MEASUREMENTS - DECAY SO ONE SLOW BATCH DOESN'T DISABLE TILING FOR GOOD
+            self.tile_ms *= 0.95
+        return allowed
+
+    def place_tile(self, center_x, center_y, width, height):
+        """TOP-LEFT OF A TILE CENTERED ON A POINT, SHIFTED TO STAY INSIDE THE FRAME"""
+        x = int(min(max(center_x - self.tile_size / 2, 0), width - self.tile_size))
+        y = int(min(max(center_y - self.tile_size / 2, 0), height - self.tile_size))
+        return x, y
+
+    def plan_tiles(self, boxes, confidences, width, height, roi=None):
+        """TILE ORIGINS FOR THIS FRAME - ROI FIRST, THEN UNCERTAIN OR SMALL CANDIDATES BY CONFIDENCE"""
+        limit = self.tiles_allowed()
+        if limit < self.max_tiles:
+            self.stats["budget_limited"] += 1
+        tiles = []
+        roi = roi if roi is not None else self.roi
+        if roi is not None and limit:
+            tiles.append(self.place_tile(roi[0] * width, roi[1] * height, width, height))
+
+        small_area = self.small_fraction * width * height
+        uncertain = (confidences < self.conf_threshold) | (boxes[:, 2] * boxes[:, 3] < small_area)
+        for i in np.flatnonzero(uncertain)[np.argsort(-confidences[uncertain], kind="stable")]:
+            if len(tiles) >= limit:
+                break
+            x, y, w, h = (int(v) for v in boxes[i])
+            # ALREADY INSIDE A PLANNED TILE
+            if any(tx <= x and ty <= y and x + w <= tx + self.tile_size and y + h <= ty + self.tile_size for tx, ty in tiles):
+                continue
+            tiles.append(self.place_tile(x + w / 2, y + h / 2, width, height))
+        return tiles
+
+    def inner_edge_cut(self, boxes, tile_x, tile_y, width, height):
+        """MASK OF TILE BOXES TOUCHING A TILE EDGE THAT IS NOT ALSO A FRAME EDGE"""
+        size, m = self.tile_size, EDGE_MARGIN
+        cut = np.zeros(len(boxes), dtype=bool)
+        if tile_x > 0:
+            cut |= boxes[:, 0] <= m
+        if tile_y > 0:
+            cut |= boxes[:, 1] <= m
+        if tile_x + size < width:
+            cut |= boxes[:, 0] + boxes[:, 2] >= size - m
+        if tile_y + size < height:
+            cut |= boxes[:, 1] + boxes[:, 3] >= size - m
+        return cut
+
+    def detect_tiled(self, frame, roi=None):
+        """(BOXES, CLASS_IDS, CONFIDENCES) AFTER CROSS-TILE NMS, IN FRAME COORDINATES"""
+        height, width = frame.shape[:2]
+        start = time.perf_counter()
+        with METRICS.span("detect.tiled.base"):
+            boxes, class_ids, confidences = self.base.candidates([frame])[0]
+            # NMS AT THE CANDIDATE THRESHOLD SO ONE OBJECT DOESN'T PLAN SEVERAL TILES
+            kept = self.base.nms(boxes, class_ids, confidences)
+        base_ms = (time.perf_counter() - start) * 1000
+
+        # TILES ONLY HELP WHEN THE FRAME IS BIGGER THAN A TILE
+        tiles = self.plan_tiles(kept[0], kept[2], width, height, roi) if min(width, height) > self.tile_size else []
+        all_boxes, all_ids, all_confs, origin = [boxes], [class_ids], [confidences], [np.zeros(len(boxes), dtype=bool)]
+        extra_ms = 0.0
+        if tiles:
+            start = time.perf_counter()
+            with METRICS.span("detect.tiled.tiles"):
+                # ONE BATCHED FORWARD FOR EVERY TILE OF THE FRAME
+                crops = [frame[y:y + self.tile_size, x:x + self.tile_size] for x, y in tiles]
+                for (tile_x, tile_y), (t_boxes, t_ids, t_confs) in zip(tiles, self.base.candidates(crops)):
+                    keep = ~self.inner_edge_cut(t_boxes, tile_x, tile_y, width, height)
+                    t_boxes = t_boxes[keep] + np.array([tile_x, tile_y, 0, 0], dtype=np.int32)
+                    all_boxes.append(t_boxes)
+                    all_ids.append(t_ids[keep])
+                    all_confs.append(t_confs[keep])
+                    origin.append(np.ones(len(t_boxes), dtype=bool))
+            extra_ms = (time.perf_counter() - start) * 1000
+            per_tile = extra_ms / len(tiles)
+            self.tile_ms = per_tile if self.tile_ms is None else self.tile_ms + 0.2 * (per_tile - self.tile_ms)
+
+        # CROSS-TILE NMS IN FRAME COORDINATES, FINAL conf_threshold
+        boxes, class_ids, confidences, origin = (np.concatenate(a) for a in (all_boxes, all_ids, all_confs, origin))
+        if len(boxes):
+            with METRICS.span("detect.nms"):
+                indexes = cv2.dnn.NMSBoxes(boxes.tolist(), confidences.tolist(), self.conf_threshold, self.nms_threshold)
+            indexes = np.sort(np.asarray(indexes, dtype=np.int32).flatten())
+            boxes, class_ids, confidences, origin = boxes[indexes], class_ids[indexes], confidences[indexes], origin[indexes]
+        else:
+            boxes, class_ids, confidences = empty_detections()
+
+        self.stats["frames"] += 1
+        self.stats["tiles"] += len(tiles)
+        self.stats["base_ms"] += base_ms
+        self.stats["extra_ms"] += extra_ms
+        self.stats["detections"] += len(boxes)
+        self.stats["from_tiles"] += int(origin.sum()) if len(boxes) else 0
+        METRICS.incr("detect.tiled.tiles", len(tiles))
+        METRICS.incr("detect.tiled.from_tiles", int(origin.sum()) if len(boxes) else 0)
+        METRICS.observe("detect.tiled.extra", extra_ms)
+        return boxes, class_ids, confidences
+
+    def detect_batch(self, frames):
+        results = [self.detect_tiled(frame) for frame in frames]
+        METRICS.incr("detect.frames", len(frames))
+        return results
+
+    def get_stats(self):
+        frames = self.stats["frames"] or 1
+        return {
+            "frames": self.stats["frames"],
+            "tiles_per_frame": round(self.stats["tiles"] / frames, 2),
+            "base_ms_per_frame": round(self.stats["base_ms"] / frames, 2),
+            "extra_ms_per_frame": round(self.stats["extra_ms"] / frames, 2),
+            "extra_compute": round(self.stats["extra_ms"] / self.stats["base_ms"], 3) if self.stats["base_ms"] else None,
+            "ms_per_tile": round(self.tile_ms, 2) if self.tile_ms is not None else None,
+            "detections": self.stats["detections"],
+            "from_tiles": self.stats["from_tiles"],
+            "budget_limited_frames": self.stats["budget_limited"],
+        }
+
+def parse_roi(text):
+    """"0.5,0.5" -> (0.5, 0.5)"""
+    x, y = (float(v) for v in text.split(","))
+    if not (0 <= x <= 1 and 0 <= y <= 1):
+        raise argparse.ArgumentTypeError("ROI MUST BE X,Y FRACTIONS BETWEEN 0 AND 1")
+    return x, y
+
+def load_tiled_detector(make_base, **kwargs):
+    """PICKLABLE FACTORY FOR DETECTOR PROCESSES - partial(load_tiled_detector, partial(load_detector, ...), max_tiles=...)"""
+    return TiledDetector(make_base(), **kwargs)
+
+if __name__ == "__main__":
+    from frame_decoder import FrameDecoder
+    from detector_backends import load_detector, OpenCVDetector, DETECTOR_BACKENDS
+
+    parser = argparse.ArgumentParser(description="Full-frame vs tiled detection on a video: extra compute and what the tiles add")
+    parser.add_argument("video")
+    parser.add_argument("--detector", choices=DETECTOR_BACKENDS, default="opencv")
+    parser.add_argument("--detector-model", help="ONNX model path for --detector onnx")
+    parser.add_argument("--fake-detector", action="store_true", help="benchmark.FakeNet instead of YOLOv3 weights - random boxes, so only the cost numbers mean anything")
+    parser.add_argument("--target-fps", type=float, default=2)
+    parser.add_argument("--max-frames", type=int, default=60)
+    parser.add_argument("--tiles", type=int, default=2, help="max high-resolution tiles per frame")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE)
+    parser.add_argument("--roi", type=parse_roi, help="X,Y fractions of a region always tiled (e.g. 0.5,0.5 for gaze at center)")
+    parser.add_argument("--tile-budget-ms", type=float, help="extra ms per frame the tiles may use")
+    args = parser.parse_args()
+
+    if args.fake_detector:
+        from benchmark import FakeNet
+        with open("coco.names", "r") as f:
+            classes = [line.strip() for line in f.readlines()]
+        make_base = lambda: OpenCVDetector(FakeNet(0.05, len(classes)), classes, ["yolo_82", "yolo_94", "yolo_106"])
+    else:
+        make_base = lambda: load_detector(args.detector, model_path=args.detector_model)
+
+    plain = make_base()
+    tiled = TiledDetector(make_base(), args.tile_size, args.tiles, args.roi, max_extra_ms=args.tile_budget_ms)
+    counts = {"full_frame": {}, "tiled": {}}
+    times = {"full_frame": [], "tiled": []}
+    decoder = FrameDecoder(args.video, args.target_fps)
+    for n, (_, _, frame) in enumerate(decoder):
+        if n >= args.max_frames:
+            break
+        for name, detector in (("full_frame", plain), ("tiled", tiled)):
+            start = time.perf_counter()
+            _, class_ids, _ = detector.detect(frame)
+            times[name].append((time.perf_counter() - start) * 1000)
+            for class_id in class_ids:
+                label = detector.classes[class_id]
+                counts[name][label] = counts[name].get(label, 0) + 1
+    decoder.release()
+
+    print(f"\n{'Mode':<10} | {'Frames':>6} | {'ms/frame':>9} | {'Detections':>10}")
+    print("-" * 45)
+    for name in times:
+        print(f"{name:<10} | {len(times[name]):>6} | {np.mean(times[name]):>9.1f} | {sum(counts[name].values()):>10}")
+    stats = tiled.get_stats()
+    print(f"\nTILES: {stats['tiles_per_frame']}/FRAME AT {stats['ms_per_tile']}MS EACH, EXTRA COMPUTE {stats['extra_compute']}x OF THE FULL-FRAME PASS, {stats['from_tiles']} OF {stats['detections']} DETECTIONS FROM TILES")
+    gained = {c: counts["tiled"].get(c, 0) - counts["full_frame"].get(c, 0) for c in set(counts["tiled"]) | set(counts["full_frame"])}
+    print("PER-CLASS CHANGE:", {c: d for c, d in sorted(gained.items(), key=lambda kv: -kv[1]) if d})
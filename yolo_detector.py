@@ -4,12 +4,19 @@ import urllib.request
 import matplotlib.pyplot as plt
 import os
 from collections import defaultdict
+from metrics import METRICS
+from frame_quality import selection_score, QUALITY_WEIGHT
 
 class ObjectTracker:
     def __init__(self):
         self.object_counts = defaultdict(int)
         self.average_confidences = defaultdict(float)
         self.image_ids = []
+        self.boxes = defaultdict(list)  # CLASS -> [(CONFIDENCE, [X, Y, W, H])]
+        self.frame_hash = None  # PERCEPTUAL HASH OF THE UNANNOTATED FRAME
+        self.quality = None  # frame_quality.score_frame OF THE UNANNOTATED FRAME
+        self.timestamp = None  # PRESENTATION TIME (SECONDS) ON THE PIPELINE TIMELINE
+        self.frame_index = None  # SOURCE FRAME NUMBER
         self.target_object = None  #FOR HEAP COMPARISON
     
     def set_target_object(self, object_type):
@@ -49,8 +56,49 @@ class ObjectTracker:
             (1 / new_count) * confidence
         )
     
+    def add_box(self, object_class, confidence, box):
+        self.boxes[object_class].append((confidence, list(box)))
+
+    def best_box(self, object_class):
+        """HIGHEST-CONFIDENCE BOX FOR A CLASS, OR NONE"""
+        if not self.boxes.get(object_class):
+            return None
+        return max(self.boxes[object_class], key=lambda b: b[0])[1]
+    
+    def selection_score(self, object_class, weight=QUALITY_WEIGHT):
+        """CONFIDENCE FOR A CLASS DISCOUNTED FOR BLUR / BAD EXPOSURE - WHAT FRAME SELECTION RANKS BY"""
+        return selection_score(self.average_confidences.get(object_class, 0), self.quality, weight)
+
     def add_image_id(self, image_id):
         self.image_ids.append(image_id)
+
+    def to_dict(self):
+        """SERIALIZE FOR CHECKPOINTS"""
+        return {
+            "object_counts": dict(self.object_counts),
+            "average_confidences": dict(self.average_confidences),
+            "boxes": {k: [[float(c), [int(v) for v in b]] for c, b in boxes] for k, boxes in self.boxes.items()},
+            "image_ids": list(self.image_ids),
+            "frame_hash": self.frame_hash,
+            "quality": self.quality,
+            "timestamp": self.timestamp,
+            "frame_index": self.frame_index,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """RESTORE FROM to_dict OUTPUT"""
+        tracker = cls()
+        tracker.object_counts.update(data["object_counts"])
+        tracker.average_confidences.update(data["average_confidences"])
+        for k, boxes in data.get("boxes", {}).items():
+            tracker.boxes[k] = [(c, b) for c, b in boxes]
+        tracker.image_ids = list(data["image_ids"])
+        tracker.frame_hash = data.get("frame_hash")
+        tracker.quality = data.get("quality")
+        tracker.timestamp = data.get("timestamp")
+        tracker.frame_index = data.get("frame_index")
+        return tracker
     
     def __str__(self):
         output = "\n=== Object Detection Summary ===\n"
@@ -105,11 +153,13 @@ def process_image(frame, net, classes, colors, output_layers, conf_threshold=0.5
     
     # PREPARE IMAGE
     height, width = frame.shape[:2]
-    blob = cv2.dnn.blobFromImage(frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
+    with METRICS.span("detect.blob"):
+        blob = cv2.dnn.blobFromImage(frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
     
     # RUN DETECTION
-    net.setInput(blob)
-    outs = net.forward(output_layers)
+    with METRICS.span("detect.forward"):
+        net.setInput(blob)
+        outs = net.forward(output_layers)
     
     # STORE RESULTS
     class_ids = []
@@ -117,44 +167,114 @@ def process_image(frame, net, classes, colors, output_layers, conf_threshold=0.5
     boxes = []
     
     # GET DETECTIONS
-    for out in outs:
-        for detection in out:
-            scores = detection[5:]
-            class_id = np.argmax(scores)
-            confidence = scores[class_id]
-            
-            if confidence > conf_threshold:
-                # GET BOX COORDS
-                center_x = int(detection[0] * width)
-                center_y = int(detection[1] * height)
-                w = int(detection[2] * width)
-                h = int(detection[3] * height)
+    with METRICS.span("detect.decode"):
+        for out in outs:
+            for detection in out:
+                scores = detection[5:]
+                class_id = np.argmax(scores)
+                confidence = scores[class_id]
                 
-                x = int(center_x - w / 2)
-                y = int(center_y - h / 2)
+                if confidence > conf_threshold:
+                    # GET BOX COORDS
+                    center_x = int(detection[0] * width)
+                    center_y = int(detection[1] * height)
+                    w = int(detection[2] * width)
+                    h = int(detection[3] * height)
+                    
+                    x = int(center_x - w / 2)
+                    y = int(center_y - h / 2)
+                    
+                    boxes.append([x, y, w, h])
+                    confidences.append(float(confidence))
+                    class_ids.append(class_id)
+    
+    # APPLY NMS
+    with METRICS.span("detect.nms"):
+        indexes = cv2.dnn.NMSBoxes(boxes, confidences, conf_threshold, nms_threshold)
+    
+    # DRAW BOXES AND UPDATE TRACKER
+    with METRICS.span("detect.draw"):
+        for i in range(len(boxes)):
+            if i in indexes:
+                class_name = classes[class_ids[i]]
+                confidence = confidences[i]
+                tracker.update(class_name, confidence)
+                tracker.add_box(class_name, confidence, boxes[i])
                 
-                boxes.append([x, y, w, h])
-                confidences.append(float(confidence))
-                class_ids.append(class_id)
+                x, y, w, h = boxes[i]
+                label = str(classes[class_ids[i]])
+                color = colors[class_ids[i]]
+                cv2.rectangle(frame, (x, y), (x + w, y + h), color, 4)  
+                cv2.putText(frame, f"{label} {confidence:.3f}", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 3)  # INCREASED FONT SCALE FROM 1 TO 1.0 AND THICKNESS FROM 2 TO 3
+    
+    METRICS.incr("detect.frames")
+    METRICS.incr("detect.candidates", len(boxes))
+    return frame, boxes, class_ids, confidences, tracker
+
+def process_image_buffered(frame, net, classes, colors, output_layers, blob_buffer, detections, conf_threshold=0.5, nms_threshold=0.4):
+    """SAME AS process_image BUT REUSES BLOB AND RESULT ARRAYS - RETURNED ARRAYS ARE VIEWS, CONSUME BEFORE NEXT CALL"""
+    tracker = ObjectTracker()
+    
+    # PREPARE IMAGE INTO REUSED BLOB
+    height, width = frame.shape[:2]
+    with METRICS.span("detect.blob"):
+        blob = blob_buffer.fill(frame)
+    
+    # RUN DETECTION
+    with METRICS.span("detect.forward"):
+        net.setInput(blob)
+        outs = net.forward(output_layers)
+    
+    # VECTORIZED DECODE INTO REUSED ARRAYS
+    with METRICS.span("detect.decode"):
+        count = detections.decode(outs, width, height, conf_threshold)
+    boxes = detections.boxes[:count]
+    confidences = detections.confidences[:count]
+    class_ids = detections.class_ids[:count]
     
     # APPLY NMS
-    indexes = cv2.dnn.NMSBoxes(boxes, confidences, conf_threshold, nms_threshold)
+    with METRICS.span("detect.nms"):
+        indexes = cv2.dnn.NMSBoxes(boxes, confidences, conf_threshold, nms_threshold) if count else []
     
     # DRAW BOXES AND UPDATE TRACKER
-    for i in range(len(boxes)):
-        if i in indexes:
+    with METRICS.span("detect.draw"):
+        for i in np.sort(np.asarray(indexes, dtype=np.int32).flatten()):
             class_name = classes[class_ids[i]]
-            confidence = confidences[i]
+            confidence = float(confidences[i])
             tracker.update(class_name, confidence)
+            tracker.add_box(class_name, confidence, [int(v) for v in boxes[i]])
             
-            x, y, w, h = boxes[i]
-            label = str(classes[class_ids[i]])
+            x, y, w, h = (int(v) for v in boxes[i])
             color = colors[class_ids[i]]
-            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 4)  
-            cv2.putText(frame, f"{label} {confidence:.3f}", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 3)  # INCREASED FONT SCALE FROM 1 TO 1.0 AND THICKNESS FROM 2 TO 3
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 4)
+            cv2.putText(frame, f"{class_name} {confidence:.3f}", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 3)
     
+    METRICS.incr("detect.frames")
+    METRICS.incr("detect.candidates", count)
     return frame, boxes, class_ids, confidences, tracker
 
+def process_image_with_detector(frame, detector, colors):
+    """SAME RESULTS AS process_image, DETECTIONS FROM ANY detector_backends BACKEND"""
+    boxes, class_ids, confidences = detector.detect(frame)
+    tracker = annotate_detections(frame, boxes, class_ids, confidences, detector.classes, colors)
+    return frame, boxes, class_ids, confidences, tracker
+
+def annotate_detections(frame, boxes, class_ids, confidences, classes, colors):
+    """DRAW POST-NMS DETECTIONS AND BUILD THEIR TRACKER"""
+    tracker = ObjectTracker()
+    with METRICS.span("detect.draw"):
+        for box, class_id, confidence in zip(boxes, class_ids, confidences):
+            class_name = classes[class_id]
+            confidence = float(confidence)
+            x, y, w, h = (int(v) for v in box)
+            tracker.update(class_name, confidence)
+            tracker.add_box(class_name, confidence, [x, y, w, h])
+            
+            color = colors[class_id]
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 4)
+            cv2.putText(frame, f"{class_name} {confidence:.3f}", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 1.0, color, 3)
+    return tracker
+
 def display_image(image):
     cv2.imshow('Frame', image) #DISPLAY ANNOTATED FRAMES
     cv2.waitKey(1)  
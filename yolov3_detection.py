@@ -1,10 +1,16 @@
 import cv2
 import numpy as np
 import urllib.request
-from IPython.display import Image, display
-import matplotlib.pyplot as plt
 import os
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from collections import defaultdict
+from detector_backends import OpenCVDetector
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
 
 class ObjectTracker:
     def __init__(self):
@@ -53,6 +59,17 @@ class ObjectTracker:
                 for k, v in self.average_confidences.items()
             }
         }
+    
+    def merge(self, other):
+        """Fold another tracker in, weighting averages by count"""
+        for object_class, count in other.object_counts.items():
+            current_count = self.object_counts[object_class]
+            total = current_count + count
+            self.average_confidences[object_class] = (
+                self.average_confidences[object_class] * current_count +
+                other.average_confidences[object_class] * count
+            ) / total
+            self.object_counts[object_class] = total
 
 def download_yolo_files():
     """Download YOLOv3 weights, config, and class names"""
@@ -155,8 +172,95 @@ def process_image(image_path, net, classes, colors, output_layers, conf_threshol
     
     return image, boxes, class_ids, confidences, tracker
 
+def draw_detections(image, boxes, class_ids, confidences, classes, colors):
+    """Draw post-NMS detections in the same style as process_image"""
+    for (x, y, w, h), class_id, confidence in zip(boxes, class_ids, confidences):
+        x, y, w, h = int(x), int(y), int(w), int(h)
+        color = colors[class_id]
+        cv2.rectangle(image, (x, y), (x + w, y + h), color, 5)
+        cv2.putText(image, f"{classes[class_id]} {confidence:.3f}", (x, y - 10), cv2.FONT_HERSHEY_PLAIN, 3, color, 2)
+    return image
+
+def find_images(inputs):
+    """Expand files, directories and globs into a sorted image list"""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                paths.update(os.path.join(root, f) for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.update(p for p in glob.glob(item) if os.path.isfile(p))
+    return sorted(paths)
+
+def read_image(path):
+    """cv2.imread releases the GIL, so a thread pool decodes in parallel"""
+    return path, cv2.imread(path)
+
+def iter_batches(paths, executor, batch_size):
+    """Yield decoded batches in order, decoding the next batch while the current one runs"""
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    pending = [executor.submit(read_image, p) for p in batches[0]] if batches else []
+    for i in range(len(batches)):
+        current = [f.result() for f in pending]
+        # PREFETCH ONE BATCH AHEAD - MEMORY STAYS BOUNDED FOR LARGE DUMPS
+        pending = [executor.submit(read_image, p) for p in batches[i + 1]] if i + 1 < len(batches) else []
+        yield current
+
+def process_batch(paths, net, classes, colors, output_layers, output_path, batch_size=8, workers=8, display=False, conf_threshold=0.5, nms_threshold=0.4):
+    """Index many images: parallel decode, batched forward, one JSONL line per image plus a summary"""
+    detector = OpenCVDetector(net, classes, output_layers, conf_threshold=conf_threshold, nms_threshold=nms_threshold)
+    overall = ObjectTracker()
+    processed = failed = 0
+    start = time.perf_counter()
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor, open(output_path, "w") as out:
+        for batch in iter_batches(paths, executor, batch_size):
+            images = [(path, image) for path, image in batch if image is not None]
+            for path, image in batch:
+                if image is None:
+                    failed += 1
+                    out.write(json.dumps({"type": "image", "image": path, "error": "could not read image"}) + "\n")
+            
+            results = detector.detect_batch([image for _, image in images]) if images else []
+            for (path, image), (boxes, class_ids, confidences) in zip(images, results):
+                tracker = ObjectTracker()
+                detections = []
+                for box, class_id, confidence in zip(boxes, class_ids, confidences):
+                    tracker.update(classes[class_id], float(confidence))
+                    detections.append({"class": classes[class_id], "confidence": round(float(confidence), 3), "box": [int(v) for v in box]})
+                overall.merge(tracker)
+                processed += 1
+                
+                out.write(json.dumps({
+                    "type": "image",
+                    "image": path,
+                    "width": image.shape[1],
+                    "height": image.shape[0],
+                    "stats": tracker.get_stats(),
+                    "detections": detections,
+                }) + "\n")
+                
+                # ONLY DRAW WHEN SOMEONE WILL LOOK AT IT
+                if display:
+                    display_image(draw_detections(image, boxes, class_ids, confidences, classes, colors))
+            print(f"PROCESSED {processed + failed}/{len(paths)} IMAGES")
+        
+        elapsed = time.perf_counter() - start
+        summary = {
+            "type": "summary",
+            "images": processed,
+            "failed": failed,
+            "seconds": round(elapsed, 3),
+            "images_per_s": round(processed / elapsed, 2) if elapsed else 0.0,
+            "stats": overall.get_stats(),
+        }
+        out.write(json.dumps(summary) + "\n")
+    return overall, summary
+
 def display_image(image):
     """Display image using matplotlib"""
+    # IMPORTED HERE SO --no-display RUNS WITHOUT MATPLOTLIB
+    import matplotlib.pyplot as plt
     rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
     plt.figure(figsize=(12, 8))
     plt.imshow(rgb_image)
@@ -166,16 +270,41 @@ def display_image(image):
     plt.show()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="YOLOv3 detection on one image or a whole photo dump")
+    parser.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("--output", default="detections.jsonl", help="JSONL results for batch mode")
+    parser.add_argument("--batch-size", type=int, default=8, help="images per forward pass")
+    parser.add_argument("--workers", type=int, default=8, help="decode threads")
+    parser.add_argument("--no-display", action="store_true", help="skip matplotlib entirely")
+    parser.add_argument("--display", action="store_true", help="batch mode: show every image (off by default - plt.show blocks per image)")
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--nms", type=float, default=0.4)
+    args = parser.parse_args()
+    
     download_yolo_files()
     
     #YOLO MODEL
     net, classes, colors, output_layers = load_yolo()
     
-    image_path = "/Users/sanjaysenthil/Downloads/dog.jpg" 
-    processed_image, boxes, class_ids, confidences, tracker = process_image(
-        image_path, net, classes, colors, output_layers
-    )
+    paths = find_images(args.inputs)
+    if not paths:
+        print("ERROR: NO IMAGES FOUND")
+        raise SystemExit(1)
     
-    print(tracker)
-    print("\nDisplaying image")
-    display_image(processed_image) 
\ No newline at end of file
+    # LEGACY SINGLE-IMAGE PATH ONLY FOR ONE EXPLICIT FILE - A DIRECTORY OR GLOB ALWAYS WRITES --output
+    if len(args.inputs) == 1 and os.path.isfile(args.inputs[0]):
+        processed_image, boxes, class_ids, confidences, tracker = process_image(
+            paths[0], net, classes, colors, output_layers, args.conf, args.nms
+        )
+        print(tracker)
+        if not args.no_display:
+            print("\nDisplaying image")
+            display_image(processed_image)
+    else:
+        overall, summary = process_batch(
+            paths, net, classes, colors, output_layers, args.output,
+            args.batch_size, args.workers, args.display and not args.no_display, args.conf, args.nms
+        )
+        print(overall)
+        print(f"\n{summary['images']} IMAGES ({summary['failed']} FAILED) IN {summary['seconds']}s - {summary['images_per_s']} IMAGES/S")
+        print(f"RESULTS WRITTEN TO {args.output}") 
\ No newline at end of file